@@ -7,10 +7,17 @@ from poke_env import PlayerConfiguration, LocalhostServerConfiguration
 from poke_env.player import background_cross_evaluate
 from tabulate import tabulate
 
+from DoublesEquilibriumPlayer import DoublesEquilibriumPlayer
 from DoublesRandomPlayer import DoubleRandomPlayer
 from DoublesMaxDamagePlayer import DoublesMaxDamagePlayer
+from DoublesSearchPlayer import DoublesSearchPlayer
 from DoublesSmartPlayer import DoublesSmartPlayer
 from DoublesTrueMaxDamagePlayer import DoublesTrueMaxDamagePlayer
+from Ladder import Ladder, STANDINGS_HEADERS
+import LocalSimulator
+import ResultStore
+import SequentialEvaluation
+from ShardedEvaluation import PlayerSpec, sharded_cross_evaluate
 from Teams import RandomTeamFromPool
 
 sys.path.append("..")
@@ -18,50 +25,122 @@ sys.path.append("..")
 
 async def main():
     battle_format = "gen8vgc2021"
+    # with --local the battles are simulated in process (LocalSimulator), without the Showdown server
+    local = "--local" in sys.argv
+    # with --workers N the pairs are split in shards played by N processes (ShardedEvaluation)
+    workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else None
+    # with --results FILE every battle is appended to FILE when it ends, a rerun plays only the missing ones
+    store = ResultStore.ResultStore(sys.argv[sys.argv.index("--results") + 1]) if "--results" in sys.argv else None
+    # with --sprt each pair plays batches of battles until a sequential test decides it (SequentialEvaluation), in
+    # this process: the batches of a pair depend on the previous ones, so it can't be split in shards by --workers
+    sprt = "--sprt" in sys.argv
+    if sprt and workers is not None:
+        sys.exit("--sprt can't be combined with --workers: the sequential test plays each pair in this process")
+    # with --ladder FILE the players are rated with Glicko ratings saved in FILE, pairing the most informative pairs
+    ladder = Ladder(sys.argv[sys.argv.index("--ladder") + 1]) if "--ladder" in sys.argv else None
+    # with --seed N the local battles are seeded, with --workers the result doesn't depend on the number of workers
+    seed = int(sys.argv[sys.argv.index("--seed") + 1]) if "--seed" in sys.argv else None
+    # with --teams DIR each battle uses a random team among the Showdown exports in DIR (Teams.TeamPool)
+    teams_directory = sys.argv[sys.argv.index("--teams") + 1] if "--teams" in sys.argv else None
+    # with --search-players DoublesSearchPlayer and DoublesEquilibriumPlayer are evaluated too, their decisions take
+    # up to their time limit
+    search_players = "--search-players" in sys.argv
 
     random_player = DoubleRandomPlayer(
         player_configuration=PlayerConfiguration("rando", None),
         server_configuration=LocalhostServerConfiguration,
-        team=RandomTeamFromPool(),
-        battle_format=battle_format
-
+        team=RandomTeamFromPool(teams_directory),
+        battle_format=battle_format,
+        start_listening=not local and workers is None
     )
 
     maxdamage_player = DoublesMaxDamagePlayer(
         player_configuration=PlayerConfiguration("elMaxoDamagio", None),
         server_configuration=LocalhostServerConfiguration,
-        team=RandomTeamFromPool(),
-        battle_format=battle_format
+        team=RandomTeamFromPool(teams_directory),
+        battle_format=battle_format,
+        start_listening=not local and workers is None
     )
 
     true_maxdamage_player = DoublesTrueMaxDamagePlayer(
         player_configuration=PlayerConfiguration("elMaxoDamagioMax", None),
         server_configuration=LocalhostServerConfiguration,
-        team=RandomTeamFromPool(),
-        battle_format=battle_format
+        team=RandomTeamFromPool(teams_directory),
+        battle_format=battle_format,
+        start_listening=not local and workers is None
     )
 
     smart_player = DoublesSmartPlayer(
         player_configuration=PlayerConfiguration("SmartBoyVGC", None),
         server_configuration=LocalhostServerConfiguration,
-        team=RandomTeamFromPool(),
-        battle_format=battle_format
+        team=RandomTeamFromPool(teams_directory),
+        battle_format=battle_format,
+        start_listening=not local and workers is None
     )
 
     n_challenges = 50
+    # battles after which --sprt stops a pair even if undecided
+    max_battles = 200
     players = [
         random_player,
         maxdamage_player,
         true_maxdamage_player,
         smart_player,
     ]
-    cross_eval_task = background_cross_evaluate(players, n_challenges)
-    cross_evaluation = cross_eval_task.result()
+    if search_players:
+        search_player = DoublesSearchPlayer(
+            player_configuration=PlayerConfiguration("SearchBoyVGC", None),
+            server_configuration=LocalhostServerConfiguration,
+            team=RandomTeamFromPool(teams_directory),
+            battle_format=battle_format,
+            start_listening=not local and workers is None
+        )
+
+        equilibrium_player = DoublesEquilibriumPlayer(
+            player_configuration=PlayerConfiguration("EquilibriumVGC", None),
+            server_configuration=LocalhostServerConfiguration,
+            team=RandomTeamFromPool(teams_directory),
+            battle_format=battle_format,
+            start_listening=not local and workers is None
+        )
+        players += [search_player, equilibrium_player]
+
+    if ladder is not None:
+        for player in players:
+            ladder.register(player)
+        if local:
+            ladder.run(n_challenges * len(players), store=store)
+        else:
+            ladder.background_run_server(n_challenges * len(players), store=store).result()
+        print(tabulate(ladder.standings([player.username for player in players]), headers=STANDINGS_HEADERS))
+        return
+
+    pairs = None
+    if sprt and local:
+        cross_evaluation, pairs = SequentialEvaluation.sequential_cross_evaluate(players, max_battles, seed=seed,
+                                                                                 store=store)
+    elif sprt:
+        cross_evaluation, pairs = SequentialEvaluation.background_sequential_cross_evaluate(
+            players, max_battles, store=store).result()
+    elif workers is not None:
+        specs = [PlayerSpec(type(p), p.username, {"battle_format": battle_format, "team": p._team}) for p in players]
+        cross_evaluation = sharded_cross_evaluate(specs, n_challenges, workers, local=local, seed=seed,
+                                                  store=store)
+    elif local:
+        cross_evaluation = LocalSimulator.cross_evaluate(players, n_challenges, seed, store=store)
+    elif store is not None:
+        cross_evaluation = ResultStore.background_cross_evaluate(players, n_challenges, store).result()
+    else:
+        cross_eval_task = background_cross_evaluate(players, n_challenges)
+        cross_evaluation = cross_eval_task.result()
     table = [["-"] + [p.username for p in players]]
     for p_1, results in cross_evaluation.items():
         table.append([p_1] + [cross_evaluation[p_1][p_2] for p_2 in results])
     print("Cross evaluation of DQN with baselines:")
     print(tabulate(table))
+    if pairs is not None:
+        print(tabulate(SequentialEvaluation.describe(pairs),
+                       headers=["player 1", "player 2", "battles", "score", "verdict"]))
 
 if __name__ == "__main__":
     asyncio.get_event_loop().run_until_complete(main())
@@ -4,8 +4,11 @@ from poke_env.environment import Move, Pokemon, DoubleBattle, Status
 from poke_env.environment.move_category import MoveCategory
 from poke_env.player import BattleOrder
 
+import Modifiers
+import MoveIndex
 import MoveUtilities
 import SwitchHelper
+from TurnContext import TurnContext
 
 
 class ScoreOrder:
@@ -19,7 +22,9 @@ class ScoreOrder:
         self.target = target
 
 
-def choose_moves(battle: DoubleBattle, idxBattler) -> BattleOrder:
+def choose_moves(battle: DoubleBattle, idxBattler, context: TurnContext = None) -> BattleOrder:
+    if context is None:
+        context = TurnContext(battle)
 
     user = battle.active_pokemon[idxBattler]
 
@@ -29,7 +34,7 @@ def choose_moves(battle: DoubleBattle, idxBattler) -> BattleOrder:
     # lista di (move, score, target) aka list of ScoreOrder
     choices = []
     for i, move in enumerate(battle.available_moves[idxBattler]):
-        register_move_trainer(battle, user, move, choices)
+        register_move_trainer(battle, user, move, choices, context)
 
     # Figure out useful information about the choices
     totalScore = 0
@@ -72,7 +77,7 @@ def choose_moves(battle: DoubleBattle, idxBattler) -> BattleOrder:
 
     if badMoves:
         # switch due to terrible moves
-        switch = SwitchHelper.choose_possible_best_switch(battle, idxBattler)
+        switch = SwitchHelper.choose_possible_best_switch(battle, idxBattler, context)
         if switch is not None:
             return BattleOrder(switch)
 
@@ -81,7 +86,7 @@ def choose_moves(battle: DoubleBattle, idxBattler) -> BattleOrder:
     if len(choices) == 0:
         targets = {}
         for move in moves:
-            targetList = battle.get_possible_showdown_targets(move, user)
+            targetList = context.possible_targets(move, user)
 
             noSelfTarg = [x for x in targetList if x > 0]
             if len(noSelfTarg):  # if the move can target an opponent don't target ally
@@ -110,13 +115,15 @@ def choose_moves(battle: DoubleBattle, idxBattler) -> BattleOrder:
     # Trainer Pokémon calculate how much they want to use each of their moves.
 
 
-def register_move_trainer(battle: DoubleBattle, user: Pokemon, move: Move, output):
-    target_data = battle.get_possible_showdown_targets(move, user)
+def register_move_trainer(battle: DoubleBattle, user: Pokemon, move: Move, output, context: TurnContext = None):
+    if context is None:
+        context = TurnContext(battle)
+    target_data = context.possible_targets(move, user)
     if len(target_data) == 1:
         # If move has no targets, affects the user, a side or the whole field, or
         # specially affects multiple Pokémon and the AI calculates an overall
         # score at once instead of per target
-        score = get_move_score_area(battle, move, user)
+        score = get_move_score_area(battle, move, user, context)
 
         if score > 0:
             value = ScoreOrder(move, score, target=target_data[0])
@@ -128,7 +135,7 @@ def register_move_trainer(battle: DoubleBattle, user: Pokemon, move: Move, outpu
         for idx, oppo in enumerate(battle.opponent_active_pokemon):
             if oppo is None:
                 continue
-            score = get_move_score(battle, move, user, oppo)
+            score = get_move_score(battle, move, user, oppo, context)
             if score > 0:
                 value = ScoreOrder(move, score, target=target_data[idx + 1])
                 scoresAndTargets.append(value)
@@ -145,7 +152,10 @@ def register_move_trainer(battle: DoubleBattle, user: Pokemon, move: Move, outpu
     # =============================================================================
 
 
-def get_move_score(battle: DoubleBattle, move: Move, user: Pokemon, target: Pokemon) -> int:
+def get_move_score(battle: DoubleBattle, move: Move, user: Pokemon, target: Pokemon,
+                   context: TurnContext = None) -> int:
+    if context is None:
+        context = TurnContext(battle)
     score = 100
 
     # Prefer damaging moves if AI has no more Pokémon
@@ -155,32 +165,31 @@ def get_move_score(battle: DoubleBattle, move: Move, user: Pokemon, target: Poke
         elif target.current_hp_fraction <= 0.5:
             score *= 1.5
 
-    base_dmg = MoveUtilities.move_base_damage(move, user, target)
+    base_dmg = context.base_damage(move, user, target)
     # Pick a good move for the Choice items
-    if (user.item and user.item.lower().startswith("choice")) or (
-            user.ability and user.ability.lower() == "gorilla tactics"):
+    if Modifiers.of(user).choice_lock:
 
         if base_dmg >= 60:
             score += 60
         elif base_dmg > 0:
             score += 30
-        elif move.id.lower() == Move.retrieve_id("Trick"):
+        elif move.id.lower() == MoveIndex.TRICK:
             score += 70  # Trick
         else:
             score -= 60
 
     # Don't prefer moves that are ineffective because of abilities or effects
-    if MoveUtilities.is_move_immune(move, user, target):
+    if context.is_move_immune(move, user, target):
         return 0
     # Adjust score based on how much damage it can deal
     if base_dmg > 0:
-        score = get_move_score_damage(score, move, user, target, battle)
+        score = get_move_score_damage(score, move, user, target, battle, context)
     else:  # Status moves
         # Don't prefer attacks which don't deal damage
         score -= 10
         score = eval_status_move(move, user, target, score)
         # Account for accuracy of move
-        accuracy = MoveUtilities.rough_accuracy(move, user, target)
+        accuracy = context.accuracy(move, user, target)
         score *= accuracy / 100.0
         if score <= 10:
             score = 0
@@ -191,10 +200,12 @@ def get_move_score(battle: DoubleBattle, move: Move, user: Pokemon, target: Poke
     return int(score)
 
 
-def get_move_score_area(battle: DoubleBattle, move: Move, user: Pokemon) -> int:
+def get_move_score_area(battle: DoubleBattle, move: Move, user: Pokemon, context: TurnContext = None) -> int:
+    if context is None:
+        context = TurnContext(battle)
     base_score = 100
 
-    if move.id == Move.retrieve_id("Protect") or move.id == Move.retrieve_id("Detect"):
+    if MoveIndex.get(move).protect_like:
         base_score = 20
 
     # Prefer damaging moves if AI has no more Pokémon
@@ -211,17 +222,17 @@ def get_move_score_area(battle: DoubleBattle, move: Move, user: Pokemon) -> int:
             continue
         score = 0
         # Don't prefer moves that are ineffective because of abilities or effects
-        if MoveUtilities.is_move_immune(move, user, target):
+        if context.is_move_immune(move, user, target):
             continue
         # Adjust score based on how much damage it can deal
         if move.base_power > 0:
-            score = get_move_score_damage(score, move, user, target, battle)
+            score = get_move_score_damage(score, move, user, target, battle, context)
         else:  # Status moves
             # Don't prefer attacks which don't deal damage
             score -= 10
             score = eval_status_move(move, user, target, score)
             # Account for accuracy of move
-            accuracy = MoveUtilities.rough_accuracy(move, user, target)
+            accuracy = context.accuracy(move, user, target)
             score *= accuracy / 100.0
             if score <= 10:
                 score = 0
@@ -250,18 +261,37 @@ def eval_status_move(move, user, target, score) -> int:
     # =============================================================================
 
 
-def get_move_score_damage(score, move: Move, user, target, battle) -> int:
+def get_move_score_damage(score, move: Move, user, target, battle, context: TurnContext = None) -> int:
     if score <= 0:
         return 0
+    if context is None:
+        context = TurnContext(battle)
+    score += damage_score(damage_percentage(move, user, target, battle, context))
+    return int(score)
+
+
+def damage_percentage(move: Move, user: Pokemon, target: Pokemon, battle: DoubleBattle,
+                      context: TurnContext = None) -> float:
+    """
+    :return: damage of move weighted by its accuracy, as a percentage of the remaining HP of target
+    """
+    if context is None:
+        context = TurnContext(battle)
     # Calculate how much damage the move will do (roughly)
-    baseDmg = MoveUtilities.move_base_damage(move, user, target)
-    realDamage = MoveUtilities.rough_damage(move, user, target, baseDmg, battle)
+    realDamage = context.damage(move, user, target)
     # Account for accuracy of move
-    accuracy = MoveUtilities.rough_accuracy(move, user, target)
+    accuracy = context.accuracy(move, user, target)
     realDamage *= accuracy / 100.0
 
     # Convert damage to percentage of target's remaining HP
-    damagePercentage = realDamage * 100.0 / target.current_hp
+    return realDamage * 100.0 / target.current_hp
+
+
+def damage_score(damagePercentage: float) -> float:
+    """
+    :param damagePercentage: see damage_percentage
+    :return: score added by get_move_score_damage
+    """
     # Don't prefer weak attacks
     #    damagePercentage /= 2 if damagePercentage<20
 
@@ -270,16 +300,17 @@ def get_move_score_damage(score, move: Move, user, target, battle) -> int:
         damagePercentage = 120
     if damagePercentage > 100:  # Prefer moves likely to be lethal
         damagePercentage += 40
-    score += damagePercentage
-    return int(score)
+    return damagePercentage
 
 
-def use_protect(battle: DoubleBattle, idxBattler) -> BattleOrder | None:
+def use_protect(battle: DoubleBattle, idxBattler, context: TurnContext = None) -> BattleOrder | None:
+    if context is None:
+        context = TurnContext(battle)
     user = battle.active_pokemon[idxBattler]
     has_protect = False
     protect = None
     for move in battle.available_moves[idxBattler]:
-        if move.id == Move.retrieve_id("Protect") or move.id == Move.retrieve_id("Detect"):
+        if MoveIndex.get(move).protect_like:
             # print("has protect")
             has_protect = True
             protect = move
@@ -290,13 +321,13 @@ def use_protect(battle: DoubleBattle, idxBattler) -> BattleOrder | None:
     for oppo in battle.opponent_active_pokemon:
         if oppo is None:
             continue
-        if MoveUtilities.can_damage(oppo, user):
+        if context.can_damage(oppo, user):
             damagers += 1
     base_probability = damagers * 30
     if len(battle.available_switches) == 0:
         base_probability -= 20
     if random.randint(0, 100) < base_probability:
-        return BattleOrder(protect, move_target=battle.get_possible_showdown_targets(protect, user)[0])
+        return BattleOrder(protect, move_target=context.possible_targets(protect, user)[0])
 
 
 """
@@ -321,16 +352,19 @@ def usePrio(battle: DoubleBattle, idxBattler) -> BattleOrder | None:
 """
 
 
-def use_prio(battle: DoubleBattle, idxBattler) -> BattleOrder | None:
+def use_prio(battle: DoubleBattle, idxBattler, context: TurnContext = None) -> BattleOrder | None:
+    if context is None:
+        context = TurnContext(battle)
     user = battle.active_pokemon[idxBattler]
     for move in battle.available_moves[idxBattler]:
-        if move.priority > 0:
-            if move.base_power == 0 or (move.id == move.retrieve_id("Fake Out") and move.max_pp > move.current_pp): #Pokemon.first_turn doesn't work
+        info = MoveIndex.get(move)
+        if info.priority:
+            if move.base_power == 0 or (info.fake_out and move.max_pp > move.current_pp): #Pokemon.first_turn doesn't work
                 continue
-            targets = battle.get_possible_showdown_targets(move, user)
+            targets = context.possible_targets(move, user)
             noSelfTarg = [x for x in targets if x > 0]
             for idxtarget in noSelfTarg:
                 target = battle.opponent_active_pokemon[idxtarget-1]
-                if target is not None and MoveUtilities.move_can_ko(move, user, target, battle):
+                if target is not None and context.move_can_ko(move, user, target):
                     return BattleOrder(move, move_target=idxtarget)
     return None
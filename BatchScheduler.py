@@ -0,0 +1,138 @@
+"""
+decisions of the concurrent battles of a player taken in batches: the requests arriving within window seconds of the
+first one are collected, the states of their battles are stacked and the damage of all of them is computed by one pass
+of the DamageMatrix kernel (see DamageMatrix.batch), then each battle chooses its order reading its own slice and
+gets it back as the result of its choose_move. The NumPy overhead of the matrix is paid once per batch instead of once
+per battle.
+The batches are decided by one thread out of the event loop, which keeps reading the messages of the other battles,
+and the time limit of a player (DoublesSearchPlayer) counts from the arrival of the requests: the battles of a batch
+share the time left before the first deadline. The state of the player (metrics, counters, per-battle caches) is only
+written by that thread or under a lock; the event loop only resolves the futures of the requests
+
+usage:
+    player = DoublesSearchPlayer(..., decision_pool=BatchScheduler(window=0.01))
+"""
+import asyncio
+import functools
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from poke_env.environment import DoubleBattle
+from poke_env.player.battle_order import BattleOrder
+
+from Instrumentation import metrics_of
+from TurnContext import TurnContext
+
+
+def decide_all(player, battles: List[DoubleBattle], arrivals: List[float] = None) -> List[BattleOrder]:
+    """
+    :param player: DoublesSmartPlayer or a subclass
+    :param battles: battles waiting for an order of player
+    :param arrivals: time.perf_counter() when each request arrived, None to decide each battle as if it arrived
+        now
+    :return: the order of each battle, same of player.decide(battle)
+    """
+    contexts = TurnContext.batch(battles)
+    time_limit = getattr(player, "time_limit", None)
+    if arrivals is None or time_limit is None or math.isinf(time_limit):
+        return [player.decide(battle, context) for battle, context in zip(battles, contexts)]
+    # the battles are decided one after the other before the deadline of the first request, each one gets an equal
+    # part of the time left: its search starts now and ends at the end of its part
+    end = min(arrivals) + time_limit
+    orders = []
+    for k, (battle, context) in enumerate(zip(battles, contexts)):
+        now = time.perf_counter()
+        share = max(end - now, 0) / (len(battles) - k)
+        orders.append(player.decide(battle, context, started=now + share - time_limit))
+    return orders
+
+
+def _decide_batch(player, battles: List[DoubleBattle], arrivals: List[float]) -> List[BattleOrder]:
+    """
+    decide_all in the thread of the batches, with the latency of each request from its arrival
+    """
+    orders = decide_all(player, battles, arrivals)
+    metrics = metrics_of(player)
+    now = time.perf_counter()
+    for arrival in arrivals:
+        # time waited for the batch included
+        metrics.record("batched_choose_move", now - arrival)
+    return orders
+
+
+class BatchScheduler:
+    def __init__(self, window: float = 0.005, max_batch: int = 16):
+        """
+        :param window: seconds a request waits for the others of its batch
+        :param max_batch: a full batch is decided without waiting the end of the window
+        """
+        self.window = window
+        self.max_batch = max_batch
+        # number of batches and of decisions, their ratio is the mean batch size
+        self.batches = 0
+        self.decisions = 0
+        # (player, battle, future of the order, arrival time)
+        self._pending = []
+        self._timer = None
+        # one thread: the decisions of a player never run at the same time
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="batch")
+
+    async def choose_move(self, player, battle: DoubleBattle) -> BattleOrder:
+        """
+        awaited by poke_env in place of the order of player
+        :param player:
+        :param battle:
+        :return:
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((player, battle, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        """
+        sends the pending requests, grouped by player, to the thread of the batches; called in the event loop
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        by_player = {}
+        for request in pending:
+            by_player.setdefault(id(request[0]), []).append(request)
+        loop = asyncio.get_running_loop()
+        for requests in by_player.values():
+            player = requests[0][0]
+            batch = loop.run_in_executor(self._executor, _decide_batch, player,
+                                         [battle for _, battle, _, _ in requests],
+                                         [arrival for _, _, _, arrival in requests])
+            batch.add_done_callback(functools.partial(self._resolve, requests))
+
+    def _resolve(self, requests: list, batch: asyncio.Future):
+        """
+        gives its order to each request of a decided batch, in the event loop
+        """
+        exception = batch.exception()
+        if exception is not None:
+            for _, _, future, _ in requests:
+                if not future.done():
+                    future.set_exception(exception)
+            return
+        self.batches += 1
+        self.decisions += len(requests)
+        for (_, _, future, _), order in zip(requests, batch.result()):
+            if not future.done():
+                future.set_result(order)
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "decisions": self.decisions,
+                "mean_batch": self.decisions / self.batches if self.batches else 0.0}
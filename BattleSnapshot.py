@@ -0,0 +1,167 @@
+"""
+flat copy of the state of a DoubleBattle: the values the heuristics read from the Pokémon of both teams
+(stats, boosts, HP, types, status, ability/item) are collected once per decision in NumPy arrays,
+one row per battler, together with weather, fields and side conditions.
+Without the Pokémon objects the snapshot can be pickled and sent to another process
+"""
+from typing import List, Optional
+
+import numpy as np
+from poke_env.environment import Pokemon, DoubleBattle, Effect, Field
+
+import Modifiers
+import MoveUtilities
+import TypeChart
+from SpeedOrder import SpeedOrder
+
+# columns of stats: the stats estimated by MoveUtilities.rough_stat (without boosts)
+STAT_KEYS = [MoveUtilities.Stat.ATTACK.value, MoveUtilities.Stat.DEFENSE.value,
+             MoveUtilities.Stat.SPECIAL_ATTACK.value, MoveUtilities.Stat.SPECIAL_DEFENSE.value]
+# columns of boosts
+BOOST_KEYS = [*STAT_KEYS, MoveUtilities.Stat.SPEED.value]
+
+# our side / opponent's side
+ALLY, FOE = range(2)
+
+# status code used when the battler has no status
+NO_STATUS = 0
+
+
+class BattleSnapshot:
+    __slots__ = ("battlers", "n_alive", "side", "active", "present", "fainted", "level", "types", "stats", "boosts",
+                 "max_hp", "rough_max_hp", "hp_fraction", "speed", "status", "first_turn", "psychic_terrain",
+                 "terrain", "abilities", "items", "modifiers", "weather", "fields", "side_conditions",
+                 "weather_multipliers", "sand_rock_boost", "trick_room", "speed_order", "_index")
+
+    battlers: List[Optional[Pokemon]]
+    n_alive: int
+    side: np.ndarray
+    active: np.ndarray
+    # False for the empty active slots
+    present: np.ndarray
+    fainted: np.ndarray
+    level: np.ndarray
+    types: np.ndarray
+    stats: np.ndarray
+    boosts: np.ndarray
+    max_hp: np.ndarray
+    rough_max_hp: np.ndarray
+    hp_fraction: np.ndarray
+    speed: np.ndarray
+    status: np.ndarray
+    first_turn: np.ndarray
+    psychic_terrain: np.ndarray
+    terrain: np.ndarray
+    abilities: List[Optional[str]]
+    items: List[Optional[str]]
+    modifiers: List[Modifiers.Modifiers]
+    weather: dict
+    fields: dict
+    # (our side conditions, opponent's side conditions)
+    side_conditions: tuple
+    weather_multipliers: np.ndarray
+    sand_rock_boost: bool
+    trick_room: bool
+    speed_order: SpeedOrder
+
+    def __init__(self, battle: DoubleBattle):
+        # the four active slots, then the Pokémon that can still switch in, then the fainted ones
+        battlers = [*battle.active_pokemon, *battle.opponent_active_pokemon]
+        sides = [ALLY, ALLY, FOE, FOE]
+        fainted = []
+        for side, team in ((ALLY, battle.team), (FOE, battle.opponent_team)):
+            for mon in team.values():
+                if mon in battlers:
+                    continue
+                if mon.fainted:
+                    fainted.append((side, mon))
+                else:
+                    battlers.append(mon)
+                    sides.append(side)
+        self.n_alive = len(battlers)
+        for side, mon in fainted:
+            battlers.append(mon)
+            sides.append(side)
+        self.battlers = battlers
+        self.side = np.array(sides)
+        self.active = np.arange(len(battlers)) < 4
+        self._index = {id(mon): i for i, mon in enumerate(battlers) if mon is not None}
+        self._collect_battlers()
+        self._collect_field(battle)
+
+    def __getstate__(self):
+        # Pokémon objects stay in the process that made the snapshot
+        return {name: getattr(self, name) for name in self.__slots__ if name not in ("battlers", "_index")}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.battlers = [None] * len(self.side)
+        self._index = {}
+
+    def __len__(self):
+        return len(self.side)
+
+    def index_of(self, battler: Pokemon) -> int | None:
+        """
+        returns the row of battler, None if it is not in the snapshot
+        :param battler:
+        :return:
+        """
+        return self._index.get(id(battler))
+
+    def _collect_battlers(self):
+        n = len(self.battlers)
+        self.present = np.array([mon is not None for mon in self.battlers])
+        self.fainted = np.zeros(n, dtype=bool)
+        self.level = np.full(n, 100.0)
+        self.types = np.full((n, 2), TypeChart.NO_TYPE)
+        self.stats = np.ones((n, len(STAT_KEYS)))
+        self.boosts = np.zeros((n, len(BOOST_KEYS)), dtype=int)
+        self.max_hp = np.zeros(n)
+        self.rough_max_hp = np.ones(n)
+        self.hp_fraction = np.zeros(n)
+        self.speed = np.zeros(n)
+        self.status = np.full(n, NO_STATUS)
+        self.first_turn = np.zeros(n, dtype=bool)
+        self.psychic_terrain = np.zeros(n, dtype=bool)
+        self.terrain = np.ones((n, TypeChart.N_TYPES))
+        self.abilities = [None] * n
+        self.items = [None] * n
+        self.modifiers = [Modifiers.NEUTRAL] * n
+        for i, mon in enumerate(self.battlers):
+            if mon is None:
+                continue
+            mon_stats = mon.stats
+            mon_boosts = mon.boosts
+            self.fainted[i] = mon.fainted
+            self.level[i] = mon.level
+            self.types[i] = TypeChart.type_ids(mon)
+            self.stats[i] = [mon_stats[stat] if mon_stats[stat] is not None else
+                             MoveUtilities.calc_non_hp_stat_value(mon.base_stats[stat], 31, 52, mon.level, 1)
+                             for stat in STAT_KEYS]
+            self.boosts[i] = [mon_boosts[stat] for stat in BOOST_KEYS]
+            self.max_hp[i] = mon.max_hp
+            self.rough_max_hp[i] = MoveUtilities.rough_max_hp(mon)
+            self.hp_fraction[i] = mon.current_hp_fraction
+            self.speed[i] = MoveUtilities.speed_calc(mon)
+            if mon.status is not None:
+                self.status[i] = mon.status.value
+            self.first_turn[i] = bool(mon.first_turn)
+            self.psychic_terrain[i] = bool(mon.effects.get(Effect.PSYCHIC_TERRAIN))
+            for pokemon_type, multiplier in MoveUtilities.terrain_type_multipliers(mon).items():
+                self.terrain[i, TypeChart.TYPE_ID[pokemon_type]] = multiplier
+            self.abilities[i] = mon.ability
+            self.items[i] = mon.item
+            self.modifiers[i] = Modifiers.of(mon)
+
+    def _collect_field(self, battle: DoubleBattle):
+        self.weather = dict(battle.weather)
+        self.fields = dict(battle.fields)
+        self.side_conditions = (dict(battle.side_conditions), dict(battle.opponent_side_conditions))
+        self.weather_multipliers = np.ones(TypeChart.N_TYPES)
+        for pokemon_type, multiplier in MoveUtilities.weather_type_multipliers(battle).items():
+            self.weather_multipliers[TypeChart.TYPE_ID[pokemon_type]] = multiplier
+        self.sand_rock_boost = MoveUtilities.weather_boosts_rock_special_defense(battle)
+        self.trick_room = battle.fields.get(Field.TRICK_ROOM) is not None
+        self.speed_order = SpeedOrder(self.speed, self.trick_room)
@@ -4,6 +4,8 @@ from typing import List
 from poke_env.environment import Move, Pokemon, DoubleBattle
 from poke_env.environment.move_category import MoveCategory
 
+import TypeChart
+
 
 def calculate_damage(move, attacker, defender, pessimistic, is_bot_turn):
     if defender is None:
@@ -33,7 +35,7 @@ def calculate_damage(move, attacker, defender, pessimistic, is_bot_turn):
         damage = damage * 0.85
     if move.type == attacker.type_1 or move.type == attacker.type_2:
         damage = damage * 1.5
-    type_multiplier = defender.damage_multiplier(move)
+    type_multiplier = TypeChart.damage_multiplier(defender, move)
     damage = damage * type_multiplier
     # print(f"Damage calculation for move {move} against opponent {battle.opponent_active_pokemon} is {damage}")
     return damage
@@ -105,11 +107,11 @@ def calculate_total_HP(pokemon, is_dynamaxed):
 def get_defensive_type_multiplier(my_pokemon, opponent_pokemon):
     multiplier = 1
     first_type = opponent_pokemon.type_1
-    first_multiplier = my_pokemon.damage_multiplier(first_type)
+    first_multiplier = TypeChart.damage_multiplier(my_pokemon, first_type)
     second_type = opponent_pokemon.type_2
     if second_type is None:
         return first_multiplier
-    second_multiplier = my_pokemon.damage_multiplier(second_type)
+    second_multiplier = TypeChart.damage_multiplier(my_pokemon, second_type)
     multiplier = first_multiplier if first_multiplier > second_multiplier else second_multiplier
     return multiplier
 
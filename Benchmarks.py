@@ -0,0 +1,258 @@
+"""
+micro benchmarks of the functions used by the players at every decision. The fixtures are the DoubleBattle seen by the
+players at each request of some seeded local battles (LocalSimulator) between the teams of Teams.RandomTeamFromPool
+and teams/base_team.txt, so they are the same at every run.
+
+usage:
+    python Benchmarks.py [--output FILE] [--compare BASELINE] [--threshold 0.25] [--repeat 5] [--cases PREFIX,...]
+        times every case and saves the results in FILE (json), with --compare the times are compared with the ones
+        saved in BASELINE and the exit code is 1 if a case got slower than threshold
+"""
+import argparse
+import contextlib
+import copy
+import io
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple
+
+import numpy as np
+from poke_env import PlayerConfiguration
+from poke_env.environment import DoubleBattle
+from tabulate import tabulate
+
+import AttackChooser
+import LocalSimulator
+import MoveUtilities
+import SwitchHelper
+from DamageCache import DamageCache
+from DoublesEquilibriumPlayer import DoublesEquilibriumPlayer
+from DoublesMaxDamagePlayer import DoublesMaxDamagePlayer
+from DoublesRandomPlayer import DoubleRandomPlayer
+from DoublesSearchPlayer import DoublesSearchPlayer
+from DoublesSmartPlayer import DoublesSmartPlayer
+from DoublesTrueMaxDamagePlayer import DoublesTrueMaxDamagePlayer
+from MatchupMatrix import MatchupMatrix
+from Teams import RandomTeamFromPool
+
+BATTLE_FORMAT = "gen8vgc2021"
+BASE_TEAM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "teams", "base_team.txt")
+# seeds of the battles of each pair of teams
+FIXTURE_SEEDS = (1, 2)
+
+
+# =============================================================================
+# fixtures
+# =============================================================================
+def teams() -> Dict[str, str]:
+    """
+    :return: name -> team in Showdown format
+    """
+    with open(BASE_TEAM, encoding="utf-8") as file:
+        base_team = file.read()
+    return {"team_1": RandomTeamFromPool.team_1, "team_2": RandomTeamFromPool.team_2, "base_team": base_team}
+
+
+def _make_player(cls, name: str, team=None, **kwargs):
+    return cls(
+        player_configuration=PlayerConfiguration(name, None),
+        battle_format=BATTLE_FORMAT,
+        team=team if team is not None else RandomTeamFromPool(),
+        start_listening=False,
+        **kwargs
+    )
+
+
+def _capture(player, fixtures: List[DoubleBattle]):
+    """
+    saves a copy of every battle player is asked to choose a move in
+    """
+    choose_move = player.choose_move
+
+    def capturing_choose_move(battle):
+        fixtures.append(copy.deepcopy(battle))
+        return choose_move(battle)
+
+    player.choose_move = capturing_choose_move
+
+
+def build_fixtures() -> List[DoubleBattle]:
+    """
+    :return: the battles seen by both sides at each request of the fixture battles
+    """
+    fixtures = []
+    team_list = list(teams().items())
+    for i, (name_1, team_1) in enumerate(team_list):
+        for name_2, team_2 in team_list[i + 1:]:
+            for seed in FIXTURE_SEEDS:
+                player = _make_player(DoublesMaxDamagePlayer, f"bench-{name_1}", team_1)
+                opponent = _make_player(DoublesMaxDamagePlayer, f"bench-{name_2}", team_2)
+                _capture(player, fixtures)
+                _capture(opponent, fixtures)
+                _seed(seed)
+                LocalSimulator.LocalBattle(player, opponent, seed=seed).run()
+    return fixtures
+
+
+def _seed(seed: int):
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+# =============================================================================
+# cases
+# =============================================================================
+class Case(NamedTuple):
+    name: str
+    function: Callable
+    # fixture -> arguments of the calls of function timed on the fixture
+    arguments: Callable
+
+
+def _moving_slots(battle: DoubleBattle):
+    """
+    :return: (slot, active pokémon, moves) of the slots that choose a move
+    """
+    if battle.teampreview or any(battle.force_switch):
+        return []
+    return [(idx, mon, moves) for idx, (mon, moves) in enumerate(zip(battle.active_pokemon, battle.available_moves))
+            if mon is not None and moves]
+
+
+def _move_pairs(battle: DoubleBattle):
+    return [(move, mon, target) for _, mon, moves in _moving_slots(battle) for move in moves
+            for target in battle.opponent_active_pokemon if target is not None]
+
+
+def _decisions(battle: DoubleBattle):
+    return [] if battle.teampreview else [(battle,)]
+
+
+def cases() -> List[Case]:
+    players = [
+        ("random", _make_player(DoubleRandomPlayer, "bench-random")),
+        ("maxdamage", _make_player(DoublesMaxDamagePlayer, "bench-maxdamage")),
+        ("truemax", _make_player(DoublesTrueMaxDamagePlayer, "bench-truemax")),
+        ("smart", _make_player(DoublesSmartPlayer, "bench-smart")),
+        # without time limit the search does the same work at every run
+        ("search", _make_player(DoublesSearchPlayer, "bench-search", time_limit=float("inf"))),
+        ("equilibrium", _make_player(DoublesEquilibriumPlayer, "bench-equilibrium", time_limit=float("inf"))),
+    ]
+    return [
+        Case("rough_damage", MoveUtilities.rough_damage,
+             lambda battle: [(move, user, target, MoveUtilities.move_base_damage(move, user, target), battle)
+                             for move, user, target in _move_pairs(battle)]),
+        Case("get_max_damage_move", MoveUtilities.get_max_damage_move,
+             lambda battle: [(battle, mon, battle.opponent_active_pokemon, moves)
+                             for _, mon, moves in _moving_slots(battle)]),
+        Case("is_move_immune", MoveUtilities.is_move_immune, _move_pairs),
+        Case("speed_calc", MoveUtilities.speed_calc,
+             lambda battle: [(mon,) for mon in battle.all_active_pokemons if mon is not None]),
+        Case("AttackChooser.choose_moves", AttackChooser.choose_moves,
+             lambda battle: [(battle, idx) for idx, _, _ in _moving_slots(battle)]),
+        Case("SwitchHelper.should_withdraw", SwitchHelper.should_withdraw,
+             lambda battle: [(battle, idx) for idx, _, _ in _moving_slots(battle)]),
+        Case("SwitchHelper.choose_possible_best_switch", SwitchHelper.choose_possible_best_switch,
+             lambda battle: [(battle, idx) for idx, switches in enumerate(battle.available_switches)
+                             if switches and not battle.teampreview]),
+    ] + [Case(f"{name}.choose_move", player.choose_move, _decisions) for name, player in players]
+
+
+# =============================================================================
+# timing
+# =============================================================================
+def run_case(case: Case, fixtures: List[DoubleBattle], repeat: int = 5) -> dict:
+    """
+    calls case.function with the arguments of all the fixtures, repeat times
+    :param case:
+    :param fixtures:
+    :param repeat:
+    :return: number of calls, best and median time of a call in microseconds
+    """
+    calls = [arguments for battle in fixtures for arguments in case.arguments(battle)]
+    function = case.function
+    times = []
+    for _ in range(repeat):
+        # the random choices of the players are the same at every repetition
+        _seed(0)
+        # and the caches of the battles are empty, as if each fixture was a new turn
+        for battle in fixtures:
+            DamageCache.drop(battle)
+            MatchupMatrix.drop(battle)
+        start = time.perf_counter()
+        for arguments in calls:
+            function(*arguments)
+        times.append(time.perf_counter() - start)
+    per_call = 1e6 / max(len(calls), 1)
+    return {
+        "calls": len(calls),
+        "best_us": min(times) * per_call,
+        "median_us": statistics.median(times) * per_call,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> (list, list):
+    """
+    :param results: cases of a run
+    :param baseline: cases of the baseline run
+    :param threshold: relative slowdown of the best time considered a regression
+    :return: table rows (case, baseline us, us, ratio) and names of the cases that regressed
+    """
+    rows = []
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["best_us"] / baseline[name]["best_us"] if baseline[name]["best_us"] else 1.0
+        rows.append([name, round(baseline[name]["best_us"], 2), round(result["best_us"], 2), round(ratio, 3)])
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="micro benchmarks of the decision path of the players")
+    parser.add_argument("--output", default="benchmarks.json", help="json file where the results are saved")
+    parser.add_argument("--compare", help="results of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.25, help="slowdown considered a regression")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cases", help="comma separated prefixes of the cases to run")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    with contextlib.redirect_stdout(io.StringIO()):
+        fixtures = build_fixtures()
+    selected = [case for case in cases()
+                if not args.cases or any(case.name.startswith(prefix) for prefix in args.cases.split(","))]
+    results = {}
+    for case in selected:
+        # the players print their reasoning
+        with contextlib.redirect_stdout(io.StringIO()):
+            results[case.name] = run_case(case, fixtures, args.repeat)
+    print(f"{len(fixtures)} fixtures")
+    print(tabulate([[name, result["calls"], round(result["best_us"], 2), round(result["median_us"], 2)]
+                    for name, result in results.items()], headers=["case", "calls", "best us", "median us"]))
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump({"python": platform.python_version(), "fixtures": len(fixtures), "repeat": args.repeat,
+                   "cases": results}, file, indent=1)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)["cases"]
+        rows, regressions = compare(results, baseline, args.threshold)
+        print(tabulate(rows, headers=["case", "baseline us", "us", "ratio"]))
+        if regressions:
+            print("regressions: " + ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
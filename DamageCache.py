@@ -0,0 +1,191 @@
+"""
+memo of the damage values of a battle across the turns: the result of MoveUtilities.calculate_damage /
+calculate_percentage_damage is stored under a fingerprint of exactly the inputs the formula reads (move, stats,
+boosts, types, item, ability, status of the two Pokémon, weather, number of active Pokémon and screens), so that
+the same two Pokémon trading the same hits turn after turn are computed once. Each battle has its own cache with a
+bounded LRU eviction, dropped when the battle ends
+"""
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable
+
+from poke_env.environment import DoubleBattle, Effect, Move, Pokemon, SideCondition
+from poke_env.environment.move_category import MoveCategory
+
+import Modifiers
+import MoveIndex
+
+# effects of the user / target read by the damage formula (terrain boosts, immunities)
+_USER_EFFECTS = frozenset({Effect.ELECTRIC_TERRAIN, Effect.PSYCHIC_TERRAIN, Effect.MISTY_TERRAIN})
+_TARGET_EFFECTS = _USER_EFFECTS | {Effect.SUBSTITUTE}
+_SCREENS = (SideCondition.AURORA_VEIL, SideCondition.REFLECT, SideCondition.LIGHT_SCREEN)
+
+# move id -> read_stats(move)
+_read_stats = {}
+# battle -> its DamageCache, read by the thread of a BatchScheduler while the event loop drops the finished battles
+_CACHES = weakref.WeakKeyDictionary()
+_CACHES_LOCK = threading.Lock()
+# hits, misses and evictions of the dropped caches
+_totals = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def read_stats(move: Move) -> (tuple, tuple):
+    """
+    :param move:
+    :return: stats of the user and of the target whose boosts are read by the damage of move (see rough_damage)
+    """
+    stats = _read_stats.get(move.id)
+    if stats is None:
+        info = MoveIndex.get(move)
+        special = move.category == MoveCategory.SPECIAL
+        if info.target_attack:  # Foul Play
+            user_stats, target_stats = (), ("atk",)
+        elif info.defense_as_attack:  # Body Press
+            user_stats, target_stats = ("def",), ()
+        else:
+            user_stats, target_stats = ("spa",) if special else ("atk",), ()
+        target_stats += ("spd",) if special and not info.targets_defense else ("def",)
+        if info.gyro_ball:
+            user_stats += ("spe",)
+            target_stats += ("spe",)
+        stats = _read_stats[move.id] = (user_stats, target_stats)
+    return stats
+
+
+def user_key(user: Pokemon, boosts: tuple) -> tuple:
+    """
+    :param user:
+    :param boosts: boosts read by the move, see read_stats
+    :return: state of the attacker read by the damage formula
+    """
+    user_boosts = user.boosts
+    return (user.species, user.level, user.type_1, user.type_2, user.item, user.ability, user.status,
+            user.first_turn, tuple(user_boosts[stat] for stat in boosts), tuple(user.stats.values()),
+            _USER_EFFECTS.intersection(user.effects))
+
+
+def target_key(target: Pokemon, boosts: tuple, halve_hp: bool) -> tuple:
+    """
+    :param target:
+    :param boosts: boosts read by the move, see read_stats
+    :param halve_hp: True for the moves dealing half of the target's HP, the only ones reading its HP
+    :return: state of the defender read by the damage formula
+    """
+    if halve_hp:
+        hp = (target.current_hp_fraction, target.max_hp)
+    elif Modifiers.of(target).multiscale:
+        hp = target.current_hp_fraction == 1
+    else:
+        hp = None
+    target_boosts = target.boosts
+    return (target.species, target.level, target.type_1, target.type_2, target.item, target.ability, target.status,
+            tuple(target_boosts[stat] for stat in boosts), tuple(target.stats.values()), hp,
+            _TARGET_EFFECTS.intersection(target.effects))
+
+
+def battle_key(battle: DoubleBattle, opponent_prospective: bool) -> tuple:
+    """
+    :return: state of the battle read by the damage formula: weather, active Pokémon (spread moves) and screens of
+        the side of the target
+    """
+    side_conditions = battle.side_conditions if opponent_prospective else battle.opponent_side_conditions
+    return (opponent_prospective, tuple(battle.weather), len(battle.active_pokemon),
+            len(battle.opponent_active_pokemon), tuple(screen in side_conditions for screen in _SCREENS))
+
+
+class DamageCache:
+    def __init__(self, max_size: int = 4096):
+        """
+        :param max_size: values kept, the least recently used are evicted
+        """
+        self.max_size = max_size
+        self._values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    @staticmethod
+    def key(kind: str, move: Move, user: Pokemon, target: Pokemon, battle: DoubleBattle,
+            opponent_prospective=False) -> tuple:
+        """
+        :param kind: name of the cached function
+        :return: fingerprint of the inputs of the damage of move used by user on target
+        """
+        user_boosts, target_boosts = read_stats(move)
+        return (kind, move.id, user_key(user, user_boosts),
+                target_key(target, target_boosts, MoveIndex.get(move).halve_hp),
+                battle_key(battle, opponent_prospective))
+
+    def lookup(self, key: tuple, compute: Callable[[], float]) -> float:
+        """
+        :param key: see DamageCache.key
+        :param compute: computes the value when it is not cached
+        :return:
+        """
+        value = self._values.get(key)
+        if value is not None:
+            self.hits += 1
+            self._values.move_to_end(key)
+            return value
+        self.misses += 1
+        value = self._values[key] = compute()
+        if len(self._values) > self.max_size:
+            self._values.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self._values)}
+
+    @staticmethod
+    def of(battle: DoubleBattle) -> "DamageCache":
+        """
+        :param battle:
+        :return: the DamageCache of battle, created the first time
+        """
+        with _CACHES_LOCK:
+            cache = _CACHES.get(battle)
+            if cache is None:
+                cache = _CACHES[battle] = DamageCache()
+            return cache
+
+    @staticmethod
+    def attach(battle: DoubleBattle, cache: "DamageCache"):
+        """
+        makes cache the DamageCache of battle, used when the same battle is rebuilt at every turn (DecisionPool)
+        """
+        with _CACHES_LOCK:
+            _CACHES[battle] = cache
+
+    @staticmethod
+    def drop(battle: DoubleBattle) -> "DamageCache | None":
+        """
+        drops the cache of battle, called when the battle ends
+        :return: the dropped cache, None if battle had none
+        """
+        with _CACHES_LOCK:
+            cache = _CACHES.pop(battle, None)
+            if cache is not None:
+                _totals["hits"] += cache.hits
+                _totals["misses"] += cache.misses
+                _totals["evictions"] += cache.evictions
+        return cache
+
+
+def totals() -> dict:
+    """
+    :return: hits, misses and evictions of all the caches of the process, hit_rate
+    """
+    with _CACHES_LOCK:
+        result = dict(_totals)
+        caches = list(_CACHES.values())
+    for cache in caches:
+        for name in _totals:
+            result[name] += getattr(cache, name)
+    lookups = result["hits"] + result["misses"]
+    result["hit_rate"] = result["hits"] / lookups if lookups else 0.0
+    return result
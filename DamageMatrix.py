@@ -0,0 +1,459 @@
+"""
+batched damage estimation: computes in one NumPy pass the damage that every battler on the field
+(the four active Pokémon and both benches) deals to every other battler with each of its moves.
+The values are the same returned by MoveUtilities.rough_damage / calculate_percentage_damage
+"""
+from typing import List, Optional
+
+import numpy as np
+from poke_env.environment import Move, Pokemon, DoubleBattle, Status, SideCondition
+from poke_env.environment.move_category import MoveCategory
+from poke_env.environment.pokemon_type import PokemonType
+
+import MoveIndex
+import MoveUtilities
+import BattleSnapshot
+import TypeChart
+
+# stage multipliers of MoveUtilities, as arrays indexed by the stages of all the battlers at once
+_STAGE_MUL = np.array(MoveUtilities._STAGE_MUL, dtype=float)
+_STAGE_DIV = np.array(MoveUtilities._STAGE_DIV, dtype=float)
+
+# columns of BattleSnapshot.stats
+_ATK, _DEF, _SPA, _SPD = range(4)
+
+# move categories
+_PHYSICAL, _SPECIAL, _STATUS = range(3)
+_CATEGORY_ID = {MoveCategory.PHYSICAL: _PHYSICAL, MoveCategory.SPECIAL: _SPECIAL, MoveCategory.STATUS: _STATUS}
+
+_MAX_MOVES = 4
+
+_BATTLER_FLAGS = ("has_status", "burned", "guts", "multiscale", "mold_breaker", "adaptability", "skill_link",
+                  "infiltrator", "first_turn", "wonder_guard", "psychic_terrain", "rock")
+# Modifiers multipliers stored for each battler
+_BATTLER_SCALES = ("attack", "physical_attack", "special_attack", "special_defense", "super_effective")
+_MOVE_FLAGS = ("fixed_damage", "halve_hp", "foul_play", "body_press", "psyshock", "facade", "fake_out", "gyro_ball",
+               "ignores_screens")
+# move id -> (type, category, priority, target, *_MOVE_FLAGS), filled the first time a move is seen
+_move_features = {}
+# (move id, base power, user has no item, user has skill link) -> MoveUtilities.move_base_damage
+_base_damages = {}
+
+# our side / opponent's side
+_ALLY, _FOE = BattleSnapshot.ALLY, BattleSnapshot.FOE
+
+
+def _get_move_features(move: Move) -> tuple:
+    """
+    returns the features of a move that do not depend on the battle
+    """
+    features = _move_features.get(move.id)
+    if features is None:
+        info = MoveIndex.get(move)
+        features = (TypeChart.TYPE_ID[move.type], _CATEGORY_ID[move.category], bool(move.priority), move.target,
+                    info.fixed_damage, info.halve_hp, info.target_attack, info.defense_as_attack,
+                    info.targets_defense, info.facade, info.fake_out, info.gyro_ball, info.ignores_screens)
+        _move_features[move.id] = features
+    return features
+
+
+def _get_base_damage(move: Move, user: Pokemon, skill_link: bool) -> float:
+    """
+    returns MoveUtilities.move_base_damage for every move but Gyro Ball (the only one depending on the target)
+    """
+    key = (move.id, move.base_power, user.item is None, skill_link)
+    base_damage = _base_damages.get(key)
+    if base_damage is None:
+        base_damage = MoveUtilities.move_base_damage(move, user, user)
+        _base_damages[key] = base_damage
+    return base_damage
+
+
+def _screen_multipliers(side_conditions) -> np.ndarray:
+    """
+    returns the damage multiplier given by the screens of a side for each move category
+    (same values of MoveUtilities.eval_side_conditions)
+    """
+    multipliers = np.ones(3)
+    if side_conditions.get(SideCondition.AURORA_VEIL):
+        multipliers[:] = 2 / 3.0
+    else:
+        if side_conditions.get(SideCondition.REFLECT):
+            multipliers[_PHYSICAL] = 2 / 3.0
+        if side_conditions.get(SideCondition.LIGHT_SCREEN):
+            multipliers[_SPECIAL] = 2 / 3.0
+    return multipliers
+
+
+class DamageMatrix:
+    """
+    damage dealt by every battler with every one of its moves to every battler, computed once per turn.
+    battlers are indexed as: 0, 1 our active Pokémon, 2, 3 opponent's active Pokémon, then our bench
+    and the opponent's revealed bench. Empty active slots are kept as None so that the first four
+    indexes never change.
+    arrays are indexed as [attacker, move, target]; moves are the ones in attacker.moves, in order.
+    """
+    battlers: List[Optional[Pokemon]]
+    moves: List[List[Move]]
+    speed: np.ndarray
+    base_damage: np.ndarray
+    type_multiplier: np.ndarray
+    damage: np.ndarray
+    percentage: np.ndarray
+
+    def __init__(self, battle: DoubleBattle, snapshot: BattleSnapshot.BattleSnapshot = None):
+        if snapshot is None:
+            snapshot = BattleSnapshot.BattleSnapshot(battle)
+        self._prepare(snapshot)
+        features = _allocate(1, len(self.battlers))
+        self._fill(battle, snapshot, features, 0)
+        self._store(battle, _kernel(features), 0)
+
+    @staticmethod
+    def batch(battles: List[DoubleBattle], snapshots: List[BattleSnapshot.BattleSnapshot] = None) \
+            -> List["DamageMatrix"]:
+        """
+        builds the DamageMatrix of many battles with one pass of the kernel on their stacked states
+        :param battles:
+        :param snapshots: BattleSnapshot of each battle, built if None
+        :return: same matrices of DamageMatrix(battle, snapshot) for each battle
+        """
+        if snapshots is None:
+            snapshots = [BattleSnapshot.BattleSnapshot(battle) for battle in battles]
+        matrices = []
+        for snapshot in snapshots:
+            matrix = DamageMatrix.__new__(DamageMatrix)
+            matrix._prepare(snapshot)
+            matrices.append(matrix)
+        features = _allocate(len(battles), max((len(matrix.battlers) for matrix in matrices), default=0))
+        for b, (matrix, battle, snapshot) in enumerate(zip(matrices, battles, snapshots)):
+            matrix._fill(battle, snapshot, features, b)
+        results = _kernel(features)
+        for b, (matrix, battle) in enumerate(zip(matrices, battles)):
+            matrix._store(battle, results, b)
+        return matrices
+
+    def _prepare(self, snapshot: BattleSnapshot.BattleSnapshot):
+        # fainted Pokémon are left out
+        self.battlers = snapshot.battlers[:snapshot.n_alive]
+        self.moves = [list(mon.moves.values())[:_MAX_MOVES] if mon is not None else []
+                      for mon in self.battlers]
+        self._index = {id(mon): i for i, mon in enumerate(self.battlers) if mon is not None}
+        self._move_index = [{move.id: j for j, move in enumerate(moves)} for moves in self.moves]
+        self._side = snapshot.side[:snapshot.n_alive]
+        # (attacker, move) computed by the scalar path
+        self._fallback = []
+
+    # =============================================================================
+    # lookups
+    # =============================================================================
+    def index_of(self, battler: Pokemon) -> int | None:
+        """
+        returns the index of battler in the matrix, None if it is not in the matrix
+        :param battler:
+        :return:
+        """
+        return self._index.get(id(battler))
+
+    def _cell(self, move: Move, user: Pokemon, target: Pokemon, opponent_prospective):
+        user_idx = self._index.get(id(user))
+        target_idx = self._index.get(id(target))
+        if user_idx is None or target_idx is None:
+            return None
+        # the scalar functions take the screens of the side given by opponent_prospective
+        if opponent_prospective != (self._side[target_idx] == _ALLY):
+            return None
+        move_idx = self._move_index[user_idx].get(move.id)
+        if move_idx is None:
+            return None
+        return user_idx, move_idx, target_idx
+
+    def percentage_damage(self, move: Move, user: Pokemon, target: Pokemon, opponent_prospective=False) \
+            -> float | None:
+        """
+        returns the same value of MoveUtilities.calculate_percentage_damage,
+        None if the move, the user or the target are not in the matrix
+        :param move:
+        :param user:
+        :param target:
+        :param opponent_prospective:
+        :return:
+        """
+        cell = self._cell(move, user, target, opponent_prospective)
+        if cell is None:
+            return None
+        return float(self.percentage[cell])
+
+    def raw_damage(self, move: Move, user: Pokemon, target: Pokemon, opponent_prospective=False) -> float | None:
+        """
+        returns the same value of MoveUtilities.calculate_damage,
+        None if the move, the user or the target are not in the matrix
+        :param move:
+        :param user:
+        :param target:
+        :param opponent_prospective:
+        :return:
+        """
+        cell = self._cell(move, user, target, opponent_prospective)
+        if cell is None:
+            return None
+        return float(self.damage[cell])
+
+    def can_damage(self, battler: Pokemon, target: Pokemon) -> bool | None:
+        """
+        returns the same value of MoveUtilities.can_damage,
+        None if battler or target are not in the matrix
+        :param battler:
+        :param target:
+        :return:
+        """
+        user_idx = self._index.get(id(battler))
+        target_idx = self._index.get(id(target))
+        if user_idx is None or target_idx is None or len(self.moves[user_idx]) != len(battler.moves):
+            return None
+        return bool(self._can_damage[user_idx, target_idx])
+
+    # =============================================================================
+    # batched computation
+    # =============================================================================
+    def _fill(self, battle: DoubleBattle, snapshot: BattleSnapshot.BattleSnapshot, features: dict, b: int):
+        """
+        writes the state of battle in the row b of the stacked features (see _allocate)
+        """
+        n = len(self.battlers)
+        hp_fraction = snapshot.hp_fraction[:n]
+        features["present"][b, :n] = snapshot.present[:n]
+        features["stats"][b, :n] = snapshot.stats[:n]
+        features["boosts"][b, :n] = snapshot.boosts[:n, :len(BattleSnapshot.STAT_KEYS)]
+        features["level"][b, :n] = snapshot.level[:n]
+        features["types"][b, :n] = snapshot.types[:n]
+        features["max_hp"][b, :n] = snapshot.rough_max_hp[:n]
+        # moves halving HP use the real max HP when it is known
+        features["halve_hp"][b, :n] = np.where(snapshot.max_hp[:n] > 100, snapshot.max_hp[:n],
+                                               snapshot.rough_max_hp[:n])
+        features["hp_fraction"][b, :n] = hp_fraction
+        features["speed"][b, :n] = snapshot.speed[:n]
+        features["terrain"][b, :n] = snapshot.terrain[:n]
+        features["side"][b, :n] = self._side
+        features["weather"][b] = snapshot.weather_multipliers
+        features["sand_rock_boost"][b] = snapshot.sand_rock_boost
+        features["screens"][b] = [_screen_multipliers(side_conditions) for side_conditions in snapshot.side_conditions]
+
+        immune_types = features["immune_types"][b]
+        flags = features["flags"][b]
+        scales = features["scales"][b]
+        for i, modifiers in enumerate(snapshot.modifiers[:n]):
+            for pokemon_type in modifiers.immune_types:
+                immune_types[i, TypeChart.TYPE_ID[pokemon_type]] = True
+            flags[i] = (snapshot.status[i] != BattleSnapshot.NO_STATUS, snapshot.status[i] == Status.BRN.value,
+                        modifiers.guts, modifiers.multiscale and hp_fraction[i] == 1, modifiers.mold_breaker,
+                        modifiers.adaptability, modifiers.skill_link, modifiers.infiltrator,
+                        snapshot.first_turn[i], modifiers.wonder_guard, snapshot.psychic_terrain[i],
+                        TypeChart.TYPE_ID[PokemonType.ROCK] in snapshot.types[i])
+            scales[i] = [getattr(modifiers, name) for name in _BATTLER_SCALES]
+
+        # per (attacker, move) features
+        skill_link = flags[:, _BATTLER_FLAGS.index("skill_link")]
+        valid = features["valid"][b]
+        base_power = features["base_power"][b]
+        base_damage = features["base_damage"][b]
+        move_features = features["move_features"][b]
+        hits = features["hits"][b]
+        spread_targets = {}
+        for i, moves in enumerate(self.moves):
+            mon = self.battlers[i]
+            for j, move in enumerate(moves):
+                static_features = _get_move_features(move)
+                target = static_features[3]
+                if target not in spread_targets:
+                    spread_targets[target] = MoveUtilities.multiple_targets(move, battle)
+                move_features[i, j] = (*static_features[:3], spread_targets[target], *static_features[4:])
+                valid[i, j] = True
+                base_power[i, j] = move.base_power
+                if MoveIndex.get(move).gyro_ball:
+                    # the only base damage that depends on the target, see move_base_damage
+                    hits[i, j] = move.n_hit[1] if skill_link[i] else move.expected_hits
+                else:
+                    base_damage[i, j] = _get_base_damage(move, mon, skill_link[i])
+                    if static_features[1] == _STATUS and base_damage[i, j] != 0:
+                        # rare mechanics handled only by the scalar path
+                        self._fallback.append((i, j))
+
+    def _store(self, battle: DoubleBattle, results: dict, b: int):
+        """
+        keeps the results of the kernel for the battle in row b
+        """
+        n = len(self.battlers)
+        damage = results["damage"][b, :n, :, :n]
+        for i, j in self._fallback:
+            for k, target in enumerate(self.battlers):
+                damage[i, j, k] = MoveUtilities.calculate_damage(self.moves[i][j], self.battlers[i], target, battle,
+                                                                 self._side[k] == _ALLY) if target else 0
+        max_hp = results["max_hp"][b, :n]
+        self.speed = results["speed"][b, :n]
+        self.base_damage = results["base_damage"][b, :n, :, :n]
+        self.type_multiplier = results["type_multiplier"][b, :n, :, :n]
+        self.damage = damage
+        self.percentage = np.where(damage <= 0, 0, damage / max_hp[None, None, :] * 100)
+        self._can_damage = ((self.base_damage >= 70) & (self.type_multiplier > 1)
+                            & results["valid"][b, :n, :, None]).any(axis=1)
+
+
+def _allocate(size: int, n: int) -> dict:
+    """
+    :param size: number of battles
+    :param n: number of battlers of the largest battle
+    :return: features of size battles with n battlers each, the missing battlers are not present
+    """
+    shape = (size, n, _MAX_MOVES)
+    move_features = np.zeros(shape + (4 + len(_MOVE_FLAGS),), dtype=int)
+    move_features[..., 1] = _STATUS
+    return {
+        "present": np.zeros((size, n), dtype=bool),
+        "stats": np.zeros((size, n, 4)),
+        "boosts": np.zeros((size, n, len(BattleSnapshot.STAT_KEYS)), dtype=int),
+        "level": np.zeros((size, n)),
+        "types": np.zeros((size, n, 2), dtype=int),
+        # 1 so that the percentages of the missing battlers are not divided by 0
+        "max_hp": np.ones((size, n)),
+        "halve_hp": np.zeros((size, n)),
+        "hp_fraction": np.zeros((size, n)),
+        "speed": np.zeros((size, n)),
+        "terrain": np.ones((size, n, TypeChart.N_TYPES)),
+        "side": np.zeros((size, n), dtype=int),
+        "weather": np.ones((size, TypeChart.N_TYPES)),
+        "sand_rock_boost": np.zeros(size, dtype=bool),
+        "screens": np.ones((size, 2, 3)),
+        "immune_types": np.zeros((size, n, TypeChart.N_TYPES), dtype=bool),
+        "flags": np.zeros((size, n, len(_BATTLER_FLAGS)), dtype=bool),
+        "scales": np.ones((size, n, len(_BATTLER_SCALES))),
+        "valid": np.zeros(shape, dtype=bool),
+        "base_power": np.zeros(shape),
+        "base_damage": np.zeros(shape),
+        "move_features": move_features,
+        "hits": np.ones(shape),
+    }
+
+
+def _kernel(features: dict) -> dict:
+    """
+    damage formula of rough_damage on the stacked features of many battles (see _allocate)
+    :return: arrays indexed as [battle, attacker, move, target]: base_damage, type_multiplier, damage;
+        per battler: speed, max_hp; per (battle, attacker, move): valid
+    """
+    size, n = features["present"].shape
+    present = features["present"]
+    raw_stats = features["stats"]
+    level = features["level"]
+    type_1, type_2 = features["types"][..., 0], features["types"][..., 1]
+    max_hp = features["max_hp"]
+    speed = features["speed"]
+    immune_types = features["immune_types"]
+    flags = dict(zip(_BATTLER_FLAGS, np.moveaxis(features["flags"], 2, 0)))
+    scales = dict(zip(_BATTLER_SCALES, np.moveaxis(features["scales"], 2, 0)))
+
+    stages = features["boosts"] + 6
+    stats = raw_stats * _STAGE_MUL[stages] / _STAGE_DIV[stages]
+
+    # defensive type chart row of every battler: effectiveness[battle, target, move type]
+    effectiveness = TypeChart.DUAL_CHART[type_1, type_2]
+
+    # ---------- per (attacker, move) features ----------
+    valid = features["valid"]
+    base_power = features["base_power"]
+    hits = features["hits"]
+    move_features = features["move_features"]
+    move_type = move_features[..., 0]
+    category = move_features[..., 1]
+    priority = move_features[..., 2].astype(bool)
+    spread = move_features[..., 3].astype(bool)
+    move_flags = {name: move_features[..., 4 + k].astype(bool) for k, name in enumerate(_MOVE_FLAGS)}
+    stab = (move_type == type_1[..., None]) | (move_type == type_2[..., None])
+
+    # ---------- (battle, attacker, move, target) ----------
+    a = (slice(None), slice(None), slice(None), None)  # per (attacker, move) -> broadcast on targets
+    u = (slice(None), slice(None), None, None)  # per attacker
+    t = (slice(None), None, None, slice(None))  # per target
+    shape = (size, n, _MAX_MOVES, n)
+    # indexes gathering a per target feature for each (attacker, move)
+    battle_idx = np.arange(size)[:, None, None, None]
+    target_idx = np.arange(n)[None, None, None, :]
+
+    base_damage = np.broadcast_to(features["base_damage"][a], shape).copy()
+    gyro = np.maximum(np.minimum(25 * speed[t] / np.where(speed > 0, speed, 1)[u], 150), 1) * hits[a]
+    base_damage = np.where(move_flags["gyro_ball"][a], gyro, base_damage)
+
+    type_mod = effectiveness[battle_idx, target_idx, move_type[a]]
+    physical = (category == _PHYSICAL)[a]
+    special = (category == _SPECIAL)[a]
+
+    immune = ~present[t] | ~present[u]
+    immune = immune | ((base_power > 0)[a] & (type_mod == 0))
+    immune = immune | (move_flags["fake_out"] & flags["first_turn"][..., None])[a]
+    immune = immune | immune_types[battle_idx, target_idx, move_type[a]]
+    immune = immune | ((base_power > 0)[a] & (type_mod <= 1) & flags["wonder_guard"][t])
+    immune = immune | (priority[a] & flags["psychic_terrain"][t])
+
+    # attack and defense stats
+    attack_stat = np.select([move_flags["body_press"], category == _SPECIAL], [_DEF, _SPA], _ATK)
+    attack = np.take_along_axis(stats, attack_stat, axis=2)[a]
+    attack = np.where(move_flags["foul_play"][a], stats[..., _ATK][t], attack)
+    defense_stat = np.where((category == _SPECIAL) & ~move_flags["psyshock"], _SPD, _DEF)
+    defense = stats[battle_idx, target_idx, defense_stat[a]]
+
+    # multipliers, applied in the same order of rough_damage
+    base_multiplier = type_mod.copy()
+    attack_multiplier = np.ones(shape)
+    defense_multiplier = np.ones(shape)
+    final_multiplier = np.ones(shape)
+
+    attack_multiplier = attack_multiplier * scales["attack"][u]
+    base_multiplier = np.where(type_mod >= 2, base_multiplier * scales["super_effective"][u], base_multiplier)
+
+    attack_multiplier = np.where(special, attack_multiplier * scales["special_attack"][u], attack_multiplier)
+    defense_multiplier = np.where(special, defense_multiplier * scales["special_defense"][t], defense_multiplier)
+
+    attack_multiplier = np.where(physical, attack_multiplier * scales["physical_attack"][u], attack_multiplier)
+    statused = physical & flags["has_status"][u]
+    attack_multiplier = np.where(statused & flags["guts"][u], attack_multiplier * 1.5, attack_multiplier)
+    base_multiplier = np.where(statused & move_flags["facade"][a], base_multiplier * 2, base_multiplier)
+    defense_multiplier = np.where(physical & flags["multiscale"][t] & ~flags["mold_breaker"][u],
+                                  defense_multiplier * 2, defense_multiplier)
+
+    base_multiplier = base_multiplier * np.take_along_axis(features["terrain"], move_type, axis=2)[a]
+
+    final_multiplier = np.where(spread[a], final_multiplier * 0.75, final_multiplier)
+
+    weather = np.take_along_axis(features["weather"], move_type.reshape(size, -1), axis=1).reshape(move_type.shape)
+    final_multiplier = final_multiplier * weather[a]
+    sand_rock_boost = features["sand_rock_boost"][:, None, None, None]
+    defense_multiplier = np.where(sand_rock_boost & flags["rock"][t] & special & ~move_flags["psyshock"][a],
+                                  defense_multiplier * 1.5, defense_multiplier)
+
+    stab_multiplier = np.where(flags["adaptability"][..., None], 2, 1.5)
+    final_multiplier = np.where(stab[a], final_multiplier * stab_multiplier[a], final_multiplier)
+    final_multiplier = final_multiplier * type_mod
+
+    burned = physical & flags["burned"][u] & ~flags["guts"][u] & ~move_flags["facade"][a]
+    final_multiplier = np.where(burned, final_multiplier / 2, final_multiplier)
+
+    # screens[battle, side of the target, category of the move]
+    screen = features["screens"][battle_idx, features["side"][t], category[a]]
+    ignores_screens = (move_flags["ignores_screens"] | flags["infiltrator"][..., None])[a]
+    final_multiplier = np.where(ignores_screens, final_multiplier, final_multiplier * screen)
+
+    # main damage calculation
+    scaled_base = np.maximum(base_damage * base_multiplier, 1)
+    attack = np.maximum(attack * attack_multiplier, 1)
+    defense = np.maximum(defense * defense_multiplier, 1)
+    damage = ((((2.0 * level / 5) + 2)[u] * scaled_base * attack / defense) / 50) + 2
+    damage = np.maximum(damage * final_multiplier, 1)
+
+    damage = np.where((base_damage == 0) | (type_mod == 0), 0, damage)
+    damage = np.where(move_flags["halve_hp"][a], np.floor(features["halve_hp"] * features["hp_fraction"] / 2)[t],
+                      damage)
+    damage = np.where(move_flags["fixed_damage"][a], level[u], damage)
+    damage = np.where(immune | ~valid[a], 0, damage)
+
+    return {"speed": speed, "max_hp": max_hp, "valid": valid, "base_damage": np.where(valid[a], base_damage, 0),
+            "type_multiplier": type_mod, "damage": damage}
@@ -0,0 +1,200 @@
+"""
+decisions of a player evaluated in a pool of processes, so that the event loop of poke_env keeps reading the messages
+of the other battles while a heavy choose_move runs: the battle is pickled without the tables of poke_env (GenData:
+moves, pokedex, type chart, ...), which the workers already have, the worker rebuilds it and runs the decide of
+its own copy of the player, and the order goes back to the event loop as the text of the message. The time limit
+of the player counts from the arrival of the request, so the time waited in the queue of the pool is included.
+The workers stay alive between the decisions with the module level tables (TypeChart, MoveIndex, ...), the player
+(transposition table of DoublesSearchPlayer) and the DamageCache of the last battles they saw
+
+usage:
+    pool = DecisionPool(PlayerSpec(DoublesSearchPlayer, "search", {"time_limit": 2.0}), workers=4)
+    player = pool.player(player_configuration=..., server_configuration=..., team=...)
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import pickle
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from poke_env.data import GenData
+from poke_env.environment import DoubleBattle
+from poke_env.player.battle_order import BattleOrder
+
+from DamageCache import DamageCache
+from Instrumentation import metrics_of
+from ShardedEvaluation import PlayerSpec
+
+# tables of GenData shared by all the battles, not pickled
+_TABLES = ("moves", "natures", "pokedex", "type_chart", "learnset")
+# battles whose DamageCache is kept by a worker
+_MAX_BATTLES = 64
+
+
+# =============================================================================
+# pickling
+# =============================================================================
+def _shared_objects() -> dict:
+    """
+    :return: id of the GenData of the loaded generations and of their tables -> persistent id
+    """
+    shared = {}
+    # poke_env keeps the GenData of every generation loaded by from_gen
+    for gen, data in GenData._gen_data_per_gen.items():
+        shared[id(data)] = ("gen", gen)
+        for name in _TABLES:
+            table = getattr(data, name, None)
+            if table is not None:
+                shared[id(table)] = ("table", gen, name)
+    return shared
+
+
+class _BattlePickler(pickle.Pickler):
+    def __init__(self, file, shared: dict):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.shared = shared
+
+    def persistent_id(self, obj):
+        if isinstance(obj, logging.Logger):
+            return "logger", obj.name
+        if isinstance(obj, GenData):
+            return "gen", obj.gen
+        return self.shared.get(id(obj))
+
+
+class _BattleUnpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        if pid[0] == "logger":
+            return logging.getLogger(pid[1])
+        data = GenData.from_gen(pid[1])
+        return data if pid[0] == "gen" else getattr(data, pid[2])
+
+
+def dumps_battle(battle: DoubleBattle) -> bytes:
+    """
+    :param battle:
+    :return: battle pickled without the tables of poke_env
+    """
+    file = io.BytesIO()
+    _BattlePickler(file, _shared_objects()).dump(battle)
+    return file.getvalue()
+
+
+def loads_battle(data: bytes) -> DoubleBattle:
+    """
+    :param data: see dumps_battle
+    :return: copy of the battle, sharing the tables of poke_env of this process
+    """
+    return _BattleUnpickler(io.BytesIO(data)).load()
+
+
+class RemoteOrder(BattleOrder):
+    """
+    order chosen by a worker, only its message crosses the processes
+    """
+
+    def __init__(self, message: str):
+        self._message = message
+
+    @property
+    def message(self) -> str:
+        return self._message
+
+    def __str__(self) -> str:
+        return self._message
+
+
+# =============================================================================
+# worker
+# =============================================================================
+# state of the worker process, set by _init_worker
+_player = None
+# battle tag -> DamageCache of the battle, least recently used first
+_caches = OrderedDict()
+
+
+def _init_worker(spec: PlayerSpec):
+    global _player
+    from poke_env import PlayerConfiguration
+
+    # the player is created once, with the tables its modules build at import
+    _player = spec.cls(player_configuration=PlayerConfiguration(spec.username, None), start_listening=False,
+                       **spec.kwargs)
+
+
+def _decide(data: bytes, arrival: float) -> (str, float):
+    """
+    :param data: battle pickled by dumps_battle
+    :param arrival: time.time() when the request arrived to the event loop (perf_counter is not shared by the
+        processes)
+    :return: message of the order chosen by the player of the worker, seconds of the decision
+    """
+    start = time.perf_counter()
+    # queue, pickling and transfer are taken from the time limit of the player
+    started = start - max(time.time() - arrival, 0)
+    battle = loads_battle(data)
+    cache = _caches.pop(battle.battle_tag, None)
+    if cache is None:
+        cache = DamageCache()
+    _caches[battle.battle_tag] = cache
+    if len(_caches) > _MAX_BATTLES:
+        _caches.popitem(last=False)
+    # the battle is a new object at every turn, the cache of its tag is reused
+    DamageCache.attach(battle, cache)
+    order = _player.decide(battle, started=started)
+    return order.message, time.perf_counter() - start
+
+
+# =============================================================================
+# pool
+# =============================================================================
+class DecisionPool:
+    def __init__(self, spec: PlayerSpec, workers: int = None):
+        """
+        :param spec: player whose decisions are evaluated, each worker creates a copy of it
+        :param workers: number of processes, os.cpu_count() if None
+        """
+        self.spec = spec
+        self.workers = workers or os.cpu_count()
+        # spawn: poke_env runs its event loop in a thread, which a forked process would not have
+        self._executor = ProcessPoolExecutor(self.workers, multiprocessing.get_context("spawn"),
+                                             initializer=_init_worker, initargs=(spec,))
+
+    def player(self, **kwargs):
+        """
+        :param kwargs: arguments of spec.cls besides the ones of spec (player_configuration, server_configuration,
+            team, ...)
+        :return: player whose decisions are evaluated by the pool
+        """
+        return self.spec.cls(decision_pool=self, **self.spec.kwargs, **kwargs)
+
+    async def choose_move(self, player, battle: DoubleBattle) -> BattleOrder:
+        """
+        awaited by poke_env in place of the order of player
+        :param player: player of the event loop, its metrics record the latency seen by the loop and the one of the
+            worker
+        :param battle:
+        :return:
+        """
+        start = time.perf_counter()
+        arrival = time.time()
+        data = dumps_battle(battle)
+        message, seconds = await asyncio.wrap_future(self._executor.submit(_decide, data, arrival))
+        metrics = metrics_of(player)
+        metrics.record("choose_move", seconds)
+        metrics.record("offloaded_choose_move", time.perf_counter() - start)
+        metrics.maybe_dump()
+        return RemoteOrder(message)
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
@@ -0,0 +1,48 @@
+import random
+import time
+
+from poke_env.environment import DoubleBattle
+from poke_env.player.battle_order import BattleOrder
+
+import MatrixGame
+from DoublesSearchPlayer import DoublesSearchPlayer
+from Instrumentation import record_stage
+from TurnContext import TurnContext
+
+# joint actions below this probability in the strategy of the solver are left out, noise of the approximation
+_MIN_PROBABILITY = 0.02
+
+
+class DoublesEquilibriumPlayer(DoublesSearchPlayer):
+    """
+    plays the turn as a simultaneous game instead of assuming the opponent's reply: the joint actions of both sides
+    are scored against each other in a payoff matrix and our action is drawn from an approximate mixed equilibrium
+    (see MatrixGame). Forced switches and slots the matrix has nothing to say about are handled as in
+    DoublesSmartPlayer
+    """
+
+    def __init__(self, *args, iterations=256, time_limit=0.2, table_size=0, **kwargs):
+        """
+        :param iterations: maximum iterations of regret matching
+        :param time_limit: seconds available to each decision from the arrival of the request, the iterations stop
+            at the deadline
+        :param table_size: see DoublesSearchPlayer, the matrix doesn't use the transposition table
+        """
+        super().__init__(*args, time_limit=time_limit, table_size=table_size, **kwargs)
+        self.iterations = iterations
+
+    def _choose_move(self, battle: DoubleBattle, context: TurnContext) -> BattleOrder:
+        if any(battle.force_switch):
+            return super()._choose_move(battle, context)
+        if self._out_of_time():
+            return self._max_damage_orders(battle, context)
+
+        context.stage = "equilibrium"
+        start = time.perf_counter()
+        actions, strategy, _ = MatrixGame.solve(context, self.iterations, self._deadline)
+        weights = [probability if probability >= _MIN_PROBABILITY else 0 for probability in strategy.tolist()]
+        if not any(weights):
+            weights = strategy.tolist()
+        chosen = random.choices(actions, weights)[0]
+        record_stage(self.metrics, "equilibrium", start, chosen)
+        return self._joint_orders(battle, context, chosen)
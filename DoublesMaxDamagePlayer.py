@@ -10,9 +10,12 @@ from poke_env.player.player import Player
 from poke_env.player.battle_order import BattleOrder, DoubleBattleOrder, DefaultBattleOrder
 
 import BattleUtilities
+import TypeChart
+from Instrumentation import timed
 
 
 class DoublesMaxDamagePlayer(Player):
+    @timed("choose_move")
     def choose_move(self, battle) -> BattleOrder:
         # return self.choose_random_doubles_move(battle)
         active_orders = [[], []]
@@ -96,24 +99,25 @@ class DoublesMaxDamagePlayer(Player):
         a_on_b = b_on_a = -np.inf
         for type_ in mon_a.types:
             if type_:
-                a_on_b = max(a_on_b, mon_b.damage_multiplier(type_))
+                a_on_b = max(a_on_b, TypeChart.damage_multiplier(mon_b, type_))
 
         # We do the same for mon_b over mon_a
         for type_ in mon_b.types:
             if type_:
-                b_on_a = max(b_on_a, mon_a.damage_multiplier(type_))
+                b_on_a = max(b_on_a, TypeChart.damage_multiplier(mon_a, type_))
         # Our performance metric is the different between the two
         return a_on_b - b_on_a
 
+    @timed("teampreview")
     def teampreview(self, battle):
+        # performance of each of our pokémon against each opponent, computed in a single table lookup
+        performance = TypeChart.teampreview_performance(list(battle.team.values()),
+                                                        list(battle.opponent_team.values()))
         mon_performance = {}
         # For each of our pokémon
-        for i, mon in enumerate(battle.team.values()):
+        for i in range(len(performance)):
             # We store their average performance against the opponent team
-            mon_performance[i] = np.mean([
-                self.teampreview_performance(mon, opp)
-                for opp in battle.opponent_team.values()
-            ])
+            mon_performance[i] = np.mean(performance[i])
 
         # We sort our mons by performance
         ordered_mons = sorted(mon_performance, key=lambda k: -mon_performance[k])
@@ -8,9 +8,12 @@ import numpy as np
 from poke_env.player.player import Player
 from poke_env.player.battle_order import BattleOrder, DoubleBattleOrder, DefaultBattleOrder
 
+from Instrumentation import timed
+
 
 class DoubleRandomPlayer(Player):
 
+    @timed("choose_move")
     def choose_move(self, battle) -> BattleOrder:
         active_orders = [[], []]
 
@@ -58,6 +61,10 @@ class DoubleRandomPlayer(Player):
             return DefaultBattleOrder()
         #return self.choose_random_doubles_move(battle)
 
+    @timed("teampreview")
+    def teampreview(self, battle):
+        return super().teampreview(battle)
+
 
 
 def teampreview(self, battle):
@@ -0,0 +1,151 @@
+import time
+from collections import Counter
+
+from poke_env.environment import DoubleBattle
+from poke_env.player.battle_order import BattleOrder, DoubleBattleOrder, DefaultBattleOrder
+
+import GameNode
+import MoveHelper
+import MoveUtilities
+from DoublesSmartPlayer import DoublesSmartPlayer
+from TranspositionTable import TranspositionTable
+from TurnContext import TurnContext
+
+
+class DoublesSearchPlayer(DoublesSmartPlayer):
+    """
+    chooses the actions of both slots together with an expectiminimax search (see GameNode), deepened one turn
+    at a time until the time limit: the answer is the one of the deepest search completed.
+    Forced switches and slots the search has nothing to say about are handled as in DoublesSmartPlayer
+    """
+
+    def __init__(self, *args, search_depth=2, time_limit=1.0, table_size=1 << 16, **kwargs):
+        """
+        :param search_depth: maximum number of turns explored by the search
+        :param time_limit: seconds available to each decision from the arrival of the request, so that many
+            concurrent battles still answer within the turn timer. If not even the search of one turn ends in time
+            the strongest attacks are used (MoveUtilities.get_max_damage_move)
+        :param table_size: entries of the transposition table, 0 to search without it
+        """
+        super().__init__(*args, **kwargs)
+        self.search_depth = search_depth
+        self.time_limit = time_limit
+        # shared by the searches of all the battles, hits/misses/evictions in transposition_table.stats()
+        self.transposition_table = TranspositionTable(table_size) if table_size else None
+        # nodes generated by the searches
+        self.search_nodes = 0
+        # number of decisions by depth of the deepest search completed (0 for the max damage fallback)
+        self.completed_depths = Counter()
+        self._deadline = None
+
+    def decide(self, battle, context: TurnContext = None, started: float = None) -> BattleOrder:
+        # the snapshot and the damage matrix are built in the time limit too, unless context is given; the time
+        # waited before (DecisionPool queue, BatchScheduler window) counts
+        self._deadline = (started if started is not None else time.perf_counter()) + self.time_limit
+        return super().decide(battle, context, started)
+
+    def _choose_move(self, battle: DoubleBattle, context: TurnContext) -> BattleOrder:
+        if any(battle.force_switch):
+            return super()._choose_move(battle, context)
+
+        if self._out_of_time():
+            return self._max_damage_orders(battle, context)
+
+        context.stage = "search"
+        if self.transposition_table is not None:
+            self.transposition_table.new_search()
+        root = GameNode.GameNode.root(context, self._deadline, self.transposition_table)
+        actions, value, depth = GameNode.iterative_search(root, self.search_depth)
+        self.search_nodes += root.space.nodes
+        self.completed_depths[depth] += 1
+        if actions is None:
+            self.metrics.outcome("max_damage_fallback")
+            return self._max_damage_orders(battle, context)
+        self.metrics.outcome("search")
+        return self._joint_orders(battle, context, actions)
+
+    def _out_of_time(self) -> bool:
+        """
+        :return: True if the time limit was used up before the decision started (waiting in a queue), the fallback
+            is counted
+        """
+        if time.perf_counter() < self._deadline:
+            return False
+        self.completed_depths[0] += 1
+        self.metrics.outcome("max_damage_fallback")
+        return True
+
+    @staticmethod
+    def _joint_orders(battle: DoubleBattle, context: TurnContext, actions) -> BattleOrder:
+        """
+        converts a joint action of our side in the order of the turn, the slots the action passes are chosen by
+        MoveHelper.default_choose_command
+        :param battle:
+        :param context:
+        :param actions: one action for each of our slots (see GameNode.joint_actions)
+        :return:
+        """
+        active_orders = [None, None]
+        last_command = None
+        for action in actions:
+            idx = action[1]
+            mon = battle.active_pokemon[idx]
+            if mon is None:
+                continue
+            order = DoublesSearchPlayer._to_order(battle, context, action)
+            if order is None:
+                context.stage = "default"
+                order = MoveHelper.default_choose_command(battle, idx, last_command, context)
+            last_command = order.order
+            active_orders[idx] = order
+
+        orders = DoubleBattleOrder(*active_orders)
+        if orders:
+            return orders
+        else:
+            return DefaultBattleOrder()
+
+    @staticmethod
+    def _max_damage_orders(battle: DoubleBattle, context: TurnContext) -> BattleOrder:
+        """
+        fallback when the search ran out of time: each slot uses its most damaging move
+        :param battle:
+        :param context:
+        :return:
+        """
+        active_orders = [None, None]
+        for idx, (mon, moves) in enumerate(zip(battle.active_pokemon, battle.available_moves)):
+            if mon and moves:
+                move, target, damage = MoveUtilities.get_max_damage_move(battle, mon, battle.opponent_active_pokemon,
+                                                                         moves, context.damage_matrix)
+                active_orders[idx] = BattleOrder(move, move_target=target)
+        orders = DoubleBattleOrder(*active_orders)
+        if orders:
+            return orders
+        else:
+            return DefaultBattleOrder()
+
+    @staticmethod
+    def _to_order(battle: DoubleBattle, context: TurnContext, action) -> BattleOrder | None:
+        """
+        converts an action of the search in the order of one of our slots
+        :param battle:
+        :param context:
+        :param action:
+        :return: None if the search passed
+        """
+        kind, idx, value, target_slot = action
+        if kind == GameNode.SWITCH:
+            return BattleOrder(context.snapshot.battlers[value])
+        if kind != GameNode.MOVE:
+            return None
+        mon = battle.active_pokemon[idx]
+        move_id = context.damage_matrix.moves[context.snapshot.index_of(mon)][value].id
+        move = next((move for move in battle.available_moves[idx] if move.id == move_id), None)
+        if move is None:
+            return None
+        targets = context.possible_targets(move, mon)
+        target = battle.OPPONENT_1_POSITION + target_slot - 2
+        if target_slot == GameNode.NO_TARGET or target not in targets:
+            target = targets[0]
+        return BattleOrder(move, move_target=target)
@@ -1,17 +1,81 @@
+import threading
+import time
+from collections import Counter
+
 import numpy as np
 from poke_env.environment import DoubleBattle
 from poke_env.environment.pokemon import Pokemon
 from poke_env.player.battle_order import BattleOrder, DoubleBattleOrder, DefaultBattleOrder
 from poke_env.player.player import Player
 
+import JointChooser
 import MoveHelper
+from AttackChooser import choose_moves
+from DamageCache import DamageCache
+from Instrumentation import Metrics, record_stage, timed
+from MatchupMatrix import MatchupMatrix
+import TypeChart
 from SwitchHelper import choose_possible_best_switch
+from TurnContext import TurnContext
 
 
 class DoublesSmartPlayer(Player):
+    def __init__(self, *args, decision_pool=None, joint_moves=False, **kwargs):
+        """
+        :param decision_pool: DecisionPool evaluating the decisions in other processes or BatchScheduler deciding
+            the turns of many battles together, None to decide each turn at once in the event loop
+        :param joint_moves: if True the moves of the two slots are chosen together (see JointChooser), otherwise
+            each slot chooses its own
+        """
+        super().__init__(*args, **kwargs)
+        self.decision_pool = decision_pool
+        self.joint_moves = joint_moves
+        # guards the counters below, updated by the thread of a BatchScheduler and by the event loop
+        self.stats_lock = threading.Lock()
+        # facts reused / computed by each decision stage, summed over all the turns
+        self.context_hits = Counter()
+        self.context_misses = Counter()
+        # latency of choose_move, teampreview and the decision stages, see Instrumentation
+        self.metrics = Metrics(self.username)
+        # hits / misses of the damage caches of the finished battles, see DamageCache
+        self.damage_cache_stats = Counter()
+
     def choose_move(self, battle) -> BattleOrder:
+        if self.decision_pool is not None and isinstance(battle, DoubleBattle):
+            # awaited by poke_env, the event loop goes on with the other battles
+            return self.decision_pool.choose_move(self, battle)
+        return self.decide(battle)
+
+    @timed("choose_move")
+    def decide(self, battle, context: TurnContext = None, started: float = None) -> BattleOrder:
+        """
+        chooses the order of battle in this process
+        :param battle:
+        :param context: TurnContext of the turn, created if None
+        :param started: time.perf_counter() when the request arrived, now if None. Used by the players with a time
+            limit (DoublesSearchPlayer)
+        """
         if not isinstance(battle, DoubleBattle):
             return DefaultBattleOrder()
+        if context is None:
+            context = TurnContext(battle)
+        context.metrics = self.metrics
+        order = self._choose_move(battle, context)
+        with self.stats_lock:
+            self.context_hits.update(context.hits)
+            self.context_misses.update(context.misses)
+        return order
+
+    def _battle_finished_callback(self, battle):
+        super()._battle_finished_callback(battle)
+        # the battles stay in self._battles for the whole session, their tables are released when they end
+        MatchupMatrix.drop(battle)
+        cache = DamageCache.drop(battle)
+        if cache is not None:
+            with self.stats_lock:
+                self.damage_cache_stats.update(hits=cache.hits, misses=cache.misses, evictions=cache.evictions)
+
+    def _choose_move(self, battle: DoubleBattle, context: TurnContext) -> BattleOrder:
         # return self.choose_random_doubles_move(battle)
         active_orders = [[], []]
         last_command = None
@@ -19,9 +83,13 @@ class DoublesSmartPlayer(Player):
         forceSwitch = battle.force_switch
         if sum(forceSwitch) == 1:
             # print("only one to switch")
-            best_switch = choose_possible_best_switch(battle, 0)
+            context.stage = "force_switch"
+            best_switch = choose_possible_best_switch(battle, 0, context)
+            self.metrics.outcome("force_switch")
             # print(best_switch.__repr__)
             return self.create_order(best_switch)
+        if self.joint_moves:
+            return self._choose_joint_orders(battle, context)
         opponents = battle.opponent_active_pokemon
         for (
                 idx,
@@ -34,11 +102,13 @@ class DoublesSmartPlayer(Player):
         ):
             if mon:
                 if force_switch:
-                    best_switch = choose_possible_best_switch(battle, idx)
+                    context.stage = "force_switch"
+                    best_switch = choose_possible_best_switch(battle, idx, context)
+                    self.metrics.outcome("force_switch")
                     active_orders[idx] = BattleOrder(best_switch)
                     # print(mon.__str__())
                 else:
-                    order = MoveHelper.default_choose_command(battle, idx, last_command)
+                    order = MoveHelper.default_choose_command(battle, idx, last_command, context)
                     last_command = order.order
                     active_orders[idx] = order
 
@@ -49,6 +119,58 @@ class DoublesSmartPlayer(Player):
         else:
             return DefaultBattleOrder()
 
+    def _choose_joint_orders(self, battle: DoubleBattle, context: TurnContext) -> BattleOrder:
+        """
+        the stages before the moves (priority KO, Protect, switches) decide each slot, then the moves of the slots
+        left are chosen together knowing the order of the other slot (JointChooser); two slots never switch to the
+        same Pokémon
+        """
+        active_orders = [None, None]
+        free = []
+        last_switch = None
+        for idx, (mon, force_switch) in enumerate(zip(battle.active_pokemon, battle.force_switch)):
+            if not mon:
+                continue
+            if force_switch:
+                context.stage = "force_switch"
+                best_switch = choose_possible_best_switch(battle, idx, context, exclude=last_switch)
+                self.metrics.outcome("force_switch")
+                order = BattleOrder(best_switch) if best_switch is not None else None
+            else:
+                order = MoveHelper.choose_command_before_moves(battle, idx, last_switch, context)
+                if order is None:
+                    free.append(idx)
+            if order is not None and isinstance(order.order, Pokemon):
+                last_switch = order.order
+            active_orders[idx] = order
+
+        if free:
+            context.stage = "joint_moves"
+            start = time.perf_counter()
+            orders = JointChooser.choose_joint_moves(battle, active_orders, free, context)
+            record_stage(self.metrics, "joint_moves", start, orders)
+            if orders is not None:
+                active_orders = orders
+            else:
+                for idx in free:
+                    context.stage = "choose_moves"
+                    start = time.perf_counter()
+                    active_orders[idx] = choose_moves(battle, idx, context)
+                    record_stage(self.metrics, "choose_moves", start, active_orders[idx])
+
+        # choose_moves switches when no move is worth using
+        first, second = active_orders
+        if first is not None and second is not None and isinstance(first.order, Pokemon) \
+                and first.order is second.order:
+            switch = choose_possible_best_switch(battle, 1, context, exclude=first.order)
+            active_orders[1] = BattleOrder(switch) if switch is not None else None
+
+        orders = DoubleBattleOrder(*active_orders)
+        if orders:
+            return orders
+        else:
+            return DefaultBattleOrder()
+
     # --------------------------------------------------------------------------------------------------
 
     ###########################################################
@@ -58,24 +180,25 @@ class DoublesSmartPlayer(Player):
         a_on_b = b_on_a = -np.inf
         for type_ in mon_a.types:
             if type_:
-                a_on_b = max(a_on_b, mon_b.damage_multiplier(type_))
+                a_on_b = max(a_on_b, TypeChart.damage_multiplier(mon_b, type_))
 
         # We do the same for mon_b over mon_a
         for type_ in mon_b.types:
             if type_:
-                b_on_a = max(b_on_a, mon_a.damage_multiplier(type_))
+                b_on_a = max(b_on_a, TypeChart.damage_multiplier(mon_a, type_))
         # Our performance metric is the different between the two
         return a_on_b - b_on_a
 
+    @timed("teampreview")
     def teampreview(self, battle):
+        # performance of each of our pokémon against each opponent, computed in a single table lookup
+        performance = TypeChart.teampreview_performance(list(battle.team.values()),
+                                                        list(battle.opponent_team.values()))
         mon_performance = {}
         # For each of our pokémon
-        for i, mon in enumerate(battle.team.values()):
+        for i in range(len(performance)):
             # We store their average performance against the opponent team
-            mon_performance[i] = np.mean([
-                self.teampreview_performance(mon, opp)
-                for opp in battle.opponent_team.values()
-            ])
+            mon_performance[i] = np.mean(performance[i])
 
         # We sort our mons by performance
         ordered_mons = sorted(mon_performance, key=lambda k: -mon_performance[k])
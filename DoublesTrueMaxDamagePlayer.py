@@ -8,9 +8,13 @@ from poke_env.player.battle_order import BattleOrder, DoubleBattleOrder, Default
 
 import BattleUtilities
 import MoveUtilities
+import TypeChart
+from DamageMatrix import DamageMatrix
+from Instrumentation import timed
 
 
 class DoublesTrueMaxDamagePlayer(Player):
+    @timed("choose_move")
     def choose_move(self, battle) -> BattleOrder:
         # return self.choose_random_doubles_move(battle)
         active_orders = [[], []]
@@ -23,6 +27,8 @@ class DoublesTrueMaxDamagePlayer(Player):
             # print(best_switch.__repr__)
             return self.create_order(best_switch)
         opponents = battle.opponent_active_pokemon
+        # damage of every move of every battler, computed once for the whole turn
+        damage_matrix = DamageMatrix(battle)
         for (
                 idx,
                 (mon, switches, moves, force_switch),
@@ -40,7 +46,8 @@ class DoublesTrueMaxDamagePlayer(Player):
                     active_orders[idx] = BattleOrder(best_switch)
                     # print(mon.__str__())
                 else:
-                    (move, target, damage) = MoveUtilities.get_max_damage_move(battle, mon, opponents, moves)
+                    (move, target, damage) = MoveUtilities.get_max_damage_move(battle, mon, opponents, moves,
+                                                                                damage_matrix)
                     # print("move ", move, " target ", target,"predicted damage",damage)
                     active_orders[idx] = BattleOrder(move, move_target=target)
 
@@ -96,24 +103,25 @@ class DoublesTrueMaxDamagePlayer(Player):
         a_on_b = b_on_a = -np.inf
         for type_ in mon_a.types:
             if type_:
-                a_on_b = max(a_on_b, mon_b.damage_multiplier(type_))
+                a_on_b = max(a_on_b, TypeChart.damage_multiplier(mon_b, type_))
 
         # We do the same for mon_b over mon_a
         for type_ in mon_b.types:
             if type_:
-                b_on_a = max(b_on_a, mon_a.damage_multiplier(type_))
+                b_on_a = max(b_on_a, TypeChart.damage_multiplier(mon_a, type_))
         # Our performance metric is the different between the two
         return a_on_b - b_on_a
 
+    @timed("teampreview")
     def teampreview(self, battle):
+        # performance of each of our pokémon against each opponent, computed in a single table lookup
+        performance = TypeChart.teampreview_performance(list(battle.team.values()),
+                                                        list(battle.opponent_team.values()))
         mon_performance = {}
         # For each of our pokémon
-        for i, mon in enumerate(battle.team.values()):
+        for i in range(len(performance)):
             # We store their average performance against the opponent team
-            mon_performance[i] = np.mean([
-                self.teampreview_performance(mon, opp)
-                for opp in battle.opponent_team.values()
-            ])
+            mon_performance[i] = np.mean(performance[i])
 
         # We sort our mons by performance
         ordered_mons = sorted(mon_performance, key=lambda k: -mon_performance[k])
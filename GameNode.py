@@ -1,180 +1,429 @@
 # -*- coding: utf-8 -*-
-from poke_env.environment import Pokemon
-
-# This class will hold a single game-state, consisting of:
-# * Battle object that holds global game state
-# * Current Pokemon
-# * Current HP
-# * Opponent Pokemon
-# * Opponent Current HP
-# * An Action parameter that holds either an attack or Pokemon
-#   and represents the action taken to get to this state
-# * References to its child nodes 
-# * A numerical score (higher is better) 
-
-import BattleUtilities
-
-from poke_env.environment.move import Move
-
-
-class GameNode: 
-    battle = None
-    current_pokemon = None
-    current_HP = {}
-    opponent_pokemon = None
-    opponent_HP = {}
-    action = None
-    has_dynamaxed = False
-    currently_dynamaxed = False
-    opponent_has_dynamaxed = False
-    opponent_currently_dynamaxed = False
-    children = []
-    score = float('-inf')
-    parent_node = None
-    previous_action = None
-
-    def __init__(self, battle, current_pokemon, current_HP, opponent_pokemon, opponent_HP, action, has_dynamaxed, currently_dynamaxed, opponent_has_dynamaxed, opponent_currently_dynamaxed, score, parent_node, previous_action):
-        self.battle = battle
-        self.current_pokemon = current_pokemon
-        self.current_HP = current_HP
-        self.opponent_pokemon = opponent_pokemon
-        self.opponent_HP = opponent_HP
-        self.action = action
-        self.has_dynamaxed = has_dynamaxed
-        self.currently_dynamaxed = currently_dynamaxed
-        self.opponent_has_dynamaxed = opponent_has_dynamaxed
-        self.opponent_currently_dynamaxed = opponent_currently_dynamaxed
-        self.score = score
-        self.parent_node = parent_node
-        self.children = []
-        self.previous_action = previous_action
-
-
-    # This function should add child nodes for every legal move and switch you can perform
-    def generate_bot_moves(self):
-        self.add_bot_moves()
-        #self.add_bot_dynamax_moves()
-        if not self.battle.trapped and (not isinstance(self.previous_action, Pokemon) or self.battle.active_pokemon.current_hp <= 0):
-            self.add_bot_switches()
-        return self.children
-		
-    def add_bot_moves(self):
-		# Add children for every legal move
-        i = 0
-        if self.battle.active_pokemon is self.current_pokemon: 
-            for move in self.battle.available_moves:
-                if move.current_pp > 0:
-                    # Generate a child node with the move as the action
-                    i = i + 1
-                    self.children.append(GameNode(self.battle, self.current_pokemon, self.current_HP.copy(), self.opponent_pokemon, self.opponent_HP.copy(), move, self.has_dynamaxed, self.currently_dynamaxed, self.opponent_has_dynamaxed, self.opponent_currently_dynamaxed, self.score, self, self.previous_action))
-        else: 
-            for move in self.current_pokemon.moves.values():
-                if move.current_pp > 0: 
-                    # Generate a child node with the move as the action
-                    i = i + 1
-                    self.children.append(GameNode(self.battle, self.current_pokemon, self.current_HP.copy(), self.opponent_pokemon, self.opponent_HP.copy(), move, self.has_dynamaxed, self.currently_dynamaxed, self.opponent_has_dynamaxed, self.opponent_currently_dynamaxed, self.score, self, self.previous_action)) 
-		
-		
-    def add_bot_dynamax_moves(self):
-        i = 0
-		# Add every move with a Dynamax option
-        if self.battle.can_dynamax and not self.has_dynamaxed:
-            for move in self.battle.available_moves:
-                if move.current_pp > 0:
-                    self.children.append(GameNode(self.battle, self.current_pokemon, self.current_HP.copy(), self.opponent_pokemon, self.opponent_HP.copy(), move.dynamaxed, True, True, self.opponent_has_dynamaxed, self.opponent_currently_dynamaxed, self.score, self, self.previous_action))
-		
-
-    def add_bot_switches(self): 
-        # Add children for every legal switch
-        i = 0
-        for switch in self.battle.team.values():
-            if switch.current_hp > 0 and switch is not self.current_pokemon:
-                i = i + 1
-                self.children.append(GameNode(self.battle, switch, self.current_HP.copy(), self.opponent_pokemon, self.opponent_HP.copy(), switch, self.has_dynamaxed, False, self.opponent_has_dynamaxed, self.opponent_currently_dynamaxed, self.score, self, self.previous_action))
-        return self.children
-
-    # This function should add child nodes based on every move and switch the opponent can perform (that we can know about)
-    # This function should take into account the actions that the player made, and calculate new estimated HP values
-    def generate_opponent_moves(self): 
-        self.add_opponent_moves()
-        #self.add_opponent_dynamax_moves()
-        self.add_opponent_switches()
-         # If there are no moves for the opponent, add a "None" action and estimate damage from the bot's attack
-        if len(self.children) == 0:
-            self.add_opponent_default()
-        return self.children
-		
-    def add_opponent_moves(self):
-		# Add children for every move the opponent has that we know about
-        for move in self.opponent_pokemon.moves.values():
-            updated_current_HP = self.current_HP.copy()
-            updated_opponent_HP = self.opponent_HP.copy()
-            # If opponent outspeeds (or I switched this turn), start by calculating how much damage opponent does
-            if BattleUtilities.opponent_can_outspeed(self.current_pokemon, self.opponent_pokemon) or isinstance(self.action, Pokemon):
-                damage = BattleUtilities.calculate_damage(move, self.opponent_pokemon, self.current_pokemon, False, False)
-                damage_percentage = (damage / BattleUtilities.calculate_total_HP(self.current_pokemon, self.currently_dynamaxed)) * 100
-                updated_current_HP.update({self.current_pokemon : self.current_HP[self.current_pokemon] - damage })
-                # If my pokemon survives (and attacked this turn), calculcate damage
-                if isinstance(self.action, Move) and updated_current_HP[self.current_pokemon] > 0:
-                    damage = BattleUtilities.calculate_damage(self.action, self.current_pokemon, self.opponent_pokemon, True, True)
-                    damage_percentage = (damage / BattleUtilities.calculate_total_HP(self.opponent_pokemon, self.opponent_currently_dynamaxed)) * 100
-                    updated_opponent_HP.update({self.opponent_pokemon : self.opponent_HP[self.opponent_pokemon] - damage_percentage })
-            else: 
-                # I attack first, calculate damage
-                damage = BattleUtilities.calculate_damage(self.action, self.current_pokemon, self.opponent_pokemon, True, True)
-                damage_percentage = (damage / BattleUtilities.calculate_total_HP(self.opponent_pokemon, self.opponent_currently_dynamaxed)) * 100
-                updated_opponent_HP.update({self.opponent_pokemon : self.opponent_HP[self.opponent_pokemon] - damage_percentage})
-                # If opponent survices, calculate their damage as well
-                if updated_opponent_HP[self.opponent_pokemon] > 0: 
-                    damage = BattleUtilities.calculate_damage(move, self.opponent_pokemon, self.current_pokemon, False, False)
-                    damage_percentage = (damage / BattleUtilities.calculate_total_HP(self.current_pokemon, self.currently_dynamaxed)) * 100
-                    updated_current_HP.update({self.current_pokemon : self.current_HP[self.current_pokemon] - damage_percentage})
-            self.children.append(GameNode(self.battle, self.current_pokemon, updated_current_HP, self.opponent_pokemon, updated_opponent_HP, move, self.has_dynamaxed, self.currently_dynamaxed, self.opponent_has_dynamaxed, self.opponent_currently_dynamaxed, self.score, self, self.previous_action))
-
-    def add_opponent_dynamax_moves(self):
-        i = 0
-		# Add every move with a dynamax option
-        #if self.battle.opponent_can_dynamax and not self.opponent_has_dynamaxed:
-        #    for move in self.opponent_pokemon.moves.values():
-        #        updated_current_HP = self.current_HP
-        #        updated_opponent_HP = self.opponent_HP
-        #        # If opponent outspeeds (or I switched this turn), start by calculating how much damage opponent does
-        #        if BattleUtilities.opponent_can_outspeed(self.current_pokemon, self.opponent_pokemon) or isinstance(self.action, Pokemon):
-        #            damage = BattleUtilities.calculate_damage(move.dynamaxed, self.opponent_pokemon, self.current_pokemon, False, False)
-        #            damage_percentage = (damage / BattleUtilities.calculate_total_HP(self.current_pokemon, self.currently_dynamaxed)) * 100
-        #            updated_current_HP = self.current_HP - damage
-        #            # If my pokemon survives (and attacked this turn), calculate damage
-        #            if isinstance(self.action, Move) and updated_current_HP > 0:
-        #                damage = BattleUtilities.calculate_damage(self.action, self.current_pokemon, self.opponent_pokemon, True, True)
-        #                damage_percentage = (damage / BattleUtilities.calculate_total_HP(self.opponent_pokemon, True)) * 100
-        #                updated_opponent_HP = self.opponent_HP - damage_percentage
-        #        else:
-        #            # I attack first, calculate damage
-        #            damage = BattleUtilities.calculate_damage(move, self.current_pokemon, self.opponent_pokemon, True, True)
-        #            damage_percentage = (damage / BattleUtilities.calculate_total_HP(self.opponent_pokemon, self.opponent_currently_dynamaxed)) * 100
-        #            updated_opponent_HP = self.opponent_HP - damage_percentage
-        #            # If opponent survices, calculate their damage as well
-        #            if updated_opponent_HP > 0:
-        #                damage = BattleUtilities.calculate_damage(move, self.opponent_pokemon, self.current_pokemon, False, False)
-        #                damage_percentage = (damage / BattleUtilities.calculate_total_HP(self.current_pokemon, self.opponent_currently_dynamaxed)) * 100
-        #                updated_current_HP = self.current_HP - damage_percentage
-        #        self.children.append(GameNode(self.battle, self.current_pokemon, updated_current_HP, self.opponent_pokemon, updated_opponent_HP, move, self.has_dynamaxed, self.currently_dynamaxed, self.opponent_has_dynamaxed, self.opponent_currently_dynamaxed, self.score, self))
-	
-    def add_opponent_switches(self):
-		# Calculate all switches opponent can make
-        for switch in self.battle.opponent_team.values():
-            if switch is not None and switch is not self.opponent_pokemon and switch.current_hp:
-                if isinstance(self.action, Move):
-                    damage = BattleUtilities.calculate_damage(self.action, self.current_pokemon, switch, True, True)
-                    damage_percentage = (damage / BattleUtilities.calculate_total_HP(self.opponent_pokemon, False)) * 100
-                    updated_opponent_HP = switch.current_hp - damage_percentage
-                self.children.append(GameNode(self.battle, self.current_pokemon, self.current_HP.copy(), switch, self.opponent_HP.copy(), switch, self.has_dynamaxed, self.currently_dynamaxed, self.opponent_has_dynamaxed, False, self.score, self, self.previous_action))
-    
-    # If there are no moves for the opponent, add a "None" action and estimate damage from the bot's attack
-    def add_opponent_default(self):        
-        updated_opponent_HP = self.opponent_HP.copy()
-        if isinstance(self.action, Move):
-            damage = BattleUtilities.calculate_damage(self.action, self.current_pokemon, self.opponent_pokemon, True, True)
-            damage_percentage = (damage / BattleUtilities.calculate_total_HP(self.opponent_pokemon, True)) * 100
-            updated_opponent_HP.update({self.opponent_pokemon : self.opponent_HP[self.opponent_pokemon] - damage_percentage})
-            self.children.append(GameNode(self.battle, self.current_pokemon, self.current_HP.copy(), self.opponent_pokemon, updated_opponent_HP, None, self.has_dynamaxed, self.currently_dynamaxed, self.opponent_has_dynamaxed, self.opponent_currently_dynamaxed, self.score, self, self.previous_action))
+"""
+doubles tree search: a GameNode holds the HP of every battler and who is in each active slot,
+children are generated by joint actions (both slots of a side at once) and the tree is explored with
+depth-limited expectiminimax: our joint action (max), the opponent's joint action (min),
+then a chance node over the damage roll.
+Damage is read from the DamageMatrix of the turn, so the whole search costs one batched damage computation.
+Every node carries the Zobrist key of its state, so that states reached by different orders of actions
+are searched once (see TranspositionTable)
+"""
+import itertools
+import time
+from typing import List, Optional, Tuple
+
+from poke_env.environment.move_category import MoveCategory
+
+import BattleSnapshot
+import MoveIndex
+import TranspositionTable
+from TranspositionTable import EXACT, LOWER, UPPER
+from TurnContext import TurnContext
+
+# kinds of action
+MOVE, SWITCH, PASS = range(3)
+# target of the moves that don't choose a target (spread moves, Protect)
+NO_TARGET = -1
+
+# how a move picks its targets
+_SINGLE, _FOES, _ADJACENT, _SELF = range(4)
+_SPREAD_KIND = {"allAdjacentFoes": _FOES, "allAdjacent": _ADJACENT}
+
+# chance node: (damage roll, probability)
+ROLLS = ((0.85, 0.5), (1.0, 0.5))
+
+# damaging moves kept for each slot, the best ones by expected damage
+MOVES_PER_SLOT = 3
+
+# value of a battler still standing, on top of its HP (HP fraction of 1 = 1)
+ALIVE_WEIGHT = 0.5
+
+_INF = float("inf")
+
+# an action: (kind, slot, move index or switch-in row, target slot)
+Action = Tuple[int, int, int, int]
+
+
+class SearchSpace:
+    """
+    data shared by all the nodes of a search, read once from the TurnContext
+    """
+    __slots__ = ("context", "n", "side", "percentage", "moves", "turn_order", "root_moves",
+                 "root_switches", "protect_used", "deadline", "nodes", "table", "salt")
+
+    def __init__(self, context: TurnContext, deadline: float = _INF,
+                 table: TranspositionTable.TranspositionTable = None):
+        battle = context.battle
+        snapshot = context.snapshot
+        damage_matrix = context.damage_matrix
+        self.context = context
+        self.n = len(damage_matrix.battlers)
+        self.side = snapshot.side[:self.n].tolist()
+        self.percentage = damage_matrix.percentage.tolist()
+        # row -> rank in the turn order of the snapshot (Trick Room included)
+        self.turn_order = snapshot.speed_order.rank[:self.n].tolist()
+        # row -> [(move index, priority, accuracy, target kind, protect like)]
+        self.moves = []
+        for moves in damage_matrix.moves:
+            entries = []
+            for j, move in enumerate(moves):
+                info = MoveIndex.get(move)
+                if info.protect_like:
+                    entries.append((j, move.priority, 1.0, _SELF, True))
+                elif move.category != MoveCategory.STATUS:
+                    entries.append((j, move.priority, move.accuracy, _SPREAD_KIND.get(move.target, _SINGLE), False))
+            self.moves.append(entries)
+        # legal moves and switches of our active Pokémon in the current turn
+        self.root_moves = [{move.id for move in moves} for moves in battle.available_moves]
+        self.root_switches = [[snapshot.index_of(mon) for mon in switches if snapshot.index_of(mon) is not None]
+                              for switches in battle.available_switches]
+        self.protect_used = [mon is not None and mon.protect_counter > 0 for mon in battle.active_pokemon]
+        self.deadline = deadline
+        self.nodes = 0
+        self.table = table
+        # key of what doesn't change during the search: boosts and field
+        self.salt = self._salt(snapshot)
+
+    def _salt(self, snapshot: BattleSnapshot.BattleSnapshot) -> int:
+        salt = 0
+        for row, boosts in enumerate(snapshot.boosts[:self.n].tolist()):
+            for stat, boost in enumerate(boosts):
+                salt ^= TranspositionTable.BOOST_KEYS[row][stat][max(-6, min(boost, 6)) + 6]
+        for condition in (*snapshot.weather, *snapshot.fields):
+            salt ^= TranspositionTable.condition_key(condition)
+        for side, side_conditions in enumerate(snapshot.side_conditions):
+            for condition in side_conditions:
+                salt ^= TranspositionTable.condition_key((side, condition))
+        return salt
+
+    def out_of_time(self) -> bool:
+        return time.perf_counter() > self.deadline
+
+
+class GameNode:
+    """
+    state of the battle at some depth of the search
+    """
+    __slots__ = ("space", "hp", "active", "depth", "key")
+
+    space: SearchSpace
+    # HP of every battler in percentage
+    hp: Tuple[float, ...]
+    # battler row in each active slot (our 2 slots then the opponent's 2), -1 if empty
+    active: Tuple[int, int, int, int]
+    depth: int
+    # Zobrist key of HP buckets and active slots (see TranspositionTable)
+    key: int
+
+    def __init__(self, space: SearchSpace, hp, active, depth=0, key=None):
+        self.space = space
+        self.hp = hp
+        self.active = active
+        self.depth = depth
+        if key is None:
+            key = space.salt
+            for row in range(space.n):
+                key ^= TranspositionTable.HP_KEYS[row][TranspositionTable.hp_bucket(hp[row])]
+            for slot, row in enumerate(active):
+                key ^= TranspositionTable.ACTIVE_KEYS[slot][row + 1]
+        self.key = key
+
+    @staticmethod
+    def root(context: TurnContext, deadline: float = _INF,
+             table: TranspositionTable.TranspositionTable = None) -> "GameNode":
+        """
+        returns the node of the current state of the battle
+        :param context:
+        :param deadline: time.perf_counter() value after which the search stops expanding nodes
+        :param table: transposition table used by the search, None to search without it
+        :return:
+        """
+        space = SearchSpace(context, deadline, table)
+        snapshot = context.snapshot
+        hp = tuple((snapshot.hp_fraction[:space.n] * 100).tolist())
+        active = tuple(i if snapshot.present[i] else -1 for i in range(4))
+        return GameNode(space, hp, active)
+
+    # =============================================================================
+    # actions
+    # =============================================================================
+    def alive(self, row: int) -> bool:
+        return row >= 0 and self.hp[row] > 0
+
+    def is_terminal(self) -> bool:
+        return not any(self.alive(row) for row in self.active[:2]) \
+            or not any(self.alive(row) for row in self.active[2:])
+
+    def _foe_slots(self, slot: int) -> range:
+        return range(2, 4) if slot < 2 else range(0, 2)
+
+    def slot_actions(self, slot: int) -> List[Tuple[float, Action]]:
+        """
+        returns the actions of the battler in slot with a score used to sort them
+        (expected damage for attacks)
+        :param slot: 0, 1 our slots, 2, 3 opponent's slots
+        :return:
+        """
+        space = self.space
+        row = self.active[slot]
+        if not self.alive(row):
+            return [(0, (PASS, slot, -1, NO_TARGET))]
+        at_root = self.depth == 0 and slot < 2
+        attacks = []
+        protects = []
+        for j, priority, accuracy, kind, protect_like in space.moves[row]:
+            if at_root and space.context.damage_matrix.moves[row][j].id not in space.root_moves[slot]:
+                continue
+            if protect_like:
+                # Protect is only worth it in the first turn, and not twice in a row
+                if self.depth == 0 and not (slot < 2 and space.protect_used[slot]):
+                    protects.append((0, (MOVE, slot, j, NO_TARGET)))
+                continue
+            damage = space.percentage[row][j]
+            if kind == _SINGLE:
+                for target_slot in self._foe_slots(slot):
+                    target = self.active[target_slot]
+                    if self.alive(target):
+                        score = min(damage[target] * accuracy, self.hp[target])
+                        attacks.append((score, (MOVE, slot, j, target_slot)))
+            else:
+                score = sum(min(damage[self.active[k]] * accuracy, self.hp[self.active[k]])
+                            for k in self._foe_slots(slot) if self.alive(self.active[k]))
+                attacks.append((score, (MOVE, slot, j, NO_TARGET)))
+        attacks.sort(key=lambda x: -x[0])
+        actions = attacks[:MOVES_PER_SLOT] + protects
+        if at_root and not actions and space.root_moves[slot]:
+            # legal moves the search doesn't model, left to the heuristic player
+            actions.append((0, (PASS, slot, -1, NO_TARGET)))
+        if at_root:
+            actions += [(0, (SWITCH, slot, switch, NO_TARGET)) for switch in space.root_switches[slot]]
+        if not actions:
+            actions.append((0, (PASS, slot, -1, NO_TARGET)))
+        return actions
+
+    def joint_actions(self, opponent=False) -> List[Tuple[Action, Action]]:
+        """
+        returns the joint actions of a side, best scoring first
+        :param opponent: True for the opponent's side
+        :return:
+        """
+        first, second = (2, 3) if opponent else (0, 1)
+        joint = []
+        for (score_1, action_1), (score_2, action_2) in itertools.product(self.slot_actions(first),
+                                                                          self.slot_actions(second)):
+            if action_1[0] == SWITCH and action_2[0] == SWITCH and action_1[2] == action_2[2]:
+                continue
+            joint.append((score_1 + score_2, (action_1, action_2)))
+        joint.sort(key=lambda x: -x[0])
+        return [actions for score, actions in joint]
+
+    # =============================================================================
+    # transition
+    # =============================================================================
+    def child(self, actions: Tuple[Action, ...], roll: float) -> "GameNode":
+        """
+        returns the state reached when all the actions of both sides are executed
+        :param actions: the four actions of the turn
+        :param roll: damage roll
+        :return:
+        """
+        space = self.space
+        hp = list(self.hp)
+        active = list(self.active)
+        # switches go first
+        for kind, slot, switch, target_slot in actions:
+            if kind == SWITCH:
+                active[slot] = switch
+        protected = set()
+        damaged = set()
+        attacks = []
+        for action in actions:
+            kind, slot, j, target_slot = action
+            if kind != MOVE:
+                continue
+            row = active[slot]
+            entry = next(entry for entry in space.moves[row] if entry[0] == j)
+            if entry[4]:
+                protected.add(slot)
+                continue
+            attacks.append((-entry[1], space.turn_order[row], slot, row, entry, target_slot))
+        attacks.sort(key=lambda x: x[:3])
+        for priority, rank, slot, row, (j, _, accuracy, kind, _), target_slot in attacks:
+            if active[slot] != row or hp[row] <= 0:
+                continue
+            foes = list(self._foe_slots(slot))
+            if kind == _SINGLE:
+                if active[target_slot] < 0 or hp[active[target_slot]] <= 0:
+                    # the move is redirected to the other opponent
+                    target_slot = foes[1] if target_slot == foes[0] else foes[0]
+                targets = [target_slot]
+            elif kind == _FOES:
+                targets = foes
+            else:
+                targets = foes + [slot ^ 1]
+            damage = space.percentage[row][j]
+            for target_slot in targets:
+                target = active[target_slot]
+                if target < 0 or hp[target] <= 0 or target_slot in protected:
+                    continue
+                hp[target] = max(hp[target] - damage[target] * accuracy * roll, 0)
+                damaged.add(target)
+        # fainted battlers are replaced by the first one left in the team
+        for slot in range(4):
+            if active[slot] >= 0 and hp[active[slot]] <= 0:
+                replacement = next((row for row in range(4, space.n) if space.side[row] == space.side[slot]
+                                    and hp[row] > 0 and row not in active), -1)
+                if replacement >= 0:
+                    active[slot] = replacement
+        key = self.key
+        for row in damaged:
+            key ^= TranspositionTable.HP_KEYS[row][TranspositionTable.hp_bucket(self.hp[row])] \
+                ^ TranspositionTable.HP_KEYS[row][TranspositionTable.hp_bucket(hp[row])]
+        for slot in range(4):
+            if active[slot] != self.active[slot]:
+                key ^= TranspositionTable.ACTIVE_KEYS[slot][self.active[slot] + 1] \
+                    ^ TranspositionTable.ACTIVE_KEYS[slot][active[slot] + 1]
+        space.nodes += 1
+        return GameNode(space, tuple(hp), tuple(active), self.depth + 1, key)
+
+    # =============================================================================
+    # evaluation
+    # =============================================================================
+    def evaluate(self) -> float:
+        """
+        returns the value of the state for our side: HP and battlers left, ours minus the opponent's
+        :return:
+        """
+        value = 0
+        for row in range(self.space.n):
+            hp = self.hp[row]
+            if hp <= 0:
+                continue
+            sign = 1 if self.space.side[row] == BattleSnapshot.ALLY else -1
+            value += sign * (hp / 100 + ALIVE_WEIGHT)
+        return value
+
+
+# =============================================================================
+# expectiminimax
+# =============================================================================
+def max_value(node: GameNode, depth: int, alpha: float, beta: float) -> float:
+    """
+    value of node when it's our turn to choose
+    :param node:
+    :param depth: turns left to explore
+    :param alpha:
+    :param beta:
+    :return:
+    """
+    space = node.space
+    if depth == 0 or node.is_terminal() or space.out_of_time():
+        return node.evaluate()
+    table = space.table
+    joint_actions = node.joint_actions()
+    alpha_0 = alpha
+    if table is not None:
+        entry = table.get(node.key)
+        if entry is not None:
+            # a state of the same HP buckets but different HPs has a different value, only its best action is used
+            if entry.depth >= depth and entry.hp == node.hp:
+                if entry.flag == EXACT:
+                    return entry.value
+                if entry.flag == LOWER:
+                    alpha = max(alpha, entry.value)
+                else:
+                    beta = min(beta, entry.value)
+                if alpha >= beta:
+                    return entry.value
+            # the best joint action found before is tried first
+            if entry.best in joint_actions:
+                joint_actions.remove(entry.best)
+                joint_actions.insert(0, entry.best)
+    value = -_INF
+    best = None
+    for actions in joint_actions:
+        actions_value = min_value(node, actions, depth, alpha, beta)
+        if actions_value > value:
+            value = actions_value
+            best = actions
+        if value >= beta:
+            break
+        alpha = max(alpha, value)
+    # values cut by the deadline are not searched to depth
+    if table is not None and not space.out_of_time():
+        flag = UPPER if value <= alpha_0 else LOWER if value >= beta else EXACT
+        table.store(node.key, depth, value, flag, best, node.hp)
+    return value
+
+
+def min_value(node: GameNode, our_actions, depth: int, alpha: float, beta: float) -> float:
+    """
+    value of our joint action when the opponent answers with its best joint action
+    :param node:
+    :param our_actions:
+    :param depth:
+    :param alpha:
+    :param beta:
+    :return:
+    """
+    value = _INF
+    for opponent_actions in node.joint_actions(opponent=True):
+        value = min(value, chance_value(node, our_actions + opponent_actions, depth))
+        if value <= alpha:
+            return value
+        beta = min(beta, value)
+    return value
+
+
+def chance_value(node: GameNode, actions, depth: int) -> float:
+    """
+    expected value of the turn over the damage rolls
+    :param node:
+    :param actions:
+    :param depth:
+    :return:
+    """
+    return sum(probability * max_value(node.child(actions, roll), depth - 1, -_INF, _INF)
+               for roll, probability in ROLLS)
+
+
+def search(root: GameNode, depth: int, first=None) -> (Optional[Tuple[Action, Action]], float):
+    """
+    returns our best joint action from root and its value
+    :param root:
+    :param depth: turns to explore
+    :param first: joint action tried first (the best one of a shallower search)
+    :return:
+    """
+    joint_actions = root.joint_actions()
+    if first in joint_actions:
+        joint_actions.remove(first)
+        joint_actions.insert(0, first)
+    best_actions = None
+    alpha = -_INF
+    for actions in joint_actions:
+        value = min_value(root, actions, depth, alpha, _INF)
+        if best_actions is None or value > alpha:
+            best_actions = actions
+            alpha = value
+        if root.space.out_of_time():
+            break
+    return best_actions, alpha
+
+
+def iterative_search(root: GameNode, max_depth: int) -> (Optional[Tuple[Action, Action]], float, int):
+    """
+    searches root at depth 1, 2, ... max_depth until the deadline of the search space,
+    a search the deadline cuts is thrown away
+    :param root:
+    :param max_depth:
+    :return: best joint action and value of the deepest search completed and its depth,
+        (None, 0, 0) if not even depth 1 was completed
+    """
+    best_actions, best_value, completed = None, 0, 0
+    for depth in range(1, max_depth + 1):
+        actions, value = search(root, depth, best_actions)
+        if root.space.out_of_time():
+            break
+        best_actions, best_value, completed = actions, value, depth
+    return best_actions, best_value, completed
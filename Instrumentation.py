@@ -0,0 +1,190 @@
+"""
+low overhead latency metrics of the players: a log-linear histogram for each timed section
+(choose_move, teampreview, the stages of MoveHelper.default_choose_command) and a counter of the stage that produced
+each order. Every player has its own Metrics in player.metrics, read with snapshot() or dumped every dump_interval
+seconds. A Metrics can be written by the thread of a BatchScheduler while the event loop reads it
+"""
+import functools
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Callable, Optional
+
+# buckets of the histograms: below 4 microseconds one per microsecond, then 4 for each power of 2, so that
+# a percentile is at most 25% above the real one
+_SUB_BUCKETS = 4
+_BUCKETS = 128
+
+_logger = logging.getLogger(__name__)
+
+
+def _bucket(microseconds: int) -> int:
+    bits = microseconds.bit_length()
+    if bits < 3:
+        return microseconds
+    return min(_SUB_BUCKETS * (bits - 2) + ((microseconds >> (bits - 3)) & 3), _BUCKETS - 1)
+
+
+def _upper_bound(bucket: int) -> int:
+    """
+    :return: first microsecond above bucket
+    """
+    if bucket < _SUB_BUCKETS:
+        return bucket + 1
+    bits, sub = divmod(bucket, _SUB_BUCKETS)
+    return (5 + sub) << (bits - 1)
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        self.counts[_bucket(int(seconds * 1e6))] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """
+        :param q: between 0 and 100
+        :return: upper bound in seconds of the bucket of the q-th percentile, at most the maximum seen
+        """
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(_upper_bound(bucket) / 1e6, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        """
+        :return: count, mean, p50, p90, p99 and max in milliseconds
+        """
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p90_ms": self.percentile(90) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class Metrics:
+    def __init__(self, name: str = "", dump_interval: float = None, dump: Callable[[dict], None] = None):
+        """
+        :param name: shown in the dumps, usually the username of the player
+        :param dump_interval: seconds between two dumps, None to only read the metrics with snapshot()
+        :param dump: receives the snapshots, by default they are logged as json
+        """
+        self.name = name
+        self.dump_interval = dump_interval
+        self.dump = dump if dump is not None else self._log
+        self.histograms = {}
+        # stage that produced each order
+        self.outcomes = Counter()
+        self._last_dump = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, section: str, seconds: float):
+        with self._lock:
+            histogram = self.histograms.get(section)
+            if histogram is None:
+                histogram = self.histograms[section] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def outcome(self, stage: str):
+        with self._lock:
+            self.outcomes[stage] += 1
+
+    def snapshot(self) -> dict:
+        """
+        :return: summary of every histogram and the stage counters
+        """
+        with self._lock:
+            return {
+                "name": self.name,
+                "latency": {section: histogram.summary() for section, histogram in self.histograms.items()},
+                "outcomes": dict(self.outcomes),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.outcomes = Counter()
+
+    def maybe_dump(self):
+        """
+        dumps a snapshot if dump_interval seconds passed since the last one
+        """
+        if self.dump_interval is None:
+            return
+        now = time.perf_counter()
+        if now - self._last_dump >= self.dump_interval:
+            self._last_dump = now
+            self.dump(self.snapshot())
+
+    @staticmethod
+    def _log(snapshot: dict):
+        _logger.info("metrics %s", json.dumps(snapshot))
+
+
+def metrics_of(player) -> Metrics:
+    """
+    :param player:
+    :return: player.metrics, created the first time
+    """
+    metrics = getattr(player, "metrics", None)
+    if metrics is None:
+        metrics = player.metrics = Metrics(getattr(player, "username", ""))
+    return metrics
+
+
+def timed(section: str):
+    """
+    decorator of the methods of the players, records the latency of each call in metrics_of(self)
+    :param section: name of the histogram
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                metrics = metrics_of(self)
+                metrics.record(section, time.perf_counter() - start)
+                metrics.maybe_dump()
+
+        return wrapper
+
+    return decorator
+
+
+def record_stage(metrics: Optional[Metrics], stage: str, start: float, order) -> float:
+    """
+    records the latency of a stage of a decision and, if it produced the order, the outcome
+    :param metrics: None if not instrumented
+    :param stage:
+    :param start: perf_counter at the start of the stage
+    :param order: result of the stage
+    :return: perf_counter at the end of the stage, start of the next one
+    """
+    end = time.perf_counter()
+    if metrics is not None:
+        metrics.record("stage." + stage, end - start)
+        if order is not None:
+            metrics.outcome(stage)
+    return end
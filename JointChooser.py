@@ -0,0 +1,167 @@
+"""
+choice of the moves of both active Pokémon together: every (move, target) of each slot is scored as in AttackChooser,
+with the damage it deals to each opponent, and the pairs of orders are scored as the sum of their scores corrected
+for the damage wasted when both hit the same opponent (overkill). Before the pairs are scored the orders of each slot
+that can't be chosen with any partner are pruned: the correction of a pair is bounded by the damage score of each
+order (it can lose at most its own damage score and gain at most the KO bonus), so an order whose best case is far
+below the worst case of the best pair is dominated
+"""
+import random
+from typing import List, Optional
+
+from poke_env.environment import DoubleBattle, Move, Pokemon
+from poke_env.player import BattleOrder
+
+import AttackChooser
+from TurnContext import TurnContext
+
+# score of a lethal move over its damage, see AttackChooser.damage_score
+_KO_BONUS = 40
+# weight of the damage to each target in the score of the moves hitting many targets, see get_move_score_area
+_AREA_WEIGHT = 0.5
+
+
+class SlotOption:
+    __slots__ = ("order", "score", "damage", "weight", "max_loss", "max_gain")
+
+    def __init__(self, order: Optional[BattleOrder], score: float, damage: tuple, weight: float):
+        self.order = order
+        self.score = score
+        # damage to each opponent's slot, as percentage of its remaining HP (AttackChooser.damage_percentage)
+        self.damage = damage
+        # weight of the damage to each target in score
+        self.weight = weight
+        # bounds of the score lost to overkill and gained with the KO bonus of the damage added together, with any
+        # partner
+        self.max_loss = weight * sum(AttackChooser.damage_score(value) for value in damage if value > 0)
+        self.max_gain = weight * _KO_BONUS * sum(1 for value in damage if value > 0)
+
+
+def _damage(battle: DoubleBattle, move, user: Pokemon, target: Pokemon, context: TurnContext) -> float:
+    if move.base_power <= 0 or context.base_damage(move, user, target) <= 0 \
+            or context.is_move_immune(move, user, target):
+        return 0.0
+    return AttackChooser.damage_percentage(move, user, target, battle, context)
+
+
+def slot_options(battle: DoubleBattle, idx: int, context: TurnContext) -> List[SlotOption]:
+    """
+    :return: every move of the Pokémon in slot idx with every target, as scored by AttackChooser; the moves with a
+        score of 0 are left out
+    """
+    user = battle.active_pokemon[idx]
+    opponents = battle.opponent_active_pokemon
+    options = []
+    for move in battle.available_moves[idx]:
+        targets = context.possible_targets(move, user)
+        if len(targets) == 1:
+            # area, self or side moves: one score for all the targets
+            score = AttackChooser.get_move_score_area(battle, move, user, context)
+            if score > 0:
+                damage = tuple(_damage(battle, move, user, oppo, context) if oppo is not None else 0.0
+                               for oppo in opponents)
+                options.append(SlotOption(BattleOrder(move, move_target=targets[0]), score, damage, _AREA_WEIGHT))
+            continue
+        for k, oppo in enumerate(opponents):
+            if oppo is None:
+                continue
+            score = AttackChooser.get_move_score(battle, move, user, oppo, context)
+            if score > 0:
+                damage = [0.0] * len(opponents)
+                # a positive score means that oppo is not immune
+                if context.base_damage(move, user, oppo) > 0:
+                    damage[k] = AttackChooser.damage_percentage(move, user, oppo, battle, context)
+                options.append(SlotOption(BattleOrder(move, move_target=targets[k + 1]), score, tuple(damage), 1.0))
+    return options
+
+
+def prune(first: List[SlotOption], second: List[SlotOption], threshold: float) \
+        -> (List[SlotOption], List[SlotOption]):
+    """
+    leaves out the options of each slot that can't be in a preferred pair (see choose_joint_moves) with any partner:
+    the score of a pair is between the sum of the scores minus max_loss of either order and the sum plus max_gain,
+    so an order is pruned if its best pair is below both threshold and 80% of the worst case of the best pair
+    :return: the options left of the two slots, in the same order
+    """
+    best_1 = max(option.score for option in first)
+    best_2 = max(option.score for option in second)
+    lower = max(max(option.score - option.max_loss for option in first) + best_2,
+                best_1 + max(option.score - option.max_loss for option in second))
+    cut = min(lower * 0.8, threshold)
+    return ([option for option in first if option.score + option.max_gain + best_2 >= cut],
+            [option for option in second if option.score + option.max_gain + best_1 >= cut])
+
+
+def pair_score(first: SlotOption, second: SlotOption) -> float:
+    """
+    :return: score of the orders first and second used together
+    """
+    # damage score of the damage added together minus the damage scores counted by each order, on the shared targets
+    correction = 0
+    for damage_1, damage_2 in zip(first.damage, second.damage):
+        if damage_1 > 0 and damage_2 > 0:
+            correction += AttackChooser.damage_score(damage_1 + damage_2) - AttackChooser.damage_score(damage_1) \
+                - AttackChooser.damage_score(damage_2)
+    return first.score + second.score + min(first.weight, second.weight) * correction
+
+
+def order_option(battle: DoubleBattle, idx: int, order: BattleOrder, context: TurnContext) -> SlotOption:
+    """
+    :return: the order already chosen for slot idx by an earlier stage (priority KO, Protect, switch) as an option
+        of score 0, with the damage of its move
+    """
+    opponents = battle.opponent_active_pokemon
+    damage = [0.0] * len(opponents)
+    weight = 1.0
+    move = order.order
+    user = battle.active_pokemon[idx]
+    if isinstance(move, Move) and user is not None:
+        if len(context.possible_targets(move, user)) == 1:
+            weight = _AREA_WEIGHT
+            damage = [_damage(battle, move, user, oppo, context) if oppo is not None else 0.0 for oppo in opponents]
+        elif 0 < order.move_target <= len(damage):
+            oppo = opponents[order.move_target - 1]
+            if oppo is not None:
+                damage[order.move_target - 1] = _damage(battle, move, user, oppo, context)
+    return SlotOption(order, 0, tuple(damage), weight)
+
+
+def choose_joint_moves(battle: DoubleBattle, orders: List[Optional[BattleOrder]], free: List[int],
+                       context: TurnContext = None) -> Optional[List[BattleOrder]]:
+    """
+    chooses the moves of the free slots knowing the orders of the other slot, with the same variance of
+    AttackChooser.choose_moves on the pairs
+    :param battle:
+    :param orders: orders of the two slots already chosen by the earlier stages, None for the free slots and the
+        empty ones
+    :param free: slots whose move is chosen
+    :param context:
+    :return: the orders of the two slots, None if a free slot has no move worth using (see AttackChooser.choose_moves)
+    """
+    if context is None:
+        context = TurnContext(battle)
+    options = []
+    for idx in range(2):
+        if idx in free:
+            slot = slot_options(battle, idx, context)
+            if not slot:
+                return None
+            options.append(slot)
+        elif orders[idx] is not None:
+            options.append([order_option(battle, idx, orders[idx], context)])
+        else:
+            options.append([SlotOption(None, 0, (0.0,) * len(battle.opponent_active_pokemon), 1.0)])
+    # the orders over 200 are always preferred by choose_moves
+    threshold = 200 * len(free)
+    first, second = prune(*options, threshold)
+    pairs = [(pair_score(option_1, option_2), option_1, option_2) for option_1 in first for option_2 in second]
+    max_score = max(score for score, _, _ in pairs)
+    preferred = []
+    for pair in pairs:
+        if pair[0] < threshold and pair[0] < max_score * 0.8:
+            continue
+        preferred.append(pair)
+        if pair[0] == max_score:  # Doubly prefer the best pair
+            preferred.append(pair)
+    _, option_1, option_2 = preferred[random.randint(0, len(preferred) - 1)]
+    return [option_1.order, option_2.order]
@@ -0,0 +1,238 @@
+"""
+Glicko ratings of many players and a scheduler of the most informative pairings: instead of all the pairs, the ladder
+plays small batches of battles between the pair whose result is expected to shrink the rating deviations the most
+(uncertain players with close ratings), until the deviations are below target_rd or the battles are over.
+The ratings are saved in a json file after every batch and loaded by the next run
+
+usage:
+    python Ladder.py ladder.json
+        prints the standings saved in the file
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+from typing import Dict, List, Optional
+
+from poke_env.data import to_id_str
+from poke_env.player import POKE_LOOP
+from tabulate import tabulate
+
+import LocalSimulator
+from ResultStore import track_battles
+
+INITIAL_RATING = 1500.0
+INITIAL_RD = 350.0
+_Q = math.log(10) / 400
+
+
+def _g(rd: float) -> float:
+    return 1 / math.sqrt(1 + 3 * _Q ** 2 * rd ** 2 / math.pi ** 2)
+
+
+class Rating:
+    __slots__ = ("rating", "rd", "wins", "losses", "ties")
+
+    def __init__(self, rating: float = INITIAL_RATING, rd: float = INITIAL_RD, wins: int = 0, losses: int = 0,
+                 ties: int = 0):
+        self.rating = rating
+        # rating deviation
+        self.rd = rd
+        self.wins = wins
+        self.losses = losses
+        self.ties = ties
+
+    @property
+    def battles(self) -> int:
+        return self.wins + self.losses + self.ties
+
+    def expected_score(self, other: "Rating") -> float:
+        """
+        :return: expected score against other, given the uncertainty of its rating
+        """
+        return 1 / (1 + 10 ** (-_g(other.rd) * (self.rating - other.rating) / 400))
+
+    def to_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class Ladder:
+    def __init__(self, path: str = None, rd_growth: float = 30.0):
+        """
+        :param path: json file of the ratings, loaded if it exists and saved after every batch
+        :param rd_growth: increase of the rating deviations at every run, players may have changed in between
+        """
+        self.path = path
+        self.ratings: Dict[str, Rating] = {}
+        self.players = {}
+        if path is not None and os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                for name, rating in json.load(file).items():
+                    rating = Rating(**rating)
+                    rating.rd = min(math.sqrt(rating.rd ** 2 + rd_growth ** 2), INITIAL_RD)
+                    self.ratings[name] = rating
+
+    def register(self, player):
+        """
+        adds player to the ladder, with its saved rating if it has one
+        :param player:
+        """
+        self.players[player.username] = player
+        self.ratings.setdefault(player.username, Rating())
+
+    def save(self):
+        if self.path is None:
+            return
+        with open(self.path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump({name: rating.to_dict() for name, rating in self.ratings.items()}, file, indent=1)
+        os.replace(self.path + ".tmp", self.path)
+
+    # =============================================================================
+    # ratings
+    # =============================================================================
+    def update(self, player_1: str, player_2: str, wins: int, losses: int, ties: int = 0):
+        """
+        Glicko update of the two players with the battles of a batch as a rating period
+        :param player_1:
+        :param player_2:
+        :param wins: battles won by player_1
+        :param losses: battles won by player_2
+        :param ties:
+        """
+        rating_1 = self.ratings[player_1]
+        rating_2 = self.ratings[player_2]
+        new_1 = self._updated(rating_1, rating_2, wins, losses, ties)
+        new_2 = self._updated(rating_2, rating_1, losses, wins, ties)
+        rating_1.rating, rating_1.rd = new_1
+        rating_2.rating, rating_2.rd = new_2
+        rating_1.wins += wins
+        rating_1.losses += losses
+        rating_1.ties += ties
+        rating_2.wins += losses
+        rating_2.losses += wins
+        rating_2.ties += ties
+
+    @staticmethod
+    def _updated(rating: Rating, opponent: Rating, wins: int, losses: int, ties: int) -> (float, float):
+        n = wins + losses + ties
+        g = _g(opponent.rd)
+        expected = rating.expected_score(opponent)
+        d_squared = 1 / (_Q ** 2 * n * g ** 2 * expected * (1 - expected))
+        precision = 1 / rating.rd ** 2 + 1 / d_squared
+        score = wins + ties / 2
+        return rating.rating + _Q / precision * g * (score - n * expected), math.sqrt(1 / precision)
+
+    # =============================================================================
+    # pairing
+    # =============================================================================
+    def information(self, player_1: str, player_2: str) -> float:
+        """
+        :return: first order reduction of the rating variances of the two players after a battle between them
+        """
+        rating_1 = self.ratings[player_1]
+        rating_2 = self.ratings[player_2]
+        expected = rating_1.expected_score(rating_2)
+        variance = expected * (1 - expected)
+        return _Q ** 2 * variance * (_g(rating_2.rd) ** 2 * rating_1.rd ** 4 + _g(rating_1.rd) ** 2 * rating_2.rd ** 4)
+
+    def next_pairing(self, rng: random.Random = None) -> (str, str):
+        """
+        :param rng: breaks the ties between pairs
+        :return: names of the registered players of the most informative pair
+        """
+        rng = rng or random
+        names = list(self.players)
+        rng.shuffle(names)
+        return max(((p_1, p_2) for i, p_1 in enumerate(names) for p_2 in names[i + 1:]),
+                   key=lambda pair: self.information(*pair))
+
+    def _done(self, target_rd: float) -> bool:
+        return len(self.players) < 2 or all(self.ratings[name].rd <= target_rd for name in self.players)
+
+    # =============================================================================
+    # running
+    # =============================================================================
+    def run(self, max_battles: int, batch_size: int = 4, target_rd: float = 60.0, seed=None, store=None) -> int:
+        """
+        plays local battles (LocalSimulator) between the most informative pairs
+        :param max_battles: battles of the run
+        :param batch_size: battles of a pairing
+        :param target_rd: the run stops when all the registered players have a smaller deviation
+        :param seed:
+        :param store: ResultStore where the battles are recorded
+        :return: battles played
+        """
+        rng = random.Random(seed)
+        played = 0
+        while played < max_battles and not self._done(target_rd):
+            name_1, name_2 = self.next_pairing(rng)
+            records = []
+            LocalSimulator.record_battles(self.players[name_1], self.players[name_2],
+                                          min(batch_size, max_battles - played), rng.getrandbits(64), records.append)
+            played += self._add_batch(name_1, name_2, records, store)
+        return played
+
+    async def run_server(self, max_battles: int, batch_size: int = 4, target_rd: float = 60.0, store=None) -> int:
+        """
+        same as run with battles on the server
+        """
+        rng = random.Random()
+        records = []
+        players = list(self.players.values())
+        track_battles(players, records.append)
+        played = 0
+        while played < max_battles and not self._done(target_rd):
+            name_1, name_2 = self.next_pairing(rng)
+            # track_battles records the battles with the player registered first as player_1
+            if players.index(self.players[name_1]) > players.index(self.players[name_2]):
+                name_1, name_2 = name_2, name_1
+            player_1, player_2 = self.players[name_1], self.players[name_2]
+            n_challenges = min(batch_size, max_battles - played)
+            await asyncio.gather(
+                player_1.send_challenges(opponent=to_id_str(name_2), n_challenges=n_challenges,
+                                         to_wait=player_2.logged_in),
+                player_2.accept_challenges(opponent=to_id_str(name_1), n_challenges=n_challenges),
+            )
+            player_1.reset_battles()
+            player_2.reset_battles()
+            played += self._add_batch(name_1, name_2, records, store)
+            records.clear()
+        return played
+
+    def background_run_server(self, max_battles: int, batch_size: int = 4, target_rd: float = 60.0, store=None):
+        return asyncio.run_coroutine_threadsafe(self.run_server(max_battles, batch_size, target_rd, store),
+                                                POKE_LOOP)
+
+    def _add_batch(self, name_1: str, name_2: str, records: List[dict], store) -> int:
+        """
+        updates the ratings with the records of a batch between the two players and saves them
+        :return: battles of the batch
+        """
+        wins = sum(record["winner"] == name_1 for record in records)
+        losses = sum(record["winner"] == name_2 for record in records)
+        if records:
+            self.update(name_1, name_2, wins, losses, len(records) - wins - losses)
+        if store is not None:
+            for record in records:
+                store.append(record)
+        self.save()
+        return len(records)
+
+    def standings(self, names: Optional[List[str]] = None) -> List[list]:
+        """
+        :param names: players to show, all the rated ones if None
+        :return: rows (rank, name, rating, deviation, wins, losses, ties) sorted by rating
+        """
+        names = names if names is not None else list(self.ratings)
+        ranked = sorted(names, key=lambda name: -self.ratings[name].rating)
+        return [[rank + 1, name, round(self.ratings[name].rating), round(self.ratings[name].rd),
+                 self.ratings[name].wins, self.ratings[name].losses, self.ratings[name].ties]
+                for rank, name in enumerate(ranked)]
+
+
+STANDINGS_HEADERS = ["rank", "player", "rating", "deviation", "wins", "losses", "ties"]
+
+if __name__ == "__main__":
+    print(tabulate(Ladder(sys.argv[1], rd_growth=0).standings(), headers=STANDINGS_HEADERS))
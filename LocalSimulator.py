@@ -0,0 +1,1116 @@
+"""
+in-process gen 8 VGC doubles simulator, to evaluate the players without a Pokémon Showdown server.
+The state of the battle is kept here and every player sees it through its own DoubleBattle, fed with the
+protocol messages and requests a server would send: choose_move and teampreview of the players run unchanged
+and their orders are read as Showdown choices.
+Mechanics covered: damage (STAB, types, weather, terrain, screens, burn, spread reduction, critical hits,
+random roll, the abilities and items of Modifiers), speed order with Trick Room, Tailwind and paralysis,
+priority (Prankster, Gale Wings), Protect, redirection, status, boosts, weather, terrain, Fake Out, Sucker Punch,
+drain, recoil, Focus Sash, Sitrus Berry, Leftovers, Life Orb, Weakness Policy, choice lock and switching.
+Other moves and effects only deal their damage (or do nothing)
+"""
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from poke_env.data import GenData, to_id_str
+from poke_env.environment import DoubleBattle, Move, PokemonType, Status, Weather, Field
+from poke_env.environment.move_category import MoveCategory
+
+import Modifiers
+import MoveIndex
+import TypeChart
+from ResultStore import battle_record
+from Teams import compute_stats, unpack_team
+
+GEN = 8
+_DATA = GenData.from_gen(GEN)
+
+# Pokémon brought to the battle after team preview
+TEAM_SIZE = 4
+# battles still going after this many turns are a tie
+MAX_TURNS = 300
+
+_BOOSTS = ["atk", "def", "spa", "spd", "spe", "accuracy", "evasion"]
+
+_WEATHER_NAMES = {Weather.RAINDANCE: "RainDance", Weather.SUNNYDAY: "SunnyDay", Weather.SANDSTORM: "Sandstorm",
+                  Weather.HAIL: "Hail"}
+_WEATHER_ABILITIES = {"drizzle": Weather.RAINDANCE, "drought": Weather.SUNNYDAY, "sandstream": Weather.SANDSTORM,
+                      "snowwarning": Weather.HAIL}
+_TERRAIN_NAMES = {Field.ELECTRIC_TERRAIN: "Electric Terrain", Field.GRASSY_TERRAIN: "Grassy Terrain",
+                  Field.MISTY_TERRAIN: "Misty Terrain", Field.PSYCHIC_TERRAIN: "Psychic Terrain"}
+_TERRAIN_ABILITIES = {"electricsurge": Field.ELECTRIC_TERRAIN, "grassysurge": Field.GRASSY_TERRAIN,
+                      "mistysurge": Field.MISTY_TERRAIN, "psychicsurge": Field.PSYCHIC_TERRAIN}
+# move type boosted (x1.3) by each terrain for grounded users
+_TERRAIN_TYPES = {Field.ELECTRIC_TERRAIN: PokemonType.ELECTRIC, Field.GRASSY_TERRAIN: PokemonType.GRASS,
+                  Field.PSYCHIC_TERRAIN: PokemonType.PSYCHIC}
+# speed doubled in the weather
+_WEATHER_SPEED_ABILITIES = {"swiftswim": Weather.RAINDANCE, "chlorophyll": Weather.SUNNYDAY,
+                            "sandrush": Weather.SANDSTORM, "slushrush": Weather.HAIL}
+# side condition -> (protocol name, turns)
+_SIDE_CONDITIONS = {"reflect": ("Reflect", 5), "lightscreen": ("move: Light Screen", 5),
+                    "auroraveil": ("move: Aurora Veil", 5), "tailwind": ("move: Tailwind", 4)}
+_SCREENS = {"reflect": MoveCategory.PHYSICAL, "lightscreen": MoveCategory.SPECIAL}
+# types that can't get each status
+_STATUS_IMMUNE_TYPES = {Status.BRN: {PokemonType.FIRE}, Status.PAR: {PokemonType.ELECTRIC},
+                        Status.PSN: {PokemonType.POISON, PokemonType.STEEL},
+                        Status.TOX: {PokemonType.POISON, PokemonType.STEEL}, Status.FRZ: {PokemonType.ICE}}
+# hits of the 2-5 hits moves
+_MULTI_HITS = (2, 2, 2, 2, 2, 2, 2, 3, 3, 3, 3, 3, 3, 3, 4, 4, 4, 5, 5, 5)
+_CRIT_CHANCE = (1 / 24, 1 / 8, 1 / 2, 1)
+
+# move id -> Move
+_moves = {}
+_battle_ids = itertools.count(1)
+
+
+def _move(move_id: str) -> Move:
+    move = _moves.get(move_id)
+    if move is None:
+        move = Move(move_id, gen=GEN)
+        _moves[move_id] = move
+    return move
+
+
+def _boost_multiplier(boost: int, base: int = 2) -> float:
+    return (base + max(boost, 0)) / (base - min(boost, 0))
+
+
+# =============================================================================
+# battle state
+# =============================================================================
+class SimPokemon:
+    """
+    a Pokémon of the battle with its real stats. It exposes type_1, type_2, types, ability and item as
+    poke_env Pokémon do, so that TypeChart and Modifiers read it directly
+    """
+    __slots__ = ("side", "name", "species", "level", "type_1", "type_2", "types", "stats", "max_hp", "hp",
+                 "item", "ability", "moves", "pp", "status", "sleep_turns", "toxic_turns", "boosts", "active_turns",
+                 "protect_counter", "protected", "redirecting", "flinched", "choice_lock", "moved", "hit_by")
+
+    def __init__(self, side: "SimSide", data: dict):
+        dex = _DATA.pokedex[data["species"]]
+        self.side = side
+        self.name = data["name"] or dex["name"]
+        self.species = dex["name"]
+        self.level = data["level"]
+        types = [PokemonType.from_name(pokemon_type) for pokemon_type in dex["types"]]
+        self.type_1 = types[0]
+        self.type_2 = types[1] if len(types) > 1 else None
+        self.types = (self.type_1, self.type_2)
+        self.stats = compute_stats(data)
+        self.max_hp = self.stats.pop("hp")
+        self.hp = self.max_hp
+        self.item = data["item"]
+        self.ability = data["ability"]
+        self.moves = [_move(move_id) for move_id in data["moves"]]
+        self.pp = {move.id: move.max_pp for move in self.moves}
+        self.status = None
+        self.sleep_turns = 0
+        self.toxic_turns = 0
+        self.boosts = dict.fromkeys(_BOOSTS, 0)
+        # turns spent on the field, 0 during the first turn
+        self.active_turns = 0
+        self.protect_counter = 0
+        self.protected = False
+        self.redirecting = False
+        self.flinched = False
+        self.choice_lock = None
+        self.moved = False
+        # (attacker, damage, category) of the last hit of the turn
+        self.hit_by = None
+
+    @property
+    def fainted(self) -> bool:
+        return self.hp <= 0
+
+    @property
+    def details(self) -> str:
+        return f"{self.species}, L{self.level}"
+
+    def ident(self) -> str:
+        slot = self.side.slot_of(self)
+        if slot is None:
+            return f"{self.side.id}: {self.name}"
+        return f"{self.side.id}{'ab'[slot]}: {self.name}"
+
+    def condition(self, own: bool) -> str:
+        """
+        :param own: True for the owner's view (HP values), False for the opponent's (HP percentage)
+        :return: HP and status as in the protocol
+        """
+        if self.fainted:
+            return "0 fnt"
+        if own:
+            condition = f"{self.hp}/{self.max_hp}"
+        else:
+            condition = f"{max(math.ceil(100 * self.hp / self.max_hp), 1)}/100"
+        if self.status is not None:
+            condition += " " + self.status.name.lower()
+        return condition
+
+    def modifiers(self) -> Modifiers.Modifiers:
+        return Modifiers.of(self)
+
+    def is_grounded(self) -> bool:
+        return PokemonType.FLYING not in self.types and PokemonType.GROUND not in self.modifiers().immune_types
+
+    def stat(self, stat: str, crit=False, attacking=True) -> float:
+        boost = self.boosts[stat]
+        if crit:
+            # critical hits ignore the boosts that would lower the damage
+            boost = max(boost, 0) if attacking else min(boost, 0)
+        return self.stats[stat] * _boost_multiplier(boost)
+
+    def switch_out(self):
+        self.boosts = dict.fromkeys(_BOOSTS, 0)
+        self.active_turns = 0
+        self.protect_counter = 0
+        self.choice_lock = None
+        self.toxic_turns = 0
+
+    def request(self, active: bool) -> dict:
+        """
+        :param active:
+        :return: the entry of this Pokémon in the side of a request
+        """
+        return {
+            "ident": f"{self.side.id}: {self.name}",
+            "details": self.details,
+            "condition": self.condition(own=True),
+            "active": active,
+            "stats": dict(self.stats),
+            "moves": [move.id for move in self.moves],
+            "baseAbility": self.ability,
+            "ability": self.ability,
+            "item": self.item,
+            "pokeball": "pokeball",
+        }
+
+    def move_request(self) -> dict:
+        """
+        :return: the entry of this Pokémon in the active part of a request
+        """
+        moves = [{"move": move.entry["name"], "id": move.id, "pp": self.pp[move.id], "maxpp": move.max_pp,
+                  "target": move.target, "disabled": self.pp[move.id] <= 0
+                  or (self.choice_lock is not None and move.id != self.choice_lock)}
+                 for move in self.moves]
+        if all(move["disabled"] for move in moves):
+            moves = [{"move": "Struggle", "id": "struggle", "target": "randomNormal", "disabled": False}]
+        return {"moves": moves}
+
+
+class SimSide:
+    __slots__ = ("id", "index", "player", "view", "team", "pokemon", "conditions")
+
+    def __init__(self, index: int, player, view: DoubleBattle, team: List[dict]):
+        self.index = index
+        self.id = f"p{index + 1}"
+        self.player = player
+        self.view = view
+        self.team = [SimPokemon(self, data) for data in team]
+        # Pokémon brought to the battle, the first two are in the active slots
+        self.pokemon = []
+        # side condition -> turns left
+        self.conditions = {}
+
+    @property
+    def name(self) -> str:
+        return f"{self.id}: {self.player.username}"
+
+    def active(self) -> List[Optional[SimPokemon]]:
+        return [mon if not mon.fainted else None for mon in self.pokemon[:2]]
+
+    def slot_of(self, mon: SimPokemon) -> Optional[int]:
+        if mon in self.pokemon[:2]:
+            return self.pokemon.index(mon)
+        return None
+
+    def bench(self) -> List[SimPokemon]:
+        return [mon for mon in self.pokemon[2:] if not mon.fainted]
+
+    def defeated(self) -> bool:
+        return all(mon.fainted for mon in self.pokemon)
+
+
+class LocalBattle:
+    """
+    a battle between two players, run to the end by run()
+    """
+
+    def __init__(self, player_1, player_2, battle_tag: str = None, seed=None, max_turns: int = MAX_TURNS,
+                 log_directory: str = None):
+        """
+        :param player_1: poke_env Players with a team, choose_move must not be a coroutine
+        :param player_2:
+        :param battle_tag:
+        :param seed: seed of the random events of the battle
+        :param max_turns:
+        :param log_directory: if given, the protocol stream seen by each player is saved there
+            in the format of ReplayHarness
+        """
+        self.battle_tag = battle_tag or f"battle-gen8vgc2021-local{next(_battle_ids)}"
+        self.rng = random.Random(seed)
+        self.max_turns = max_turns
+        self.turn = 0
+        self.weather = None
+        self.weather_turns = 0
+        self.terrain = None
+        self.terrain_turns = 0
+        self.trick_room_turns = 0
+        self.rqid = 0
+        # choices that were not valid and were replaced by the default choice
+        self.invalid_choices = 0
+        # SimPokemon -> action chosen in the current turn
+        self._choices = {}
+        self.log_directory = log_directory
+        # protocol lines sent to each player
+        self._logs = [[">" + self.battle_tag], [">" + self.battle_tag]] if log_directory else None
+        self.sides = []
+        for index, player in enumerate((player_1, player_2)):
+            view = DoubleBattle(self.battle_tag, player.username, logging.getLogger(player.username), gen=GEN)
+            view._player_role = f"p{index + 1}"
+            self.sides.append(SimSide(index, player, view, unpack_team(player._team.yield_team())))
+            player._battles[self.battle_tag] = view
+
+    # =============================================================================
+    # protocol
+    # =============================================================================
+    def _send(self, *parts):
+        """
+        sends a protocol message to both players, a SimPokemon part is sent as its identifier,
+        a (SimPokemon,) part as its condition (HP values for its owner, HP percentage for the opponent)
+        """
+        for side in self.sides:
+            message = [""]
+            for part in parts:
+                if isinstance(part, SimPokemon):
+                    part = part.ident()
+                elif isinstance(part, tuple):
+                    part = part[0].condition(own=part[0].side is side)
+                message.append(part)
+            if self._logs is not None:
+                self._logs[side.index].append("|".join(message))
+            side.view._parse_message(message)
+
+    def _request(self, side: SimSide, force_switch=None, wait=False, team_preview=False):
+        self.rqid += 1
+        pokemon = side.team if team_preview else side.pokemon
+        request = {
+            "side": {"name": side.player.username, "id": side.id,
+                     "pokemon": [mon.request(i < 2 and not team_preview) for i, mon in enumerate(pokemon)]},
+            "rqid": self.rqid,
+        }
+        if team_preview:
+            request["teamPreview"] = True
+            request["maxTeamSize"] = TEAM_SIZE
+        elif wait:
+            request["wait"] = True
+        elif force_switch is not None:
+            request["forceSwitch"] = force_switch
+        else:
+            request["active"] = [mon.move_request() for mon in side.pokemon[:2]]
+        if self._logs is not None:
+            self._logs[side.index].append("|request|" + json.dumps(request))
+        side.view._parse_request(request)
+
+    # =============================================================================
+    # battle flow
+    # =============================================================================
+    def run(self) -> Optional[int]:
+        """
+        plays the battle to the end
+        :return: index of the winner (0 for player_1), None for a tie
+        """
+        self._team_preview()
+        self._send("start")
+        for side in self.sides:
+            for mon in side.pokemon[:2]:
+                self._send("switch", mon, mon.details, (mon,))
+        for side in self.sides:
+            for mon in side.pokemon[:2]:
+                self._switch_in_abilities(mon)
+        winner = self._winner()
+        while winner is None and self.turn < self.max_turns:
+            self.turn += 1
+            self._play_turn()
+            winner = self._winner()
+            if winner is None:
+                self._replace_fainted()
+        for side in self.sides:
+            if winner is None or winner < 0:
+                side.view._tied()
+            else:
+                side.view._won_by(self.sides[winner].player.username)
+            side.player._battle_finished_callback(side.view)
+        if self._logs is not None:
+            self._save_logs(winner)
+        return winner if winner is not None and winner >= 0 else None
+
+    def _save_logs(self, winner: Optional[int]):
+        os.makedirs(self.log_directory, exist_ok=True)
+        end = "|tie" if winner is None or winner < 0 else "|win|" + self.sides[winner].player.username
+        for side, lines in zip(self.sides, self._logs):
+            path = os.path.join(self.log_directory, f"{self.battle_tag}-{side.player.username}.log")
+            with open(path, "w", encoding="utf-8") as file:
+                file.write("\n".join(lines + [end]) + "\n")
+
+    def _winner(self) -> Optional[int]:
+        """
+        :return: None while the battle goes on, -1 for a tie
+        """
+        defeated = [side.defeated() for side in self.sides]
+        if all(defeated):
+            return -1
+        if any(defeated):
+            return defeated.index(False)
+        return None
+
+    def _team_preview(self):
+        for side in self.sides:
+            self._send("player", side.id, side.player.username, "", "")
+        for side in self.sides:
+            self._send("teamsize", side.id, str(len(side.team)))
+        for side in self.sides:
+            for mon in side.team:
+                self._send("poke", side.id, mon.details, "")
+        for side in self.sides:
+            self._request(side, team_preview=True)
+        for side in self.sides:
+            choice = side.player.teampreview(side.view)
+            order = []
+            for digit in choice.replace("/team", ""):
+                if digit.isdigit() and 0 < int(digit) <= len(side.team) and int(digit) - 1 not in order:
+                    order.append(int(digit) - 1)
+            order += [i for i in range(len(side.team)) if i not in order]
+            side.pokemon = [side.team[i] for i in order[:TEAM_SIZE]]
+
+    def _play_turn(self):
+        for side in self.sides:
+            self._request(side)
+        self._send("turn", str(self.turn))
+        actions = []
+        for side in self.sides:
+            slots = [slot for slot, mon in enumerate(side.active()) if mon is not None]
+            choices = self._parse_choices(side, side.player.choose_move(side.view).message, slots)
+            for slot, choice in zip(slots, choices):
+                actions.append(self._action(side, slot, choice))
+        for mon in self._all_active():
+            mon.moved = False
+            mon.hit_by = None
+        self._choices = {action[2]: action for action in actions}
+        # switches first, then moves by priority and speed
+        self.rng.shuffle(actions)
+        actions.sort(key=lambda action: self._action_order(action))
+        for action in actions:
+            kind, side, mon = action[:3]
+            if mon.fainted or side.slot_of(mon) is None:
+                continue
+            if kind == "switch":
+                self._switch(side, side.slot_of(mon), action[3])
+            else:
+                self._use_move(mon, action[3], action[4])
+            mon.moved = True
+        self._end_of_turn()
+
+    def _replace_fainted(self):
+        sides = []
+        for side in self.sides:
+            bench = side.bench()
+            force_switch = [mon.fainted and bool(bench) for mon in side.pokemon[:2]]
+            if sum(force_switch) > len(bench):
+                # only as many switches as Pokémon left
+                force_switch[1] = False
+            sides.append((side, force_switch))
+        if not any(any(force_switch) for side, force_switch in sides):
+            return
+        switches = []
+        for side, force_switch in sides:
+            if not any(force_switch):
+                self._request(side, wait=True)
+                continue
+            self._request(side, force_switch=force_switch)
+            slots = [slot for slot in range(2) if force_switch[slot]]
+            choices = self._parse_choices(side, side.player.choose_move(side.view).message, slots, switch_only=True)
+            switches += [(side, slot, choice[1]) for slot, choice in zip(slots, choices)]
+        for side, slot, mon in switches:
+            self._switch(side, slot, mon)
+
+    # =============================================================================
+    # choices
+    # =============================================================================
+    def _parse_choices(self, side: SimSide, message: str, slots: List[int], switch_only=False) -> List[tuple]:
+        """
+        reads the choices of a player for the given slots as Showdown would, invalid choices are replaced
+        by the default choice
+        :param side:
+        :param message: "/choose ..." message of the order
+        :param slots: slots waiting for a choice, in order
+        :param switch_only: True when replacing fainted Pokémon
+        :return: ("move", Move, target) or ("switch", SimPokemon) for each slot
+        """
+        parts = [part.strip() for part in message.replace("/choose", "", 1).split(",")]
+        choices = []
+        chosen_switches = []
+        for i, slot in enumerate(slots):
+            mon = side.pokemon[slot]
+            tokens = parts[i].split() if i < len(parts) else []
+            choice = None
+            if tokens and tokens[0] == "switch" and len(tokens) > 1:
+                choice = self._parse_switch(side, " ".join(tokens[1:]), chosen_switches)
+            elif tokens and tokens[0] == "move" and len(tokens) > 1 and not switch_only:
+                choice = self._parse_move(mon, tokens[1:])
+            if choice is None:
+                if tokens and tokens[0] != "default":
+                    self.invalid_choices += 1
+                choice = self._default_choice(side, mon, chosen_switches, switch_only)
+            if choice[0] == "switch":
+                chosen_switches.append(choice[1])
+            choices.append(choice)
+        return choices
+
+    @staticmethod
+    def _parse_switch(side: SimSide, text: str, chosen: List[SimPokemon]) -> Optional[tuple]:
+        if text.isdigit():
+            index = int(text) - 1
+            candidates = side.pokemon[index:index + 1] if index >= 0 else []
+        else:
+            candidates = [mon for mon in side.pokemon
+                          if to_id_str(text) in (to_id_str(mon.species), to_id_str(mon.name))]
+        for mon in candidates:
+            if mon in side.bench() and mon not in chosen:
+                return "switch", mon
+        return None
+
+    @staticmethod
+    def _parse_move(mon: SimPokemon, tokens: List[str]) -> Optional[tuple]:
+        target = None
+        if len(tokens) > 1 and tokens[-1].lstrip("-").isdigit():
+            target = int(tokens[-1])
+        request = mon.move_request()["moves"]
+        move_id = to_id_str(tokens[0])
+        if move_id.isdigit() and 0 < int(move_id) <= len(request):
+            move_id = request[int(move_id) - 1]["id"]
+        for entry in request:
+            if entry["id"] == move_id and not entry.get("disabled"):
+                return "move", _move(move_id), target
+        return None
+
+    @staticmethod
+    def _default_choice(side: SimSide, mon: SimPokemon, chosen: List[SimPokemon], switch_only: bool) -> tuple:
+        if switch_only:
+            return "switch", next(bench for bench in side.bench() if bench not in chosen)
+        entry = next(entry for entry in mon.move_request()["moves"] if not entry.get("disabled"))
+        return "move", _move(entry["id"]), None
+
+    def _action(self, side: SimSide, slot: int, choice: tuple) -> tuple:
+        mon = side.pokemon[slot]
+        if choice[0] == "switch":
+            return "switch", side, mon, choice[1]
+        return "move", side, mon, choice[1], choice[2]
+
+    def _action_order(self, action: tuple) -> tuple:
+        kind, side, mon = action[:3]
+        if kind == "switch":
+            return -7, -self._speed(mon)
+        priority = self._priority(mon, action[3])
+        speed = self._speed(mon)
+        return -priority, speed if self.trick_room_turns else -speed
+
+    def _priority(self, mon: SimPokemon, move: Move) -> int:
+        priority = move.priority
+        if mon.ability == "prankster" and move.category == MoveCategory.STATUS:
+            priority += 1
+        elif mon.ability == "galewings" and move.type == PokemonType.FLYING and mon.hp == mon.max_hp:
+            priority += 1
+        return priority
+
+    def _speed(self, mon: SimPokemon) -> float:
+        speed = mon.stat("spe")
+        modifiers = mon.modifiers()
+        speed *= modifiers.speed
+        if mon.status == Status.PAR and not modifiers.quick_feet:
+            speed *= 0.5
+        if mon.status is not None and modifiers.quick_feet:
+            speed *= 1.5
+        if self.weather is not None and _WEATHER_SPEED_ABILITIES.get(mon.ability) == self.weather:
+            speed *= 2
+        if "tailwind" in mon.side.conditions:
+            speed *= 2
+        return speed
+
+    def _all_active(self) -> List[SimPokemon]:
+        return [mon for side in self.sides for mon in side.active() if mon is not None]
+
+    # =============================================================================
+    # switching
+    # =============================================================================
+    def _switch(self, side: SimSide, slot: int, mon: SimPokemon):
+        out = side.pokemon[slot]
+        out.switch_out()
+        index = side.pokemon.index(mon)
+        side.pokemon[slot], side.pokemon[index] = mon, out
+        self._send("switch", mon, mon.details, (mon,))
+        self._switch_in_abilities(mon)
+
+    def _switch_in_abilities(self, mon: SimPokemon):
+        if mon.ability in _WEATHER_ABILITIES:
+            self._send("-ability", mon, mon.ability)
+            self._set_weather(_WEATHER_ABILITIES[mon.ability])
+        elif mon.ability in _TERRAIN_ABILITIES:
+            self._send("-ability", mon, mon.ability)
+            self._set_terrain(_TERRAIN_ABILITIES[mon.ability])
+        elif mon.ability == "intimidate":
+            self._send("-ability", mon, "Intimidate", "boost")
+            for foe in self._foes(mon):
+                self._boost(foe, {"atk": -1})
+
+    def _foes(self, mon: SimPokemon) -> List[SimPokemon]:
+        return [foe for foe in self.sides[1 - mon.side.index].active() if foe is not None]
+
+    def _ally(self, mon: SimPokemon) -> Optional[SimPokemon]:
+        slot = mon.side.slot_of(mon)
+        return mon.side.active()[1 - slot] if slot is not None else None
+
+    # =============================================================================
+    # field
+    # =============================================================================
+    def _set_weather(self, weather: Weather):
+        if self.weather == weather:
+            return
+        self.weather = weather
+        self.weather_turns = 5
+        self._send("-weather", _WEATHER_NAMES[weather])
+
+    def _set_terrain(self, terrain: Field):
+        if self.terrain == terrain:
+            return
+        if self.terrain is not None:
+            self._send("-fieldend", "move: " + _TERRAIN_NAMES[self.terrain])
+        self.terrain = terrain
+        self.terrain_turns = 5
+        self._send("-fieldstart", "move: " + _TERRAIN_NAMES[terrain])
+
+    def _set_side_condition(self, side: SimSide, condition: str, user: SimPokemon) -> bool:
+        if condition not in _SIDE_CONDITIONS or condition in side.conditions:
+            return False
+        if condition == "auroraveil" and self.weather != Weather.HAIL:
+            return False
+        name, turns = _SIDE_CONDITIONS[condition]
+        if condition != "tailwind" and user.item == "lightclay":
+            turns = 8
+        side.conditions[condition] = turns
+        self._send("-sidestart", side.name, name)
+        return True
+
+    # =============================================================================
+    # moves
+    # =============================================================================
+    def _targets(self, user: SimPokemon, move: Move, target: Optional[int]) -> List[SimPokemon]:
+        foes = self.sides[1 - user.side.index].active()
+        alive_foes = [foe for foe in foes if foe is not None]
+        ally = self._ally(user)
+        kind = move.target
+        if kind == "allAdjacentFoes":
+            return alive_foes
+        if kind == "allAdjacent":
+            return alive_foes + ([ally] if ally is not None else [])
+        if kind in ("self", "allySide", "all", "foeSide", "allies", "allyTeam", "scripted"):
+            return [user]
+        if kind == "adjacentAlly":
+            return [ally] if ally is not None else []
+        # position -1, -2 of the request is our slot 0, 1
+        ally_chosen = target is not None and target < 0 and ally is not None \
+            and user.side.slot_of(user) != -target - 1
+        if kind == "adjacentAllyOrSelf":
+            return [ally] if ally_chosen else [user]
+        if not alive_foes:
+            return []
+        if ally_chosen and kind in ("normal", "any"):
+            return [ally]
+        # single target foe moves: redirection, then the chosen foe or the other one if it fainted
+        redirector = next((foe for foe in alive_foes if foe.redirecting), None)
+        if redirector is not None and not (redirector.redirecting == "ragepowder" and (
+                PokemonType.GRASS in user.types or user.modifiers().powder_immune)):
+            return [redirector]
+        if target is not None and 0 < target <= 2 and foes[target - 1] is not None:
+            return [foes[target - 1]]
+        return [self.rng.choice(alive_foes)]
+
+    def _use_move(self, user: SimPokemon, move: Move, target: Optional[int]):
+        if not self._can_move(user):
+            return
+        targets = self._targets(user, move, target)
+        if move.id != "struggle":
+            user.pp[move.id] = max(user.pp[move.id] - 1, 0)
+        if user.modifiers().choice_lock and move.id != "struggle":
+            user.choice_lock = move.id
+        if not move.is_protect_move:
+            user.protect_counter = 0
+        self._send("move", user, move.entry["name"], targets[0] if targets and targets[0] is not user else "")
+        if not targets:
+            self._send("-notarget", user)
+            return
+        info = MoveIndex.get(move)
+        if info.fake_out and user.active_turns > 0 or not self._sucker_punch_works(move, targets[0]):
+            self._send("-fail", user)
+            return
+        if move.category == MoveCategory.STATUS:
+            self._use_status_move(user, move, targets)
+            return
+        damage_dealt = 0
+        hit = False
+        for target_mon in targets:
+            if target_mon.fainted:
+                continue
+            if target_mon.protected and "protect" in move.flags \
+                    and not (user.ability == "unseenfist" and "contact" in move.flags):
+                self._send("-activate", target_mon, "move: Protect")
+                continue
+            if self._is_immune(user, move, target_mon):
+                self._send("-immune", target_mon)
+                continue
+            if not self._hits(user, move, target_mon):
+                self._send("-miss", user, target_mon)
+                continue
+            damage_dealt += self._hit(user, move, target_mon, len(targets))
+            hit = True
+        if not hit:
+            return
+        if info.ignores_screens:
+            for screen in ("reflect", "lightscreen", "auroraveil"):
+                if self.sides[1 - user.side.index].conditions.pop(screen, None) is not None:
+                    self._send("-sideend", self.sides[1 - user.side.index].name, _SIDE_CONDITIONS[screen][0])
+        if move.self_boost and not user.fainted:
+            self._boost(user, move.self_boost)
+        if move.recoil and damage_dealt and not user.fainted:
+            self._damage(user, max(round(damage_dealt * move.recoil), 1), "[from] Recoil")
+        if move.drain and damage_dealt and not user.fainted:
+            self._heal(user, max(round(damage_dealt * move.drain), 1), "[from] drain")
+        if move.id == "struggle" and not user.fainted:
+            self._damage(user, max(user.max_hp // 4, 1), "[from] Recoil")
+        if user.item == "lifeorb" and damage_dealt and not user.fainted:
+            self._damage(user, max(user.max_hp // 10, 1), "[from] item: Life Orb")
+
+    def _can_move(self, user: SimPokemon) -> bool:
+        if user.status == Status.SLP:
+            user.sleep_turns -= 1
+            if user.sleep_turns > 0:
+                self._send("cant", user, "slp")
+                return False
+            self._cure(user)
+        elif user.status == Status.FRZ:
+            if self.rng.random() >= 0.2:
+                self._send("cant", user, "frz")
+                return False
+            self._cure(user)
+        if user.flinched:
+            self._send("cant", user, "flinch")
+            return False
+        if user.status == Status.PAR and self.rng.random() < 0.25:
+            self._send("cant", user, "par")
+            return False
+        return True
+
+    def _sucker_punch_works(self, move: Move, target: SimPokemon) -> bool:
+        if move.id != "suckerpunch":
+            return True
+        action = self._choices.get(target)
+        return action is not None and action[0] == "move" and not target.moved \
+            and action[3].category != MoveCategory.STATUS
+
+    def _is_immune(self, user: SimPokemon, move: Move, target: SimPokemon) -> bool:
+        type_multiplier = TypeChart.damage_multiplier(target, move)
+        modifiers = target.modifiers()
+        if move.category != MoveCategory.STATUS and type_multiplier == 0:
+            return True
+        if move.type in modifiers.immune_types and target is not user:
+            return True
+        if modifiers.wonder_guard and move.category != MoveCategory.STATUS and type_multiplier <= 1:
+            return True
+        if "powder" in move.flags and (PokemonType.GRASS in target.types or modifiers.powder_immune):
+            return True
+        if user.ability == "prankster" and move.category == MoveCategory.STATUS \
+                and PokemonType.DARK in target.types and target.side is not user.side:
+            return True
+        if self.terrain == Field.PSYCHIC_TERRAIN and self._priority(user, move) > 0 and target.is_grounded() \
+                and target.side is not user.side:
+            return True
+        return False
+
+    def _hits(self, user: SimPokemon, move: Move, target: SimPokemon) -> bool:
+        if move.entry.get("accuracy") is True or target is user:
+            return True
+        stage = max(-6, min(user.boosts["accuracy"] - target.boosts["evasion"], 6))
+        return self.rng.random() < move.accuracy * _boost_multiplier(stage, 3)
+
+    def _hit(self, user: SimPokemon, move: Move, target: SimPokemon, n_targets: int) -> int:
+        """
+        deals the damage of move to target with its secondary effects
+        :return: damage dealt
+        """
+        min_hits, max_hits = move.n_hit
+        if min_hits == max_hits:
+            hits = min_hits
+        elif user.modifiers().skill_link:
+            hits = max_hits
+        else:
+            hits = self.rng.choice(_MULTI_HITS)
+        total = 0
+        for _ in range(hits):
+            if target.fainted:
+                break
+            crit = self._crit(user, move)
+            damage = self._damage_roll(user, move, target, n_targets, crit)
+            if target.hp == target.max_hp and damage >= target.hp and target.item == "focussash":
+                damage = target.hp - 1
+                target.item = ""
+                self._send("-enditem", target, "Focus Sash")
+            damage = min(damage, target.hp)
+            self._damage(target, damage)
+            target.hit_by = (user, damage, move.category)
+            total += damage
+        if target.fainted:
+            return total
+        type_multiplier = TypeChart.damage_multiplier(target, move)
+        if target.item == "weaknesspolicy" and type_multiplier > 1 and not move.damage:
+            target.item = ""
+            self._send("-enditem", target, "Weakness Policy")
+            self._boost(target, {"atk": 2, "spa": 2})
+        if target.item == "airballoon":
+            target.item = ""
+            self._send("-enditem", target, "Air Balloon")
+        self._secondary_effects(user, move, target)
+        self._sitrus_berry(target)
+        return total
+
+    def _crit(self, user: SimPokemon, move: Move) -> bool:
+        if MoveIndex.get(move).always_crit:
+            return True
+        stage = (move.crit_ratio or 1) - 1 + (user.item == "scopelens") + (user.ability == "superluck")
+        return self.rng.random() < _CRIT_CHANCE[min(stage, len(_CRIT_CHANCE) - 1)]
+
+    def _damage_roll(self, user: SimPokemon, move: Move, target: SimPokemon, n_targets: int, crit: bool) -> int:
+        info = MoveIndex.get(move)
+        if info.fixed_damage:
+            return user.level
+        if info.halve_hp:
+            return max(target.hp // 2, 1)
+        user_modifiers = user.modifiers()
+        target_modifiers = target.modifiers()
+        physical = move.category == MoveCategory.PHYSICAL
+
+        base_power = move.base_power
+        if info.acrobatics and not user.item:
+            base_power *= 2
+        if info.gyro_ball:
+            base_power = max(min(25 * self._speed(target) / max(self._speed(user), 1) + 1, 150), 1)
+        if info.facade and user.status is not None:
+            base_power *= 2
+        if self.terrain is not None and user.is_grounded() and _TERRAIN_TYPES.get(self.terrain) == move.type:
+            base_power *= 1.3
+        if self.terrain == Field.MISTY_TERRAIN and target.is_grounded() and move.type == PokemonType.DRAGON:
+            base_power *= 0.5
+
+        if info.target_attack:
+            attack = target.stat("atk", crit)
+        elif info.defense_as_attack:
+            attack = user.stat("def", crit)
+        else:
+            attack = user.stat("atk" if physical else "spa", crit)
+        attack *= user_modifiers.physical_attack if physical else user_modifiers.special_attack
+        if physical and user.status is not None and user_modifiers.guts:
+            attack *= 1.5
+        defense = target.stat("def" if physical or info.targets_defense else "spd", crit, attacking=False)
+        if not physical:
+            defense *= target_modifiers.special_defense
+            if self.weather == Weather.SANDSTORM and PokemonType.ROCK in target.types \
+                    and not info.targets_defense:
+                defense *= 1.5
+
+        damage = math.floor(math.floor(math.floor(2 * user.level / 5 + 2) * base_power * attack
+                                       / max(defense, 1)) / 50) + 2
+        if n_targets > 1:
+            damage = math.floor(damage * 0.75)
+        if self.weather == Weather.RAINDANCE:
+            damage = math.floor(damage * {PokemonType.WATER: 1.5, PokemonType.FIRE: 0.5}.get(move.type, 1))
+        elif self.weather == Weather.SUNNYDAY:
+            damage = math.floor(damage * {PokemonType.FIRE: 1.5, PokemonType.WATER: 0.5}.get(move.type, 1))
+        if crit:
+            damage = math.floor(damage * 1.5)
+        damage = math.floor(damage * self.rng.randint(85, 100) / 100)
+        if move.type in user.types:
+            damage = math.floor(damage * (2 if user_modifiers.adaptability else 1.5))
+        type_multiplier = TypeChart.damage_multiplier(target, move) if move.id != "struggle" else 1
+        damage = math.floor(damage * type_multiplier)
+        if physical and user.status == Status.BRN and not user_modifiers.guts and not info.facade:
+            damage = math.floor(damage * 0.5)
+
+        multiplier = 1
+        target_conditions = target.side.conditions
+        if not crit and not info.ignores_screens and not user_modifiers.infiltrator \
+                and ("auroraveil" in target_conditions
+                     or any(screen in target_conditions and category == move.category
+                            for screen, category in _SCREENS.items())):
+            # in double battles screens reduce damage by 2/3
+            multiplier *= 2732 / 4096
+        if target_modifiers.multiscale and target.hp == target.max_hp and not user_modifiers.mold_breaker:
+            multiplier *= 0.5
+        multiplier *= user_modifiers.attack
+        if type_multiplier > 1:
+            multiplier *= user_modifiers.super_effective
+        return max(math.floor(damage * multiplier), 1)
+
+    def _secondary_effects(self, user: SimPokemon, move: Move, target: SimPokemon):
+        for secondary in move.secondary or []:
+            if self.rng.random() * 100 >= secondary.get("chance", 100):
+                continue
+            if secondary.get("status"):
+                self._set_status(target, Status[secondary["status"].upper()])
+            if secondary.get("boosts") and not target.fainted:
+                self._boost(target, secondary["boosts"])
+            if secondary.get("volatileStatus") == "flinch" and not target.moved:
+                target.flinched = True
+            if secondary.get("self", {}).get("boosts") and not user.fainted:
+                self._boost(user, secondary["self"]["boosts"])
+
+    def _use_status_move(self, user: SimPokemon, move: Move, targets: List[SimPokemon]):
+        volatile = move.volatile_status
+        if move.is_protect_move:
+            if self.rng.random() >= 1 / 3 ** user.protect_counter:
+                user.protect_counter = 0
+                self._send("-fail", user)
+                return
+            user.protect_counter += 1
+            user.protected = True
+            self._send("-singleturn", user, "Protect")
+            return
+        if volatile in ("followme", "ragepowder"):
+            user.redirecting = volatile
+            self._send("-singleturn", user, "move: " + move.entry["name"])
+            return
+        if move.weather is not None and move.weather in _WEATHER_NAMES:
+            self._set_weather(move.weather)
+            return
+        if move.terrain is not None and move.terrain in _TERRAIN_NAMES:
+            self._set_terrain(move.terrain)
+            return
+        if move.pseudo_weather == "trickroom":
+            if self.trick_room_turns:
+                self.trick_room_turns = 0
+                self._send("-fieldend", "move: Trick Room")
+            else:
+                self.trick_room_turns = 5
+                self._send("-fieldstart", "move: Trick Room", f"[of] {user.ident()}")
+            return
+        if move.side_condition:
+            if not self._set_side_condition(user.side, move.side_condition, user):
+                self._send("-fail", user)
+            return
+        if move.heal:
+            self._heal(user, max(round(user.max_hp * move.heal), 1))
+            return
+        for target in targets:
+            if target is not user:
+                if target.protected and "protect" in move.flags:
+                    self._send("-activate", target, "move: Protect")
+                    continue
+                if self._is_immune(user, move, target):
+                    self._send("-immune", target)
+                    continue
+                if not self._hits(user, move, target):
+                    self._send("-miss", user, target)
+                    continue
+            if move.status is not None:
+                self._set_status(target, move.status)
+            if move.boosts:
+                self._boost(target, move.boosts)
+        if move.self_boost:
+            self._boost(user, move.self_boost)
+
+    # =============================================================================
+    # effects
+    # =============================================================================
+    def _damage(self, mon: SimPokemon, damage: int, source: str = None):
+        if mon.fainted or damage <= 0:
+            return
+        mon.hp = max(mon.hp - damage, 0)
+        if source is None:
+            self._send("-damage", mon, (mon,))
+        else:
+            self._send("-damage", mon, (mon,), source)
+        if mon.fainted:
+            self._send("faint", mon)
+
+    def _heal(self, mon: SimPokemon, amount: int, source: str = None):
+        if mon.fainted or mon.hp == mon.max_hp:
+            return
+        mon.hp = min(mon.hp + amount, mon.max_hp)
+        if source is None:
+            self._send("-heal", mon, (mon,))
+        else:
+            self._send("-heal", mon, (mon,), source)
+
+    def _sitrus_berry(self, mon: SimPokemon):
+        if mon.item == "sitrusberry" and not mon.fainted and mon.hp <= mon.max_hp // 2:
+            mon.item = ""
+            self._send("-enditem", mon, "Sitrus Berry", "[eat]")
+            self._heal(mon, mon.max_hp // 4, "[from] item: Sitrus Berry")
+
+    def _boost(self, mon: SimPokemon, boosts: Dict[str, int]):
+        for stat, amount in boosts.items():
+            old = mon.boosts[stat]
+            mon.boosts[stat] = max(-6, min(old + amount, 6))
+            change = mon.boosts[stat] - old
+            self._send("-boost" if amount > 0 else "-unboost", mon, stat, str(abs(change)))
+
+    def _set_status(self, mon: SimPokemon, status: Status) -> bool:
+        if mon.fainted or mon.status is not None:
+            return False
+        if set(mon.types) & _STATUS_IMMUNE_TYPES.get(status, set()):
+            return False
+        if mon.is_grounded() and (self.terrain == Field.MISTY_TERRAIN
+                                  or self.terrain == Field.ELECTRIC_TERRAIN and status == Status.SLP):
+            return False
+        mon.status = status
+        if status == Status.SLP:
+            mon.sleep_turns = self.rng.randint(2, 4)
+        self._send("-status", mon, status.name.lower())
+        return True
+
+    def _cure(self, mon: SimPokemon):
+        status = mon.status
+        mon.status = None
+        self._send("-curestatus", mon, status.name.lower(), "[msg]")
+
+    # =============================================================================
+    # end of turn
+    # =============================================================================
+    def _end_of_turn(self):
+        if self.weather is not None:
+            self.weather_turns -= 1
+            if self.weather_turns <= 0:
+                self.weather = None
+                self._send("-weather", "none")
+            else:
+                self._send("-weather", _WEATHER_NAMES[self.weather], "[upkeep]")
+                immune = {Weather.SANDSTORM: {PokemonType.ROCK, PokemonType.GROUND, PokemonType.STEEL},
+                          Weather.HAIL: {PokemonType.ICE}}.get(self.weather)
+                if immune is not None:
+                    for mon in self._all_active():
+                        if not set(mon.types) & immune and mon.item != "safetygoggles" and mon.ability != "overcoat":
+                            self._damage(mon, max(mon.max_hp // 16, 1), "[from] " + _WEATHER_NAMES[self.weather])
+        for mon in self._all_active():
+            if self.terrain == Field.GRASSY_TERRAIN and mon.is_grounded():
+                self._heal(mon, max(mon.max_hp // 16, 1), "[from] Grassy Terrain")
+            if mon.item == "leftovers":
+                self._heal(mon, max(mon.max_hp // 16, 1), "[from] item: Leftovers")
+            if mon.status == Status.BRN:
+                self._damage(mon, max(mon.max_hp // 16, 1), "[from] brn")
+            elif mon.status == Status.PSN:
+                self._damage(mon, max(mon.max_hp // 8, 1), "[from] psn")
+            elif mon.status == Status.TOX:
+                mon.toxic_turns += 1
+                self._damage(mon, max(mon.max_hp * mon.toxic_turns // 16, 1), "[from] psn")
+            self._sitrus_berry(mon)
+        for side in self.sides:
+            for condition in list(side.conditions):
+                side.conditions[condition] -= 1
+                if side.conditions[condition] <= 0:
+                    del side.conditions[condition]
+                    self._send("-sideend", side.name, _SIDE_CONDITIONS[condition][0])
+        if self.terrain is not None:
+            self.terrain_turns -= 1
+            if self.terrain_turns <= 0:
+                self._send("-fieldend", "move: " + _TERRAIN_NAMES[self.terrain])
+                self.terrain = None
+        if self.trick_room_turns:
+            self.trick_room_turns -= 1
+            if not self.trick_room_turns:
+                self._send("-fieldend", "move: Trick Room")
+        for mon in self._all_active():
+            mon.protected = False
+            mon.redirecting = False
+            mon.flinched = False
+            mon.active_turns += 1
+        self._send("upkeep")
+
+
+# =============================================================================
+# evaluation without server
+# =============================================================================
+def battle_against(player, opponent, n_battles: int = 1, seed=None, log_directory: str = None) \
+        -> List[Optional[int]]:
+    """
+    same as player.battle_against(opponent, n_battles) with local battles: the battles are recorded by both
+    players, so n_won_battles, win_rate... work as with a server
+    :param player:
+    :param opponent:
+    :param n_battles:
+    :param seed: seed of the random events of the battles, None for a random one
+    :param log_directory: directory where the protocol logs of the battles are saved, None to not save them
+    :return: winner of each battle (0 player, 1 opponent, None tie)
+    """
+    rng = random.Random(seed)
+    return [LocalBattle(player, opponent, seed=rng.getrandbits(64), log_directory=log_directory).run()
+            for _ in range(n_battles)]
+
+
+def record_battles(player, opponent, n_battles: int, seed, on_record, skip: int = 0, names: tuple = None):
+    """
+    plays the battles of battle_against(player, opponent, n_battles, seed) but the first skip ones, so that an
+    interrupted evaluation resumes with the same battles, and calls on_record with the record of each
+    (ResultStore.battle_record). The random choices of the players are seeded with the seed of each battle, so that
+    the skipped battles don't change the next ones
+    :param player:
+    :param opponent:
+    :param n_battles:
+    :param seed:
+    :param on_record:
+    :param skip: number of battles already played
+    :param names: names of player and opponent in the records, the usernames if None
+    """
+    names = names or (player.username, opponent.username)
+    rng = random.Random(seed)
+    for i in range(n_battles):
+        battle_seed = rng.getrandbits(64)
+        if i < skip:
+            continue
+        random.seed(battle_seed)
+        np.random.seed(battle_seed & 0xFFFFFFFF)
+        start = time.perf_counter()
+        battle = LocalBattle(player, opponent, seed=battle_seed)
+        battle.run()
+        on_record(battle_record(names[0], names[1], battle.sides[0].view, battle.sides[1].view,
+                                time.perf_counter() - start))
+
+
+def cross_evaluate(players: list, n_challenges: int, seed=None, store=None) -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    same result of poke_env cross_evaluate, with local battles
+    :param players:
+    :param n_challenges: battles between each pair of players
+    :param seed: with a store, the seed recorded in it is used (ResultStore.run_seed)
+    :param store: ResultStore where every battle is recorded as it ends, the battles already there are skipped
+    :return: results[p_1][p_2] = fraction of the battles won by p_1 against p_2
+    """
+    if store is not None:
+        seed = store.run_seed(seed)
+    rng = random.Random(seed)
+    if store is not None:
+        for p_1, p_2 in itertools.combinations(players, 2):
+            record_battles(p_1, p_2, n_challenges, rng.getrandbits(64), store.append,
+                           skip=store.done(p_1.username, p_2.username))
+        return store.table([player.username for player in players])
+    results = {p_1.username: {p_2.username: None for p_2 in players} for p_1 in players}
+    for p_1, p_2 in itertools.combinations(players, 2):
+        winners = battle_against(p_1, p_2, n_challenges, rng.getrandbits(64))
+        results[p_1.username][p_2.username] = winners.count(0) / n_challenges
+        results[p_2.username][p_1.username] = winners.count(1) / n_challenges
+    return results
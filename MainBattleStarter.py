@@ -3,8 +3,10 @@ import sys
 
 from poke_env import PlayerConfiguration, LocalhostServerConfiguration
 
+from DoublesEquilibriumPlayer import DoublesEquilibriumPlayer
 from DoublesRandomPlayer import DoubleRandomPlayer
 from DoublesMaxDamagePlayer import DoublesMaxDamagePlayer
+from DoublesSearchPlayer import DoublesSearchPlayer
 from DoublesSmartPlayer import DoublesSmartPlayer
 from DoublesTrueMaxDamagePlayer import DoublesTrueMaxDamagePlayer
 from Teams import RandomTeamFromPool
@@ -44,6 +46,20 @@ async def main():
         battle_format=battle_format
     )
 
+    search_player = DoublesSearchPlayer(
+        player_configuration=PlayerConfiguration("SearchBoyVGC", None),
+        server_configuration=LocalhostServerConfiguration,
+        team=RandomTeamFromPool(),
+        battle_format=battle_format
+    )
+
+    equilibrium_player = DoublesEquilibriumPlayer(
+        player_configuration=PlayerConfiguration("EquilibriumVGC", None),
+        server_configuration=LocalhostServerConfiguration,
+        team=RandomTeamFromPool(),
+        battle_format=battle_format
+    )
+
     match player_choice:
         case 1:
             print("battle request sent by " + random_player.username)
@@ -57,6 +73,12 @@ async def main():
         case 4:
             print("battle request sent by " + smart_player.username)
             await smart_player.send_challenges(human_player_name, n_challenges=1)
+        case 5:
+            print("battle request sent by " + search_player.username)
+            await search_player.send_challenges(human_player_name, n_challenges=1)
+        case 6:
+            print("battle request sent by " + equilibrium_player.username)
+            await equilibrium_player.send_challenges(human_player_name, n_challenges=1)
         case _:
             print("Invalid IA. Closing...")
 
@@ -68,6 +90,8 @@ if __name__ == "__main__":
     player_choice = int(input("1: DoublesRandomPlayer\n"
                               "2: DoublesMaxDamagePlayer\n"
                               "3: DoublesTrueMaxDamagePlayer\n"
-                              "4: DoublesSmartPlayer\n"))
+                              "4: DoublesSmartPlayer\n"
+                              "5: DoublesSearchPlayer\n"
+                              "6: DoublesEquilibriumPlayer\n"))
 
     asyncio.get_event_loop().run_until_complete(main())
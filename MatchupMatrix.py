@@ -0,0 +1,207 @@
+"""
+matchups of our team against the revealed opponents, kept for the whole battle: for every pair the type advantage,
+the speed order, can_damage and the score of SwitchHelper.get_matchup_score_default are stored in matrices
+(our Pokémon × opponent's Pokémon). At every turn only the entries of the Pokémon whose relevant state changed (types,
+moves, item, ability, speed) are recomputed, all of them if Trick Room started or ended
+"""
+import threading
+import weakref
+from typing import Dict, List, Optional
+
+import numpy as np
+from poke_env.environment import DoubleBattle, Pokemon
+
+import MoveUtilities
+
+# battle -> its MatchupMatrix, dropped with the battle by the event loop while a BatchScheduler thread reads it
+_MATRICES = weakref.WeakKeyDictionary()
+_MATRICES_LOCK = threading.Lock()
+
+
+def matchup_score(type_advantage: float, outspeeds: bool, can_damage: bool) -> float:
+    """
+    score of a matchup, smaller is better for us
+    :param type_advantage: MoveUtilities.pokemon_type_advantage(my_pokemon, opponent_pokemon)
+    :param outspeeds: True if my_pokemon moves first
+    :param can_damage: MoveUtilities.can_damage(my_pokemon, opponent_pokemon)
+    :return:
+    """
+    score = 0
+    # A multiplier greater than 1 means we are at a type disadvantage. If there is a better type match, switch
+    if type_advantage == 4:
+        score += 1
+    elif type_advantage == 2:
+        score += 0.5
+    elif type_advantage == 0.5:
+        score -= 0.5
+    elif type_advantage == 0.25:
+        score -= 1
+    if outspeeds:
+        score += 0.5
+    if can_damage:
+        score += 0.5
+    return score
+
+
+def signature(mon: Pokemon, context) -> tuple:
+    """
+    :param mon:
+    :param context: TurnContext of the turn
+    :return: state of mon the matchups depend on: types, moves, item and ability (can_damage, Acrobatics,
+        Skill Link) and effective speed (speed order, Gyro Ball)
+    """
+    return mon.type_1, mon.type_2, mon.item, mon.ability, tuple(mon.moves), context.speed(mon)
+
+
+class MatchupMatrix:
+    def __init__(self, size: int = 6):
+        """
+        :param size: initial number of rows and columns, the matrices grow when needed
+        """
+        # id of the Pokémon -> row (our team) / column (opponent's team)
+        self.rows: Dict[int, int] = {}
+        self.columns: Dict[int, int] = {}
+        self.type_advantage = np.ones((size, size))
+        self.outspeeds = np.zeros((size, size), dtype=bool)
+        self.can_damage = np.zeros((size, size), dtype=bool)
+        self.score = np.zeros((size, size))
+        # False for the entries to recompute
+        self.valid = np.zeros((size, size), dtype=bool)
+        # number of entries computed / read, to measure the reuse between turns
+        self.computed = 0
+        self.read = 0
+        self._row_signatures: Dict[int, tuple] = {}
+        self._column_signatures: Dict[int, tuple] = {}
+        self._trick_room = None
+        self._context = None
+
+    @staticmethod
+    def of(battle: DoubleBattle) -> "MatchupMatrix":
+        """
+        :param battle:
+        :return: the MatchupMatrix of battle, created the first time
+        """
+        with _MATRICES_LOCK:
+            matrix = _MATRICES.get(battle)
+            if matrix is None:
+                matrix = _MATRICES[battle] = MatchupMatrix()
+            return matrix
+
+    @staticmethod
+    def drop(battle: DoubleBattle):
+        """
+        drops the matrix of battle
+        """
+        with _MATRICES_LOCK:
+            _MATRICES.pop(battle, None)
+
+    # =============================================================================
+    # invalidation
+    # =============================================================================
+    def _grow(self, rows: int, columns: int):
+        shape = self.valid.shape
+        if rows <= shape[0] and columns <= shape[1]:
+            return
+        pad = ((0, max(rows - shape[0], 0)), (0, max(columns - shape[1], 0)))
+        self.type_advantage = np.pad(self.type_advantage, pad, constant_values=1)
+        self.outspeeds = np.pad(self.outspeeds, pad)
+        self.can_damage = np.pad(self.can_damage, pad)
+        self.score = np.pad(self.score, pad)
+        self.valid = np.pad(self.valid, pad)
+
+    def _index(self, mon: Pokemon, indices: Dict[int, int], signatures: Dict[int, tuple], context) -> (int, bool):
+        """
+        :return: row or column of mon, True if its state changed since the last turn
+        """
+        key = id(mon)
+        idx = indices.get(key)
+        if idx is None:
+            idx = indices[key] = len(indices)
+        mon_signature = signature(mon, context)
+        changed = signatures.get(key) != mon_signature
+        signatures[key] = mon_signature
+        return idx, changed
+
+    def update(self, context):
+        """
+        invalidates the entries whose Pokémon changed since the last update, all of them if Trick Room changed
+        :param context: TurnContext of the turn
+        """
+        self._context = context
+        battle = context.battle
+        changed_rows = []
+        for mon in battle.team.values():
+            row, changed = self._index(mon, self.rows, self._row_signatures, context)
+            if changed:
+                changed_rows.append(row)
+        changed_columns = []
+        for mon in battle.opponent_team.values():
+            column, changed = self._index(mon, self.columns, self._column_signatures, context)
+            if changed:
+                changed_columns.append(column)
+        self._grow(len(self.rows), len(self.columns))
+        self.valid[changed_rows, :] = False
+        self.valid[:, changed_columns] = False
+        if context.snapshot.trick_room != self._trick_room:
+            self._trick_room = context.snapshot.trick_room
+            self.valid[:] = False
+
+    # =============================================================================
+    # reads
+    # =============================================================================
+    def _entries(self, my_mons: List[Pokemon], opponents: List[Optional[Pokemon]], context) -> (np.ndarray,
+                                                                                                 np.ndarray):
+        """
+        computes the invalid entries between my_mons and opponents
+        :return: rows of my_mons, columns of opponents (-1 for None)
+        """
+        if context is not self._context:
+            self.update(context)
+        rows = np.array([self._row(mon, context) for mon in my_mons], dtype=int)
+        columns = np.array([self._column(mon, context) if mon is not None else -1 for mon in opponents], dtype=int)
+        self.read += len(rows) * len(columns)
+        for i, mon in zip(rows, my_mons):
+            for j, opponent in zip(columns, opponents):
+                if j < 0 or self.valid[i, j]:
+                    continue
+                type_advantage = MoveUtilities.pokemon_type_advantage(mon, opponent)
+                outspeeds = context.can_outspeed(mon, opponent)
+                # the scalar can_damage of a few pairs is cheaper than building the DamageMatrix of the turn
+                can_damage = MoveUtilities.can_damage(mon, opponent)
+                self.type_advantage[i, j] = type_advantage
+                self.outspeeds[i, j] = outspeeds
+                self.can_damage[i, j] = can_damage
+                self.score[i, j] = matchup_score(type_advantage, outspeeds, can_damage)
+                self.valid[i, j] = True
+                self.computed += 1
+        return rows, columns
+
+    def _row(self, mon: Pokemon, context) -> int:
+        # Pokémon outside the team of the battle get a row of their own
+        if id(mon) not in self.rows:
+            self._index(mon, self.rows, self._row_signatures, context)
+            self._grow(len(self.rows), self.valid.shape[1])
+        return self.rows[id(mon)]
+
+    def _column(self, mon: Pokemon, context) -> int:
+        if id(mon) not in self.columns:
+            self._index(mon, self.columns, self._column_signatures, context)
+            self._grow(self.valid.shape[0], len(self.columns))
+        return self.columns[id(mon)]
+
+    def scores(self, my_mons: List[Pokemon], opponents: List[Optional[Pokemon]], context) -> np.ndarray:
+        """
+        :param my_mons: Pokémon of our team
+        :param opponents: opponent's Pokémon, None for an empty slot
+        :param context: TurnContext of the turn
+        :return: matrix[i, j] = get_matchup_score_default(battle, my_mons[i], opponents[j]), 0 for None
+        """
+        rows, columns = self._entries(my_mons, opponents, context)
+        return np.where(columns >= 0, self.score[rows[:, None], columns], 0.0)
+
+    def damages(self, my_mons: List[Pokemon], opponents: List[Pokemon], context) -> np.ndarray:
+        """
+        :return: matrix[i, j] = can_damage(my_mons[i], opponents[j])
+        """
+        rows, columns = self._entries(my_mons, opponents, context)
+        return self.can_damage[rows[:, None], columns]
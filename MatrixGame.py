@@ -0,0 +1,219 @@
+"""
+the turn as a simultaneous game: our joint actions and the opponent's (the pruned ones of GameNode.joint_actions)
+are the rows and the columns of a payoff matrix, whose cells are the value of the state after the turn
+(GameNode.evaluate) averaged over the damage rolls. The whole matrix is computed in one NumPy pass over all the
+pairs of joint actions, resolving the turn as GameNode.child does: switches first, then the attacks in order of
+priority and speed (DamageMatrix percentages and the turn order of the snapshot), Protect, retargeting of the
+single target moves and fainted attackers.
+A mixed equilibrium of the matrix is approximated with regret matching (RM+ with linear averaging) within a number
+of iterations and a deadline
+"""
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+import BattleSnapshot
+import GameNode
+from GameNode import MOVE, SWITCH, PASS, ROLLS, ALIVE_WEIGHT
+from TurnContext import TurnContext
+
+# iterations between two checks of the deadline and of the exploitability
+_CHECK_EVERY = 16
+
+_INF = float("inf")
+
+
+# =============================================================================
+# payoff matrix
+# =============================================================================
+def _encode(node: GameNode.GameNode, joint_actions: List[Tuple]) -> dict:
+    """
+    :return: arrays [joint action, slot of the side] of the features of the actions: kind, battler acting (after
+        the switches, -1 if none), move index, target slot, priority, accuracy, how the move picks its targets,
+        Protect
+    """
+    space = node.space
+    entries = [{entry[0]: entry for entry in moves} for moves in space.moves]
+    shape = (len(joint_actions), 2)
+    features = {
+        "kind": np.full(shape, PASS, dtype=int),
+        "row": np.full(shape, -1, dtype=int),
+        "move": np.zeros(shape, dtype=int),
+        "target": np.zeros(shape, dtype=int),
+        "priority": np.zeros(shape, dtype=int),
+        "accuracy": np.zeros(shape),
+        "spread": np.zeros(shape, dtype=int),
+        "protect": np.zeros(shape, dtype=bool),
+    }
+    for a, actions in enumerate(joint_actions):
+        for k, (kind, slot, value, target_slot) in enumerate(actions):
+            features["kind"][a, k] = kind
+            if kind == SWITCH:
+                features["row"][a, k] = value
+                continue
+            row = node.active[slot]
+            features["row"][a, k] = row
+            if kind == MOVE:
+                j, priority, accuracy, spread, protect = entries[row][value]
+                features["move"][a, k] = j
+                features["target"][a, k] = target_slot
+                features["priority"][a, k] = priority
+                features["accuracy"][a, k] = accuracy
+                features["spread"][a, k] = spread
+                features["protect"][a, k] = protect
+    return features
+
+
+def payoff_matrix(node: GameNode.GameNode, ours: List[Tuple], theirs: List[Tuple], rolls=ROLLS) -> np.ndarray:
+    """
+    :param node: state at the start of the turn
+    :param ours: our joint actions
+    :param theirs: opponent's joint actions
+    :param rolls: (damage roll, probability) of the chance node
+    :return: matrix [our joint action, opponent's joint action] of the value of the turn for our side, the same of
+        the expected GameNode.evaluate of node.child over the rolls
+    """
+    space = node.space
+    n = space.n
+    ours_features = _encode(node, ours)
+    theirs_features = _encode(node, theirs)
+    m_a, m_b = len(ours), len(theirs)
+    pairs = m_a * m_b
+    size = pairs * len(rolls)
+
+    def stack(name):
+        # [roll, our action, opponent's action, slot] -> [pair and roll, slot]
+        features = np.concatenate([np.broadcast_to(ours_features[name][:, None, :], (m_a, m_b, 2)),
+                                   np.broadcast_to(theirs_features[name][None, :, :], (m_a, m_b, 2))], axis=2)
+        return np.broadcast_to(features.reshape(1, pairs, 4), (len(rolls), pairs, 4)).reshape(size, 4)
+
+    kind = stack("kind")
+    # the empty slots and the battlers outside the matrix are kept in the extra row n, with 0 HP
+    row = stack("row")
+    row = np.where(row < 0, n, row)
+    move = stack("move")
+    target = stack("target")
+    priority = stack("priority")
+    accuracy = stack("accuracy")
+    spread = stack("spread")
+    protect = stack("protect")
+    roll = np.repeat([roll for roll, _ in rolls], pairs)
+
+    active = np.array([row if row >= 0 else n for row in node.active])
+    active = np.where(kind == SWITCH, row, active[None, :])
+    attacks = (kind == MOVE) & ~protect
+    protected = (kind == MOVE) & protect
+
+    damage_matrix = np.asarray(space.percentage)
+    percentage = np.zeros((n + 1, damage_matrix.shape[1], n + 1))
+    percentage[:n, :, :n] = damage_matrix
+    turn_order = np.append(space.turn_order, 0)
+    hp = np.zeros((size, n + 1))
+    hp[:, :n] = node.hp
+
+    # turn order: attacks by priority, speed and slot, the other actions at the end
+    slots = np.broadcast_to(np.arange(4), (size, 4))
+    order = np.lexsort((slots, turn_order[active], -priority, ~attacks), axis=1)
+
+    index = np.arange(size)
+    foe = np.array([[slot // 2 != other // 2 for other in range(4)] for slot in range(4)])
+    adjacent = foe | np.array([[slot ^ 1 == other for other in range(4)] for slot in range(4)])
+    for step in range(4):
+        slot = order[:, step]
+        attacker = active[index, slot]
+        acting = attacks[index, slot] & (hp[index, attacker] > 0)
+        standing = hp[index[:, None], active] > 0
+        # single target moves hitting a fainted or empty slot are redirected to the other opponent
+        target_slot = target[index, slot]
+        target_slot = np.where(standing[index, target_slot], target_slot, (slot < 2) * 4 + 1 - target_slot)
+        spread_kind = spread[index, slot]
+        targets = np.select([(spread_kind == GameNode._FOES)[:, None],
+                             (spread_kind == GameNode._ADJACENT)[:, None]],
+                            [foe[slot], adjacent[slot]], np.arange(4)[None, :] == target_slot[:, None])
+        targets &= standing & ~protected & acting[:, None]
+        damage = percentage[attacker[:, None], move[index, slot][:, None], active]
+        hp_active = hp[index[:, None], active]
+        hit = np.maximum(hp_active - damage * (accuracy[index, slot] * roll)[:, None], 0)
+        hp[index[:, None], active] = np.where(targets, hit, hp_active)
+
+    hp = hp[:, :n]
+    sign = np.where(np.asarray(space.side) == BattleSnapshot.ALLY, 1, -1)
+    value = ((hp / 100 + ALIVE_WEIGHT) * (hp > 0)) @ sign
+    probability = np.array([probability for _, probability in rolls])
+    return (probability @ value.reshape(len(rolls), pairs)).reshape(m_a, m_b)
+
+
+# =============================================================================
+# equilibrium
+# =============================================================================
+def exploitability(payoff: np.ndarray, ours: np.ndarray, theirs: np.ndarray) -> float:
+    """
+    :return: gain of the best responses to the two strategies, 0 at an equilibrium
+    """
+    return float(np.max(payoff @ theirs) - np.min(ours @ payoff))
+
+
+def regret_matching(payoff: np.ndarray, iterations: int = 256, deadline: float = _INF, tolerance: float = 1e-3) \
+        -> (np.ndarray, np.ndarray, float):
+    """
+    approximates a mixed equilibrium of the zero sum game of payoff, we maximize and the opponent minimizes
+    :param payoff: [our action, opponent's action]
+    :param iterations: maximum number of iterations
+    :param deadline: time.perf_counter() value after which the iterations stop, checked every few iterations
+    :param tolerance: the iterations stop when the exploitability of the average strategies is below it
+    :return: our mixed strategy, the opponent's one and our expected payoff when both play them, the value of the game
+    """
+    m_a, m_b = payoff.shape
+    # a saddle point is the equilibrium
+    row_min = payoff.min(axis=1)
+    column_max = payoff.max(axis=0)
+    if row_min.max() >= column_max.min():
+        ours = np.zeros(m_a)
+        theirs = np.zeros(m_b)
+        ours[row_min.argmax()] = 1
+        theirs[column_max.argmin()] = 1
+        return ours, theirs, float(payoff[row_min.argmax(), column_max.argmin()])
+
+    regret_a = np.zeros(m_a)
+    regret_b = np.zeros(m_b)
+    ours = np.full(m_a, 1 / m_a)
+    theirs = np.full(m_b, 1 / m_b)
+    average_a = np.zeros(m_a)
+    average_b = np.zeros(m_b)
+    for t in range(1, iterations + 1):
+        utility_a = payoff @ theirs
+        utility_b = ours @ payoff
+        value = ours @ utility_a
+        regret_a = np.maximum(regret_a + utility_a - value, 0)
+        regret_b = np.maximum(regret_b + value - utility_b, 0)
+        # linear averaging: the later strategies weigh more
+        average_a += t * ours
+        average_b += t * theirs
+        total_a = regret_a.sum()
+        total_b = regret_b.sum()
+        ours = regret_a / total_a if total_a > 0 else np.full(m_a, 1 / m_a)
+        theirs = regret_b / total_b if total_b > 0 else np.full(m_b, 1 / m_b)
+        if t % _CHECK_EVERY == 0:
+            if time.perf_counter() > deadline \
+                    or exploitability(payoff, average_a / average_a.sum(), average_b / average_b.sum()) < tolerance:
+                break
+    average_a /= average_a.sum()
+    average_b /= average_b.sum()
+    return average_a, average_b, float(average_a @ payoff @ average_b)
+
+
+def solve(context: TurnContext, iterations: int = 256, deadline: float = _INF) \
+        -> (List[Tuple], np.ndarray, float):
+    """
+    :param context: TurnContext of the turn
+    :param iterations: see regret_matching
+    :param deadline: see regret_matching
+    :return: our joint actions, our mixed strategy over them and the value of the turn
+    """
+    root = GameNode.GameNode.root(context, deadline)
+    ours = root.joint_actions()
+    theirs = root.joint_actions(opponent=True)
+    payoff = payoff_matrix(root, ours, theirs)
+    strategy, _, value = regret_matching(payoff, iterations, deadline)
+    return ours, strategy, value
@@ -0,0 +1,106 @@
+"""
+registry of the abilities and items that alter damage, speed or immunities: names are normalized
+to poke_env ids once, and each (ability, item) pair is compiled into a single Modifiers entry,
+shared by MoveUtilities and DamageMatrix
+"""
+from typing import NamedTuple, Optional
+
+from poke_env.data import to_id_str
+from poke_env.environment import Pokemon
+from poke_env.environment.pokemon_type import PokemonType
+
+
+class Modifiers(NamedTuple):
+    # multiplier of every attack (Life Orb)
+    attack: float = 1
+    # multiplier of physical / special attacks (Choice Band / Choice Specs)
+    physical_attack: float = 1
+    special_attack: float = 1
+    # multiplier of the defense against special attacks (Assault Vest)
+    special_defense: float = 1
+    # base damage multiplier of super effective moves (Expert Belt)
+    super_effective: float = 1
+    speed: float = 1
+    # move types the holder is immune to
+    immune_types: frozenset = frozenset()
+    powder_immune: bool = False
+    # Guts: attack boosted while statused, burn doesn't halve damage
+    guts: bool = False
+    # Quick Feet: paralysis doesn't lower speed
+    quick_feet: bool = False
+    # Multiscale: defense doubled at full HP
+    multiscale: bool = False
+    mold_breaker: bool = False
+    adaptability: bool = False
+    skill_link: bool = False
+    infiltrator: bool = False
+    wonder_guard: bool = False
+    prankster: bool = False
+    # locks the holder into the first move it uses (Choice items, Gorilla Tactics)
+    choice_lock: bool = False
+
+
+NEUTRAL = Modifiers()
+
+ABILITIES = {to_id_str(name): modifiers for name, modifiers in {
+    "Adaptability": Modifiers(adaptability=True),
+    "Dry Skin": Modifiers(immune_types=frozenset({PokemonType.WATER})),
+    "Flash Fire": Modifiers(immune_types=frozenset({PokemonType.FIRE})),
+    "Gorilla Tactics": Modifiers(choice_lock=True),
+    "Guts": Modifiers(guts=True),
+    "Infiltrator": Modifiers(infiltrator=True),
+    "Levitate": Modifiers(immune_types=frozenset({PokemonType.GROUND})),
+    "Lightning Rod": Modifiers(immune_types=frozenset({PokemonType.ELECTRIC})),
+    "Mold Breaker": Modifiers(mold_breaker=True),
+    "Motor Drive": Modifiers(immune_types=frozenset({PokemonType.ELECTRIC})),
+    "Multiscale": Modifiers(multiscale=True),
+    "Overcoat": Modifiers(powder_immune=True),
+    "Prankster": Modifiers(prankster=True),
+    "Quick Feet": Modifiers(quick_feet=True),
+    "Sap Sipper": Modifiers(immune_types=frozenset({PokemonType.GRASS})),
+    "Skill Link": Modifiers(skill_link=True),
+    "Storm Drain": Modifiers(immune_types=frozenset({PokemonType.WATER})),
+    "Volt Absorb": Modifiers(immune_types=frozenset({PokemonType.ELECTRIC})),
+    "Water Absorb": Modifiers(immune_types=frozenset({PokemonType.WATER})),
+    "Wonder Guard": Modifiers(wonder_guard=True),
+}.items()}
+
+ITEMS = {to_id_str(name): modifiers for name, modifiers in {
+    "Air Balloon": Modifiers(immune_types=frozenset({PokemonType.GROUND})),
+    "Assault Vest": Modifiers(special_defense=1.5),
+    "Choice Band": Modifiers(physical_attack=1.5, choice_lock=True),
+    "Choice Scarf": Modifiers(speed=1.5, choice_lock=True),
+    "Choice Specs": Modifiers(special_attack=1.5, choice_lock=True),
+    "Expert Belt": Modifiers(super_effective=1.2),
+    "Life Orb": Modifiers(attack=1.3),
+    "Safety Goggles": Modifiers(powder_immune=True),
+}.items()}
+
+# (ability, item) -> Modifiers
+_compiled = {}
+
+
+def _combine(first: Modifiers, second: Modifiers) -> Modifiers:
+    return Modifiers(*[
+        x | y if isinstance(x, (bool, frozenset)) else x * y
+        for x, y in zip(first, second)
+    ])
+
+
+def _lookup(registry: dict, name: Optional[str]) -> Modifiers:
+    if not name:
+        return NEUTRAL
+    return registry.get(to_id_str(name), NEUTRAL)
+
+
+def of(battler: Pokemon) -> Modifiers:
+    """
+    :param battler:
+    :return: modifiers given by battler's ability and item
+    """
+    key = (battler.ability, battler.item)
+    modifiers = _compiled.get(key)
+    if modifiers is None:
+        modifiers = _combine(_lookup(ABILITIES, battler.ability), _lookup(ITEMS, battler.item))
+        _compiled[key] = modifiers
+    return modifiers
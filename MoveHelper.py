@@ -2,31 +2,62 @@
 gives a score to each move (switch or move+target)
 """
 
+import time
+
 from poke_env.environment import DoubleBattle
 from poke_env.player import BattleOrder
 
 from AttackChooser import use_prio, use_protect, choose_moves
+from Instrumentation import record_stage
 from SwitchHelper import should_withdraw
+from TurnContext import TurnContext
+
+
+def default_choose_command(battle: DoubleBattle, idx_active, last_switch = None,
+                           context: TurnContext = None) -> BattleOrder:
+    if context is None:
+        context = TurnContext(battle)
+    order = choose_command_before_moves(battle, idx_active, last_switch, context)
+    if order is not None:
+        return order
+
+    context.stage = "choose_moves"
+    start = time.perf_counter()
+    order = choose_moves(battle, idx_active, context)
+    record_stage(context.metrics, "choose_moves", start, order)
+    return order
 
 
-def default_choose_command(battle: DoubleBattle, idx_active, last_switch = None) -> BattleOrder:
+def choose_command_before_moves(battle: DoubleBattle, idx_active, last_switch=None,
+                                context: TurnContext = None) -> BattleOrder | None:
+    """
+    stages of default_choose_command before the choice of the move: priority KOs, Protect and switches
+    :return: the order of the first stage that gives one, None if the Pokémon should use one of its moves
+    """
+    if context is None:
+        context = TurnContext(battle)
     order: BattleOrder
-    order = use_prio(battle, idx_active)
+    # each stage is timed in context.metrics, together with the stage that returns the order
+    metrics = context.metrics
+    context.stage = "use_prio"
+    start = time.perf_counter()
+    order = use_prio(battle, idx_active, context)
+    start = record_stage(metrics, "use_prio", start, order)
 
     if order is not None:
         # print("use prio")
         return order
 
-    order = use_protect(battle, idx_active)
+    context.stage = "use_protect"
+    order = use_protect(battle, idx_active, context)
+    start = record_stage(metrics, "use_protect", start, order)
 
     if order is not None:
         # print("use protect")
         return order
 
-    order = should_withdraw(battle, idx_active, last_switch)
-    if order is not None:
-        # print("use do switch")
-        return order
-
-    order = choose_moves(battle, idx_active)
+    context.stage = "should_withdraw"
+    order = should_withdraw(battle, idx_active, last_switch, context)
+    record_stage(metrics, "should_withdraw", start, order)
+    # print("use do switch") if order is not None
     return order
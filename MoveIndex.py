@@ -0,0 +1,100 @@
+"""
+per-move metadata: the ids of the moves with a special treatment are computed once, and the flags of
+each move are compiled the first time the move is seen, so hot paths never call Move.retrieve_id
+"""
+from typing import NamedTuple
+
+from poke_env.environment import Move
+
+# =============================================================================
+# interned ids
+# =============================================================================
+ACROBATICS = Move.retrieve_id("Acrobatics")
+BODY_PRESS = Move.retrieve_id("Body Press")
+BRICK_BREAK = Move.retrieve_id("Brick Break")
+DETECT = Move.retrieve_id("Detect")
+FACADE = Move.retrieve_id("Facade")
+FAKE_OUT = Move.retrieve_id("Fake Out")
+FOUL_PLAY = Move.retrieve_id("Foul Play")
+GYRO_BALL = Move.retrieve_id("Gyro Ball")
+HEAVY_SLAM = Move.retrieve_id("Heavy Slam")
+NATURES_MADNESS = Move.retrieve_id("Nature's Madness")
+NIGHT_SHADE = Move.retrieve_id("Night Shade")
+PROTECT = Move.retrieve_id("Protect")
+PSYCHIC_FANGS = Move.retrieve_id("Psychic Fangs")
+PSYSHOCK = Move.retrieve_id("Psyshock")
+SEISMIC_TOSS = Move.retrieve_id("Seismic Toss")
+SPORE = Move.retrieve_id("Spore")
+STRUGGLE = Move.retrieve_id("struggle")
+SUPER_FANG = Move.retrieve_id("Super Fang")
+SURGING_STRIKES = Move.retrieve_id("Surging Strikes")
+TRICK = Move.retrieve_id("Trick")
+WICKED_BLOW = Move.retrieve_id("Wicked Blow")
+
+# moves dealing damage equal to the user's level
+FIXED_DAMAGE_LEVEL = frozenset({NIGHT_SHADE, SEISMIC_TOSS})
+# moves dealing half of the target's current HP
+HALVE_HP = frozenset({NATURES_MADNESS, SUPER_FANG})
+PROTECT_LIKE = frozenset({PROTECT, DETECT})
+# moves that are not weakened by Reflect, Light Screen and Aurora Veil
+IGNORES_SCREENS = frozenset({BRICK_BREAK, PSYCHIC_FANGS})
+# move targets hitting more than one battler
+SPREAD_TARGETS = frozenset({"all", "allAdjacent", "allAdjacentFoes"})
+# base power multiplier of the moves that always land a critical hit (Surging Strikes also hits 3 times)
+ALWAYS_CRIT = {WICKED_BLOW: 1.5, SURGING_STRIKES: 1.5 * 3}
+
+
+class MoveInfo(NamedTuple):
+    fixed_damage: bool
+    halve_hp: bool
+    spread: bool
+    protect_like: bool
+    # Foul Play: uses the target's attack
+    target_attack: bool
+    # Body Press: uses the user's defense as attack
+    defense_as_attack: bool
+    # Psyshock: special move hitting the target's defense
+    targets_defense: bool
+    facade: bool
+    ignores_screens: bool
+    fake_out: bool
+    gyro_ball: bool
+    acrobatics: bool
+    always_crit: bool
+    priority: bool
+
+
+# move id -> MoveInfo
+_index = {}
+
+
+def _compile(move: Move) -> MoveInfo:
+    move_id = move.id
+    return MoveInfo(
+        fixed_damage=move_id in FIXED_DAMAGE_LEVEL,
+        halve_hp=move_id in HALVE_HP,
+        spread=move.target in SPREAD_TARGETS,
+        protect_like=move_id in PROTECT_LIKE,
+        target_attack=move_id == FOUL_PLAY,
+        defense_as_attack=move_id == BODY_PRESS,
+        targets_defense=move_id == PSYSHOCK,
+        facade=move_id == FACADE,
+        ignores_screens=move_id in IGNORES_SCREENS,
+        fake_out=move_id == FAKE_OUT,
+        gyro_ball=move_id == GYRO_BALL,
+        acrobatics=move_id == ACROBATICS,
+        always_crit=move_id in ALWAYS_CRIT,
+        priority=move.priority > 0,
+    )
+
+
+def get(move: Move) -> MoveInfo:
+    """
+    :param move:
+    :return: flags of move, compiled the first time the move is seen
+    """
+    info = _index.get(move.id)
+    if info is None:
+        info = _compile(move)
+        _index[move.id] = info
+    return info
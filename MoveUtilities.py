@@ -6,32 +6,9 @@ from poke_env.environment import Move, Pokemon, DoubleBattle, Effect, Status, We
 from poke_env.environment.move_category import MoveCategory
 from poke_env.environment.pokemon_type import PokemonType
 
-_fixedDamageLevel = {
-    Move.retrieve_id("Night Shade"),
-    Move.retrieve_id("Seismic Toss"),
-}
-_moveHalveHP = {
-    Move.retrieve_id("Nature's Madness"),
-    Move.retrieve_id("Super Fang"),
-}
-
-_multiTargets = {
-    "all",
-    "allAdjacent",
-    "allAdjacentFoes",
-}
-
-_abilityWaterImmune = {
-    "dry skin",
-    "storm drain",
-    "water absorb"
-}
-
-_abilityElectricImmune = {
-    "lightning rod",
-    "motor drive",
-    "volt absorb"
-}
+import Modifiers
+import MoveIndex
+import TypeChart
 
 
 class Stat(enum.Enum):
@@ -43,6 +20,11 @@ class Stat(enum.Enum):
     SPEED = "spe"
 
 
+# multipliers of the stat stages -6..+6
+_STAGE_MUL = [2, 2, 2, 2, 2, 2, 2, 3, 4, 5, 6, 7, 8]
+_STAGE_DIV = [8, 7, 6, 5, 4, 3, 2, 2, 2, 2, 2, 2, 2]
+
+
 # =============================================================================
 # if Move its multiple targets
 # =============================================================================
@@ -54,9 +36,9 @@ def multiple_targets(move: Move, battle: DoubleBattle, opponent_prospective=Fals
         :param opponent_prospective
         :return
     """
-    target_data = move.target
-    if target_data not in _multiTargets:
+    if not MoveIndex.get(move).spread:
         return False
+    target_data = move.target
     match target_data:
         case "allAdjacent":
             return len(battle.all_active_pokemons) > 2
@@ -84,11 +66,11 @@ def pokemon_type_advantage(user: Pokemon, target: Pokemon):
     """
     if target is None or user is None:
         return 1
-    mod1 = target.damage_multiplier(user.type_1)
+    mod1 = TypeChart.damage_multiplier(target, user.type_1)
     mod2 = 1
     type2 = user.type_2
     if type2:
-        mod2 = target.damage_multiplier(type2)
+        mod2 = TypeChart.damage_multiplier(target, type2)
     return mod1 * mod2
 
 
@@ -106,48 +88,32 @@ def is_move_immune(move: Move, user: Pokemon, target: Pokemon):
     if target is None:
         return True
     move_type = move.type
-    type_mod = target.damage_multiplier(move_type)
+    type_mod = TypeChart.damage_multiplier(target, move_type)
     if move.base_power > 0 and type_mod == 0:
         return True
-    if move.id == move.retrieve_id("Fake Out") and user.first_turn:  # user.first_turn doesn't work
+    if MoveIndex.get(move).fake_out and user.first_turn:  # user.first_turn doesn't work
         print("fakeout will fail")
         return True
 
-    match move_type:
-        case move_type.GROUND:
-            if target.item and target.item.lower() == "air balloon":
-                return True
-            if target.ability and target.ability.lower() == "levitate":
-                return True
-        case move_type.FIRE:
-            if target.ability and target.ability.lower() == "flash fire":
-                return True
-        case move_type.WATER:
-            if target.ability and target.ability.lower() in _abilityWaterImmune:
-                return True
-        case move_type.GRASS:
-            if target.ability and target.ability.lower() == "sap sipper":
-                return True
-        case move_type.ELECTRIC:
-            if target.ability and target.ability.lower() in _abilityElectricImmune:
-                return True
-
-    if move.base_power > 0 and type_mod <= 1 and target.ability and target.ability == "wonder guard":
+    target_modifiers = Modifiers.of(target)
+    # Levitate, Air Balloon, Flash Fire, Water Absorb...
+    if move_type in target_modifiers.immune_types:
+        return True
+
+    if move.base_power > 0 and type_mod <= 1 and target_modifiers.wonder_guard:
         return True
 
-    if move.id.lower() == Move.retrieve_id("Spore"):
+    if move.id.lower() == MoveIndex.SPORE:
         if PokemonType.GRASS in target.types:
             return True
-        if target.ability and target.ability.lower() == "overcoat":
-            return True
-        if target.item and target.item.lower() == "safety goggles":
+        if target_modifiers.powder_immune:  # Overcoat, Safety Goggles
             return True
 
     if move.category.value == MoveCategory.STATUS and move.status and (
             target.effects.get(Effect.SUBSTITUTE) or target.status):
         return True
 
-    if move.category.value == MoveCategory.STATUS and user.ability and user.ability.lower() == "prankster" \
+    if move.category.value == MoveCategory.STATUS and Modifiers.of(user).prankster \
             and PokemonType.DARK in target.types:
         return True
 
@@ -171,8 +137,6 @@ def speed_calc(battler: Pokemon):
     :param battler: ,
     :return:
     """
-    stage_mul = [2, 2, 2, 2, 2, 2, 2, 3, 4, 5, 6, 7, 8]
-    stage_div = [8, 7, 6, 5, 4, 3, 2, 2, 2, 2, 2, 2, 2]
     stage = battler.boosts["spe"] + 6
 
     speed = battler.stats["spe"]
@@ -185,15 +149,15 @@ def speed_calc(battler: Pokemon):
         nature = 1
         # speed = math.floor(math.floor(2*base_speed+iv+math.floor(ev/4)*level)*nature)
         speed = calc_non_hp_stat_value(base_speed, iv, ev, level, nature)
+    modifiers = Modifiers.of(battler)
     if battler.status == Status.PAR:
         multiplier = 0.5
-        if battler.ability and battler.ability.lower() == "quick feet":
+        if modifiers.quick_feet:
             multiplier = 1
 
-    if battler.item and battler.item.lower() == "choice scarf":
-        multiplier *= 1.5
+    multiplier *= modifiers.speed  # Choice Scarf
 
-    return speed * multiplier * stage_mul[stage] / stage_div[stage]
+    return speed * multiplier * _STAGE_MUL[stage] / _STAGE_DIV[stage]
 
 
 def rough_stat(battler: Pokemon, stat: Stat):
@@ -206,8 +170,6 @@ def rough_stat(battler: Pokemon, stat: Stat):
     if stat == Stat.SPEED:
         return speed_calc(battler)
 
-    stage_mul = [2, 2, 2, 2, 2, 2, 2, 3, 4, 5, 6, 7, 8]
-    stage_div = [8, 7, 6, 5, 4, 3, 2, 2, 2, 2, 2, 2, 2]
     stage = battler.boosts[stat.value] + 6
     value = battler.stats[stat.value]
     if value is None:
@@ -218,7 +180,7 @@ def rough_stat(battler: Pokemon, stat: Stat):
         nature = 1
         # value = math.floor(math.floor(2*base_value+iv+math.floor(ev/4)*level)*nature)
         value = calc_non_hp_stat_value(base_value, iv, ev, level, nature)
-    return value * stage_mul[stage] / stage_div[stage]
+    return value * _STAGE_MUL[stage] / _STAGE_DIV[stage]
 
 
 def calc_hp_stat_value(base_hp, iv, ev, level):
@@ -261,24 +223,23 @@ def move_base_damage(move: Move, user: Pokemon, target: Pokemon):
     :return:
     """
     base_dmg = move.base_power
-    if move.id == move.retrieve_id("Wicked Blow"):
-        return base_dmg*1.5
-    if move.id == move.retrieve_id("Surging Strikes"):
-        return base_dmg*1.5*3
+    info = MoveIndex.get(move)
+    if info.always_crit:  # Wicked Blow, Surging Strikes
+        return base_dmg*MoveIndex.ALWAYS_CRIT[move.id]
 
     if move.target == "scripted":
         base_dmg = 60
-    if move.id == Move.retrieve_id("Acrobatics"):
+    if info.acrobatics:
         if user.item is None:
             base_dmg *= 2
-    if move.id == Move.retrieve_id("Gyro Ball"):
+    if info.gyro_ball:
         target_speed = rough_stat(target, Stat.SPEED)
         user_speed = rough_stat(user, Stat.SPEED)
         base_dmg = max([min([(25 * target_speed / user_speed), 150]), 1])
 
     # multi-hit move
     min_hits, max_hits = move.n_hit
-    if user.ability and user.ability.lower() == "skill link":
+    if Modifiers.of(user).skill_link:
         base_dmg *= max_hits
     else:
         base_dmg *= move.expected_hits
@@ -306,11 +267,12 @@ def rough_damage(move: Move, user: Pokemon, target: Pokemon, base_dmg,
     if is_move_immune(move, user, target): # true also if target is None
         return 0
 
+    info = MoveIndex.get(move)
     # Fixed damage moves
-    if move.id in _fixedDamageLevel:  # move deals damage depending on user level
+    if info.fixed_damage:  # move deals damage depending on user level
         return user.level
 
-    if move.id in _moveHalveHP:  # move deals half of target's current HP
+    if info.halve_hp:  # move deals half of target's current HP
         max_hp = target.max_hp
         if max_hp <= 100:
             max_hp = rough_max_hp(target)
@@ -321,15 +283,15 @@ def rough_damage(move: Move, user: Pokemon, target: Pokemon, base_dmg,
 
     # Get the move's type
     move_type = move.type
-    type_advantage = target.damage_multiplier(move_type)
+    type_advantage = TypeChart.damage_multiplier(target, move_type)
     if type_advantage == 0:
         return 0
 
     # ------- Calculate user's attack stat -------------
     atk = rough_stat(user, Stat.ATTACK)
-    if move.id == Move.retrieve_id("Foul Play"):  # Foul Play
+    if info.target_attack:  # Foul Play
         atk = rough_stat(target, Stat.ATTACK)
-    elif move.id == Move.retrieve_id("Body Press"):  # Body Press
+    elif info.defense_as_attack:  # Body Press
         atk = rough_stat(user, Stat.DEFENSE)
     # if special move:
     elif move.category == MoveCategory.SPECIAL:
@@ -337,7 +299,7 @@ def rough_damage(move: Move, user: Pokemon, target: Pokemon, base_dmg,
 
     # ----- Calculate target's defense stat ---------
     defense = rough_stat(target, Stat.DEFENSE)
-    if move.category == MoveCategory.SPECIAL and not move.id == Move.retrieve_id("Psyshock"):
+    if move.category == MoveCategory.SPECIAL and not info.targets_defense:
         defense = rough_stat(target, Stat.SPECIAL_DEFENSE)
 
     # ----- Calculate all multiplier effects -------
@@ -347,32 +309,28 @@ def rough_damage(move: Move, user: Pokemon, target: Pokemon, base_dmg,
         "defense_multiplier": 1.0,
         "final_damage_multiplier": 1.0
     }
+    user_modifiers = Modifiers.of(user)
+    target_modifiers = Modifiers.of(target)
     # Ability effects that alter damage
-    mold_breaker = False
-    if user.ability and user.ability.lower() == "mold breaker":
-        mold_breaker = True
+    mold_breaker = user_modifiers.mold_breaker
 
     # Item effects that alter damage
-    if user.item and user.item.lower() == "life orb":
-        multipliers["attack_multiplier"] *= 1.3
-    elif user.item and user.item.lower() == "expert belt" and type_advantage >= 2:
-        multipliers["base_damage_multiplier"] *= 1.2
+    multipliers["attack_multiplier"] *= user_modifiers.attack  # Life Orb
+    if type_advantage >= 2:
+        multipliers["base_damage_multiplier"] *= user_modifiers.super_effective  # Expert Belt
 
     if move.category == MoveCategory.SPECIAL:
-        if user.item and user.item.lower() == "choice specs":
-            multipliers["attack_multiplier"] *= 1.5
-        if target.item and target.item.lower() == "assault vest":
-            multipliers["defense_multiplier"] *= 1.5
+        multipliers["attack_multiplier"] *= user_modifiers.special_attack  # Choice Specs
+        multipliers["defense_multiplier"] *= target_modifiers.special_defense  # Assault Vest
 
     elif move.category == MoveCategory.PHYSICAL:
-        if user.item and user.item.lower() == "choice band":
-            multipliers["attack_multiplier"] *= 1.5
+        multipliers["attack_multiplier"] *= user_modifiers.physical_attack  # Choice Band
         if user.status is not None:
-            if user.ability and user.ability.lower() == "guts":
+            if user_modifiers.guts:
                 multipliers["attack_multiplier"] *= 1.5
-            if move.id == move.retrieve_id("Facade"):
+            if info.facade:
                 multipliers["base_damage_multiplier"] *= 2
-        if target.ability and target.ability.lower() == "multiscale" and target.current_hp_fraction == 1 \
+        if target_modifiers.multiscale and target.current_hp_fraction == 1 \
                 and not mold_breaker:
             multipliers["defense_multiplier"] *= 2
 
@@ -381,54 +339,35 @@ def rough_damage(move: Move, user: Pokemon, target: Pokemon, base_dmg,
     # Helping Hand - n/a
 
     # Terrain moves
-    match user.effects.keys():
-        case Effect.ELECTRIC_TERRAIN:
-            if move_type == move_type.ELECTRIC:
-                multipliers["base_damage_multiplier"] *= 1.5
-        case Effect.PSYCHIC_TERRAIN:
-            if move_type == move_type.PSYCHIC:
-                multipliers["base_damage_multiplier"] *= 1.5
-        case Effect.MISTY_TERRAIN:
-            if move_type == move_type.DRAGON:
-                multipliers["base_damage_multiplier"] /= 2
+    multipliers["base_damage_multiplier"] *= terrain_type_multipliers(user).get(move_type, 1)
 
     # Multi-targeting attacks
     if multiple_targets(move, battle):
         multipliers["final_damage_multiplier"] *= 0.75
 
     # Weather
-    match battle.weather.keys():
-        case Weather.SUNNYDAY:
-            if move_type == move_type.FIRE:
-                multipliers["final_damage_multiplier"] *= 1.5
-            elif move_type == move_type.WATER:
-                multipliers["final_damage_multiplier"] /= 2
-        case Weather.RAINDANCE:
-            if move_type == move_type.FIRE:
-                multipliers["final_damage_multiplier"] /= 2
-            elif move_type == move_type.WATER:
-                multipliers["final_damage_multiplier"] *= 1.5
-        case Weather.SANDSTORM:
-            if PokemonType.ROCK in target.types and move.category == MoveCategory.SPECIAL \
-                    and not move.id == Move.retrieve_id("Psyshock"):
-                multipliers["defense_multiplier"] *= 1.5
+    multipliers["final_damage_multiplier"] *= weather_type_multipliers(battle).get(move_type, 1)
+    if weather_boosts_rock_special_defense(battle):
+        if PokemonType.ROCK in target.types and move.category == MoveCategory.SPECIAL \
+                and not info.targets_defense:
+            multipliers["defense_multiplier"] *= 1.5
 
     # Critical hits - n/a
     # Random variance - n/a
     # STAB
     if move_type in user.types:
-        if user.ability and user.ability.upper() == "ADAPTABILITY":
+        if user_modifiers.adaptability:
             multipliers["final_damage_multiplier"] *= 2
         else:
             multipliers["final_damage_multiplier"] *= 1.5
 
     # Type effectiveness
-    typemod = target.damage_multiplier(move_type)
+    typemod = TypeChart.damage_multiplier(target, move_type)
     multipliers["final_damage_multiplier"] *= typemod
 
     # Burn, Facade
     if move.category == MoveCategory.PHYSICAL and user.status == Status.BRN \
-            and not (user.ability and user.ability.lower() == "guts") and not move.id == move.retrieve_id("Facade"):
+            and not user_modifiers.guts and not info.facade:
         multipliers["final_damage_multiplier"] /= 2
 
     multipliers["final_damage_multiplier"] *= eval_side_conditions(user, move, battle, opponent_prospective)
@@ -476,6 +415,50 @@ def rough_damage(move: Move, user: Pokemon, target: Pokemon, base_dmg,
 
 # ----- fine rough_damage -------------------
 
+def terrain_type_multipliers(user: Pokemon) -> dict:
+    """
+    returns the base damage multiplier given by the terrain affecting user to each move type
+    (types not in the dictionary are not affected)
+    :param user:
+    :return:
+    """
+    match user.effects.keys():
+        case Effect.ELECTRIC_TERRAIN:
+            return {PokemonType.ELECTRIC: 1.5}
+        case Effect.PSYCHIC_TERRAIN:
+            return {PokemonType.PSYCHIC: 1.5}
+        case Effect.MISTY_TERRAIN:
+            return {PokemonType.DRAGON: 0.5}
+    return {}
+
+
+def weather_type_multipliers(battle: DoubleBattle) -> dict:
+    """
+    returns the final damage multiplier given by the current weather to each move type
+    (types not in the dictionary are not affected)
+    :param battle:
+    :return:
+    """
+    match battle.weather.keys():
+        case Weather.SUNNYDAY:
+            return {PokemonType.FIRE: 1.5, PokemonType.WATER: 0.5}
+        case Weather.RAINDANCE:
+            return {PokemonType.FIRE: 0.5, PokemonType.WATER: 1.5}
+    return {}
+
+
+def weather_boosts_rock_special_defense(battle: DoubleBattle) -> bool:
+    """
+    returns true if the current weather boosts the special defense of rock type battlers (sandstorm)
+    :param battle:
+    :return:
+    """
+    match battle.weather.keys():
+        case Weather.SANDSTORM:
+            return True
+    return False
+
+
 # --- valutazione sidecondition--------------
 def eval_side_conditions(user: Pokemon, move: Move, battle: DoubleBattle, opponent_prospective=False) -> int:
     multiplier = 1
@@ -484,8 +467,7 @@ def eval_side_conditions(user: Pokemon, move: Move, battle: DoubleBattle, oppone
         side_conditions = battle.side_conditions
 
     # Aurora Veil, Reflect, Light Screen
-    if not move.id == move.retrieve_id("Brick Break") and not move.id == move.retrieve_id(
-            "Psychic Fangs") and not (user.ability and user.ability.upper() == "INFILTRATOR"):
+    if not MoveIndex.get(move).ignores_screens and not Modifiers.of(user).infiltrator:
 
         if side_conditions.get(SideCondition.AURORA_VEIL):
             multiplier *= 2 / 3.0  # in double battles screens reduce damage by nearly 2/3
@@ -532,7 +514,7 @@ def rough_accuracy(move: Move, user: Pokemon, target: Pokemon):
     if target is None:
         return 125
 
-    if target.effects.get(Effect.MINIMIZE) and move.id == move.retrieve_id("Heavy Slam"):
+    if target.effects.get(Effect.MINIMIZE) and move.id == MoveIndex.HEAVY_SLAM:
         return 125
     if target.effects.get(Effect.TELEKINESIS):
         return 125
@@ -591,14 +573,16 @@ def rough_accuracy(move: Move, user: Pokemon, target: Pokemon):
 '''
 
 
-def get_max_damage_move(battle: DoubleBattle, my_pokemon: Pokemon, opponents: List[Pokemon], moves: List[Move]) -> \
-        (Move, int, int):
+def get_max_damage_move(battle: DoubleBattle, my_pokemon: Pokemon, opponents: List[Pokemon], moves: List[Move],
+                        damage_matrix=None, cache=None) -> (Move, int, int):
     """
     returns the move that deals the most damage across the opponent's active Pokémon
     the value returned is a tuple (move, target, damage) with
     move : the most damaging move
     target : integer specifying the target of the move (useful to create BattleOrder)
     damage : the sum of the predicted damage dealt with one single move
+    if damage_matrix (DamageMatrix.DamageMatrix) is given the damage values are read from it
+    if cache (DamageCache.DamageCache) is given the damage values are memoized across the turns
 
     """
     maxmove = None
@@ -616,18 +600,22 @@ def get_max_damage_move(battle: DoubleBattle, my_pokemon: Pokemon, opponents: Li
         '''
 
         if opponents[0] is None:
-            damage = calculate_percentage_damage(move, my_pokemon, opponents[1], battle)
+            damage = calculate_percentage_damage(move, my_pokemon, opponents[1], battle, damage_matrix=damage_matrix,
+                                                 cache=cache)
             target = 2
             if len(move_targets) == 1:
                 target = move_targets[0]
         elif opponents[1] is None:
-            damage = calculate_percentage_damage(move, my_pokemon, opponents[0], battle)
+            damage = calculate_percentage_damage(move, my_pokemon, opponents[0], battle, damage_matrix=damage_matrix,
+                                                 cache=cache)
             target = 1
             if len(move_targets) == 1:
                 target = move_targets[0]
         else:
-            damage1 = calculate_percentage_damage(move, my_pokemon, opponents[0], battle)
-            damage2 = calculate_percentage_damage(move, my_pokemon, opponents[1], battle)
+            damage1 = calculate_percentage_damage(move, my_pokemon, opponents[0], battle, damage_matrix=damage_matrix,
+                                                  cache=cache)
+            damage2 = calculate_percentage_damage(move, my_pokemon, opponents[1], battle, damage_matrix=damage_matrix,
+                                                  cache=cache)
             if len(move_targets) == 1:  # status / spread move (moveTargets = [0])
                 damage = damage1 + damage2
                 target = move_targets[0]
@@ -681,7 +669,7 @@ def rough_percentage_damage(move: Move, user: Pokemon, target: Pokemon, base_dmg
 
 
 def calculate_percentage_damage(move: Move, user: Pokemon, target: Pokemon,
-                                battle: DoubleBattle, opponent_prospective=False):
+                                battle: DoubleBattle, opponent_prospective=False, damage_matrix=None, cache=None):
     """
     returns rough damage as percentage
         :param opponent_prospective:
@@ -689,14 +677,24 @@ def calculate_percentage_damage(move: Move, user: Pokemon, target: Pokemon,
         :param user:Pokémon
         :param target:Pokémon
         :param battle:DoubleBattle
+        :param damage_matrix: DamageMatrix of the turn, the value is read from it when available
+        :param cache: DamageCache of the battle, the value is memoized across the turns
         :return
     """
+    if cache is not None:
+        return cache.lookup(cache.key("percentage", move, user, target, battle, opponent_prospective),
+                            lambda: calculate_percentage_damage(move, user, target, battle, opponent_prospective,
+                                                                damage_matrix))
+    if damage_matrix is not None:
+        damage = damage_matrix.percentage_damage(move, user, target, opponent_prospective)
+        if damage is not None:
+            return damage
     base_damage = move_base_damage(move, user, target)
     return rough_percentage_damage(move, user, target, base_damage, battle, opponent_prospective)
 
 
 def calculate_damage(move: Move, user: Pokemon, target: Pokemon,
-                     battle: DoubleBattle, opponent_prospective=False):
+                     battle: DoubleBattle, opponent_prospective=False, damage_matrix=None, cache=None):
     """
     returns rough damage
         :param opponent_prospective:
@@ -704,14 +702,23 @@ def calculate_damage(move: Move, user: Pokemon, target: Pokemon,
         :param user:Pokémon
         :param target:Pokémon
         :param battle:DoubleBattle
+        :param damage_matrix: DamageMatrix of the turn, the value is read from it when available
+        :param cache: DamageCache of the battle, the value is memoized across the turns
         :return
     """
+    if cache is not None:
+        return cache.lookup(cache.key("damage", move, user, target, battle, opponent_prospective),
+                            lambda: calculate_damage(move, user, target, battle, opponent_prospective, damage_matrix))
+    if damage_matrix is not None:
+        damage = damage_matrix.raw_damage(move, user, target, opponent_prospective)
+        if damage is not None:
+            return damage
     base_damage = move_base_damage(move, user, target)
     return rough_damage(move, user, target, base_damage, battle, opponent_prospective)
 
 
-def get_opponent_max_damage_move(battle: DoubleBattle, my_mon: Pokemon, opponent: Pokemon) -> \
-        (Move, int):
+def get_opponent_max_damage_move(battle: DoubleBattle, my_mon: Pokemon, opponent: Pokemon, damage_matrix=None,
+                                 cache=None) -> (Move, int):
     """
     returns the move that deals the most damage to my_mon
     across the ones known by the given opponent's Pokémon
@@ -725,7 +732,8 @@ def get_opponent_max_damage_move(battle: DoubleBattle, my_mon: Pokemon, opponent
     maxdamage = 0
     for move in moves:
         # print(move.__str__())
-        damage = calculate_percentage_damage(move, opponent, my_mon, battle, opponent_prospective=True)
+        damage = calculate_percentage_damage(move, opponent, my_mon, battle, opponent_prospective=True,
+                                             damage_matrix=damage_matrix, cache=cache)
 
         if damage > maxdamage:
             maxdamage = damage
@@ -734,7 +742,8 @@ def get_opponent_max_damage_move(battle: DoubleBattle, my_mon: Pokemon, opponent
     return maxmove, maxdamage
 
 
-def move_can_ko(move: Move, user: Pokemon, target: Pokemon, battle: DoubleBattle, opponent_prospective=False) -> bool:
+def move_can_ko(move: Move, user: Pokemon, target: Pokemon, battle: DoubleBattle, opponent_prospective=False,
+                damage_matrix=None, cache=None) -> bool:
     """
     returns a boolean inidicating wheter the given move used by user can ko the target.
     :param move:
@@ -742,9 +751,11 @@ def move_can_ko(move: Move, user: Pokemon, target: Pokemon, battle: DoubleBattle
     :param target:
     :param battle:
     :param opponent_prospective: if the user is opponent's mon, False by default
+    :param damage_matrix: DamageMatrix of the turn, None by default
+    :param cache: DamageCache of the battle, None by default
     :return:
     """
-    damage = calculate_percentage_damage(move, user, target, battle, opponent_prospective)
+    damage = calculate_percentage_damage(move, user, target, battle, opponent_prospective, damage_matrix, cache)
     return damage >= target.current_hp_fraction*100
 
 
@@ -766,16 +777,21 @@ def can_outspeed(battle: DoubleBattle, battler: Pokemon, target: Pokemon) -> boo
         return res
 
 
-def can_damage(battler: Pokemon, target: Pokemon) -> bool:
+def can_damage(battler: Pokemon, target: Pokemon, damage_matrix=None) -> bool:
     """
     returns true if battler has a super-effective damaging move with more tha 50 base power
     :param battler:
     :param target:
+    :param damage_matrix: DamageMatrix of the turn, the value is read from it when available
     :return:
     """
+    if damage_matrix is not None:
+        res = damage_matrix.can_damage(battler, target)
+        if res is not None:
+            return res
     for move in battler.moves.values():
         base_damage = move_base_damage(move, battler, target)
-        type_mod = target.damage_multiplier(move.type)
+        type_mod = TypeChart.damage_multiplier(target, move.type)
         if base_damage >= 70 and type_mod > 1:
             return True
 
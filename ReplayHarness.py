@@ -0,0 +1,296 @@
+"""
+records the Showdown protocol stream seen by a player and replays it offline: the DoubleBattle is rebuilt message
+by message and choose_move is called at every request, as Player does with a live server, timing each decision.
+A log is the text received by the player, every websocket message starts with its ">battle-tag" line.
+
+usage:
+    python ReplayHarness.py simulate LOG_DIR [--battles N]
+        saves the logs of N local battles (LocalSimulator) between the heuristic players
+    python ReplayHarness.py replay LOG_DIR [--players smart,truemax,maxdamage,random] [--save FILE] [--diff FILE]
+        replays all the logs in LOG_DIR into the players, reports decisions/s and latency percentiles.
+        --save writes the decisions, --diff compares them with the ones saved by another version of the code
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import logging
+import os
+import random
+import sys
+import time
+import zlib
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+from poke_env import PlayerConfiguration
+from poke_env.environment import DoubleBattle
+from tabulate import tabulate
+
+import LocalSimulator
+from DoublesEquilibriumPlayer import DoublesEquilibriumPlayer
+from DoublesMaxDamagePlayer import DoublesMaxDamagePlayer
+from DoublesRandomPlayer import DoubleRandomPlayer
+from DoublesSearchPlayer import DoublesSearchPlayer
+from DoublesSmartPlayer import DoublesSmartPlayer
+from DoublesTrueMaxDamagePlayer import DoublesTrueMaxDamagePlayer
+from Teams import RandomTeamFromPool
+
+BATTLE_FORMAT = "gen8vgc2021"
+PLAYERS = {
+    "random": DoubleRandomPlayer,
+    "maxdamage": DoublesMaxDamagePlayer,
+    "truemax": DoublesTrueMaxDamagePlayer,
+    "smart": DoublesSmartPlayer,
+    "search": DoublesSearchPlayer,
+    "equilibrium": DoublesEquilibriumPlayer,
+}
+
+
+# =============================================================================
+# recording
+# =============================================================================
+def record(player, directory: str):
+    """
+    saves every battle message received by player in directory/<battle tag>-<username>.log, to be used with a live
+    server before the battles start
+    :param player:
+    :param directory:
+    """
+    os.makedirs(directory, exist_ok=True)
+    handle_battle_message = player._handle_battle_message
+
+    async def recording_handle_battle_message(split_messages):
+        battle_tag = split_messages[0][0][1:]
+        path = os.path.join(directory, f"{battle_tag}-{player.username}.log")
+        with open(path, "a", encoding="utf-8") as file:
+            file.write("\n".join("|".join(message) for message in split_messages) + "\n")
+        await handle_battle_message(split_messages)
+
+    player._handle_battle_message = recording_handle_battle_message
+
+
+# =============================================================================
+# replay
+# =============================================================================
+class BattleLog(NamedTuple):
+    battle_tag: str
+    username: str
+    # protocol messages split on "|", without the battle tag lines
+    messages: List[List[str]]
+
+
+class Decision(NamedTuple):
+    # <battle tag>-<username>#<number of the decision in the battle>
+    key: str
+    message: str
+    latency: float
+
+
+def read_log(path: str) -> BattleLog:
+    """
+    :param path: log saved by record or by LocalSimulator
+    :return:
+    """
+    battle_tag = None
+    username = None
+    messages = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            line = line.rstrip("\n")
+            if line.startswith(">"):
+                battle_tag = line[1:]
+                continue
+            message = line.split("|")
+            if len(message) > 2 and message[1] == "request" and message[2] and username is None:
+                username = json.loads(message[2])["side"]["name"]
+            messages.append(message)
+    return BattleLog(battle_tag, username, messages)
+
+
+def _seed(key: str):
+    """
+    makes the random choices of the players depend only on the decision, so that two versions of the code
+    can be compared
+    :param key:
+    """
+    seed = zlib.crc32(key.encode())
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def replay(player, log: BattleLog) -> List[Decision]:
+    """
+    rebuilds the battle of log from the point of view of its player and asks player every decision, the messages
+    are handled as in Player._handle_battle_message
+    :param player: the orders are not sent, the battles are not added to player.battles
+    :param log:
+    :return: decisions of player
+    """
+    battle = DoubleBattle(log.battle_tag, log.username, player.logger, gen=8)
+    decisions = []
+
+    def decide(teampreview: bool = False):
+        key = f"{log.battle_tag}-{log.username}#{len(decisions)}"
+        _seed(key)
+        start = time.perf_counter()
+        if teampreview:
+            message = player.teampreview(battle)
+        else:
+            message = player.choose_move(battle).message
+        decisions.append(Decision(key, message, time.perf_counter() - start))
+
+    for message in log.messages:
+        if len(message) <= 1 or message[1] in ("", "init", "title", "j", "c", "raw"):
+            continue
+        if message[1] == "request":
+            if message[2]:
+                battle._parse_request(json.loads(message[2]))
+                if battle.move_on_next_request:
+                    decide()
+                    battle.move_on_next_request = False
+        elif message[1] == "win" or message[1] == "con":
+            battle._won_by(message[2])
+        elif message[1] == "tie":
+            battle._tied()
+        elif message[1] == "error":
+            continue
+        elif message[1] == "turn":
+            battle._parse_message(message)
+            decide()
+        elif message[1] == "teampreview":
+            battle._parse_message(message)
+            decide(teampreview=True)
+        else:
+            battle._parse_message(message)
+    return decisions
+
+
+def replay_all(player, logs: List[BattleLog], repeat: int = 1) -> List[Decision]:
+    """
+    :param player:
+    :param logs:
+    :param repeat: number of replays of every log, the decisions are the ones of the last replay and the latency
+        is the smallest
+    :return: decisions of player in all the logs
+    """
+    decisions = []
+    for log in logs:
+        runs = [replay(player, log) for _ in range(repeat)]
+        decisions += [Decision(decision.key, decision.message, min(run[i].latency for run in runs))
+                      for i, decision in enumerate(runs[-1])]
+    return decisions
+
+
+def latency_stats(decisions: List[Decision]) -> dict:
+    """
+    :param decisions:
+    :return: decisions per second of decision time and percentiles of the latency in milliseconds
+    """
+    latencies = np.array([decision.latency for decision in decisions]) * 1000
+    if not len(latencies):
+        return {"decisions": 0}
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {
+        "decisions": len(latencies),
+        "decisions/s": len(latencies) / latencies.sum() * 1000,
+        "p50 ms": p50,
+        "p90 ms": p90,
+        "p99 ms": p99,
+        "max ms": latencies.max(),
+    }
+
+
+def diff_decisions(decisions: Dict[str, Dict[str, str]], other: Dict[str, Dict[str, str]]) -> Dict[str, list]:
+    """
+    :param decisions: player -> decision key -> message, as saved with --save
+    :param other:
+    :return: player -> (decision key, message, other message) of the decisions that changed
+    """
+    differences = {}
+    for name, messages in decisions.items():
+        other_messages = other.get(name, {})
+        differences[name] = [(key, message, other_messages[key]) for key, message in messages.items()
+                             if key in other_messages and other_messages[key] != message]
+    return differences
+
+
+# =============================================================================
+# command line
+# =============================================================================
+def _make_player(name: str, cls):
+    return cls(
+        player_configuration=PlayerConfiguration(f"replay-{name}", None),
+        battle_format=BATTLE_FORMAT,
+        team=RandomTeamFromPool(),
+        start_listening=False,
+    )
+
+
+def _simulate(args):
+    players = [_make_player(name, PLAYERS[name]) for name in ("random", "maxdamage", "truemax", "smart")]
+    rng = random.Random(args.seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(args.battles):
+            player, opponent = rng.sample(players, 2)
+            LocalSimulator.battle_against(player, opponent, seed=rng.getrandbits(64), log_directory=args.log_dir)
+    print(f"{2 * args.battles} logs saved in {args.log_dir}")
+
+
+def _replay(args):
+    logs = [read_log(path) for path in sorted(glob.glob(os.path.join(args.log_dir, "*.log")))]
+    logs = [log for log in logs if log.username is not None]
+    print(f"{len(logs)} logs, {sum(len(log.messages) for log in logs)} messages")
+
+    table = []
+    saved = {}
+    for name in args.players.split(","):
+        player = _make_player(name, PLAYERS[name])
+        # the players print their reasoning
+        with contextlib.redirect_stdout(io.StringIO()):
+            decisions = replay_all(player, logs, args.repeat)
+        stats = latency_stats(decisions)
+        table.append([name] + [round(stats.get(column, 0), 2) for column in
+                               ("decisions", "decisions/s", "p50 ms", "p90 ms", "p99 ms", "max ms")])
+        saved[name] = {decision.key: decision.message for decision in decisions}
+    print(tabulate(table, headers=["player", "decisions", "decisions/s", "p50 ms", "p90 ms", "p99 ms", "max ms"]))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(saved, file, indent=1)
+    if args.diff:
+        with open(args.diff, encoding="utf-8") as file:
+            other = json.load(file)
+        for name, differences in diff_decisions(saved, other).items():
+            print(f"{name}: {len(differences)} of {len(saved[name])} decisions changed")
+            for key, message, other_message in differences[:args.show]:
+                print(f"  {key}: {other_message} -> {message}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="record and replay battle logs to benchmark the players")
+    commands = parser.add_subparsers(dest="command", required=True)
+    simulate = commands.add_parser("simulate", help="save the logs of local battles")
+    simulate.add_argument("log_dir")
+    simulate.add_argument("--battles", type=int, default=20)
+    simulate.add_argument("--seed", type=int, default=0)
+    replay_parser = commands.add_parser("replay", help="replay the logs into the players")
+    replay_parser.add_argument("log_dir")
+    replay_parser.add_argument("--players", default="smart,truemax,maxdamage,random",
+                               help="comma separated, among " + ", ".join(PLAYERS))
+    replay_parser.add_argument("--repeat", type=int, default=1, help="replays of each log, the fastest counts")
+    replay_parser.add_argument("--save", help="json file where the decisions are saved")
+    replay_parser.add_argument("--diff", help="json file saved by --save to compare the decisions with")
+    replay_parser.add_argument("--show", type=int, default=10, help="changed decisions printed by --diff")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    if args.command == "simulate":
+        _simulate(args)
+    else:
+        _replay(args)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
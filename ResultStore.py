@@ -0,0 +1,284 @@
+"""
+append-only JSON lines log of the battles of a cross evaluation: every finished battle is written as soon as it ends
+(players, hash of the teams, winner, turns, duration), the wins of each pair are tallied while the log is written, so
+that the cross evaluation table is always up to date, and a rerun only plays the battles missing from the log.
+The seed of the local evaluations is kept in the log too, so that a rerun skips the same battles it played.
+
+usage:
+    python ResultStore.py results.jsonl
+        prints the table of the battles in the log, also while the evaluation is running
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from poke_env.data import to_id_str
+from poke_env.environment import AbstractBattle
+from poke_env.player import POKE_LOOP
+from tabulate import tabulate
+
+
+def team_hash(battle: AbstractBattle) -> str:
+    """
+    :param battle:
+    :return: short hash of the species, items, abilities and moves of our team in battle
+    """
+    description = sorted(f"{mon.species}@{mon.item}/{mon.ability}:{','.join(sorted(mon.moves))}"
+                         for mon in battle.team.values())
+    return hashlib.sha1("|".join(description).encode()).hexdigest()[:12]
+
+
+def opponent_username(battle: AbstractBattle) -> Optional[str]:
+    """
+    :param battle:
+    :return: username of the opponent, from the "player" messages when poke_env did not set it
+    """
+    if battle.opponent_username:
+        return battle.opponent_username
+    return next((player["username"] for player in battle.players
+                 if isinstance(player, dict) and player["username"] != battle.player_username), None)
+
+
+def battle_record(player_1: str, player_2: str, battle: AbstractBattle, opponent_battle: AbstractBattle = None,
+                  duration: float = None) -> dict:
+    """
+    :param player_1: name of the player that saw battle
+    :param player_2: name of the opponent
+    :param battle: finished battle seen by player_1
+    :param opponent_battle: the same battle seen by player_2, for the hash of its team
+    :param duration: seconds from the start of the battle
+    :return: record of the battle in the log
+    """
+    if battle.won:
+        winner = player_1
+    elif battle.lost:
+        winner = player_2
+    else:
+        winner = None
+    return {
+        "battle_tag": battle.battle_tag,
+        "player_1": player_1,
+        "player_2": player_2,
+        "team_1": team_hash(battle),
+        "team_2": team_hash(opponent_battle) if opponent_battle is not None else None,
+        "winner": winner,
+        "turns": battle.turn,
+        "duration": duration,
+        "time": time.time(),
+    }
+
+
+def track_battles(players: list, on_record: Callable[[dict], None], names: Dict[str, str] = None):
+    """
+    calls on_record with the record of every battle between two of players when it finishes, the battle is
+    recorded by the player that comes first in players. For battles on a server
+    :param players:
+    :param on_record:
+    :param names: username -> name used in the records, the username if missing
+    """
+    names = names or {}
+    by_username = {to_id_str(player.username): player for player in players}
+    order = {player.username: i for i, player in enumerate(players)}
+    start_times = {}
+
+    def track(player):
+        create_battle = player._create_battle
+        battle_finished_callback = player._battle_finished_callback
+
+        async def timed_create_battle(split_message):
+            battle = await create_battle(split_message)
+            start_times.setdefault(battle.battle_tag, time.perf_counter())
+            return battle
+
+        def recording_battle_finished_callback(battle):
+            battle_finished_callback(battle)
+            opponent = by_username.get(to_id_str(opponent_username(battle) or ""))
+            if opponent is None or order[opponent.username] < order[player.username]:
+                return
+            start = start_times.pop(battle.battle_tag, None)
+            on_record(battle_record(names.get(player.username, player.username),
+                                    names.get(opponent.username, opponent.username),
+                                    battle, opponent.battles.get(battle.battle_tag),
+                                    time.perf_counter() - start if start is not None else None))
+
+        player._create_battle = timed_create_battle
+        player._battle_finished_callback = recording_battle_finished_callback
+
+    for player in players:
+        track(player)
+
+
+def _parse(line: bytes) -> Optional[dict]:
+    """
+    :return: the record or the header of a line of the log, None if the line is cut or unreadable
+    """
+    if not line.endswith(b"\n"):
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+class ResultStore:
+    def __init__(self, path: str, read_only: bool = False):
+        """
+        opens the log in path, creating it if missing. Unreadable lines are skipped, the ones at the end (a last
+        line cut by a crash) are removed
+        :param path:
+        :param read_only: only reads the log, to follow an evaluation that is writing it
+        """
+        self.path = path
+        # seed of the evaluation, see run_seed
+        self.seed = None
+        # unreadable lines skipped in the middle of the log
+        self.skipped = 0
+        # (player, opponent) -> battles won by player
+        self.wins = Counter()
+        # (player, opponent) sorted -> battles
+        self.battles = Counter()
+        self.records = 0
+        self.read_only = read_only
+        if os.path.exists(path):
+            self._load()
+        self._file = None if read_only else open(path, "a", encoding="utf-8")
+
+    def _load(self):
+        # end of the last readable line, the lines after it are cut
+        valid_end = 0
+        end = 0
+        bad_lines = 0
+        with open(self.path, "rb") as file:
+            for line in file:
+                end += len(line)
+                record = _parse(line)
+                if record is None:
+                    # two writers interleaving, a crash: the next lines can still be read
+                    bad_lines += 1
+                    continue
+                if "player_1" in record:
+                    self._count(record)
+                else:
+                    self.seed = record.get("seed", self.seed)
+                self.skipped += bad_lines
+                bad_lines = 0
+                valid_end = end
+        if not self.read_only and valid_end < end:
+            with open(self.path, "r+b") as file:
+                file.truncate(valid_end)
+
+    def _count(self, record: dict):
+        pair = tuple(sorted((record["player_1"], record["player_2"])))
+        self.battles[pair] += 1
+        winner = record["winner"]
+        if winner is not None:
+            loser = record["player_2"] if winner == record["player_1"] else record["player_1"]
+            self.wins[winner, loser] += 1
+        self.records += 1
+
+    def append(self, record: dict):
+        """
+        writes record at the end of the log and counts it
+        :param record: see battle_record
+        """
+        self._write(record)
+        self._count(record)
+
+    def _write(self, line: dict):
+        self._file.write(json.dumps(line) + "\n")
+        self._file.flush()
+
+    def run_seed(self, seed=None) -> int:
+        """
+        seed of the local battles of the evaluation recorded in the log: a rerun uses the seed of the first run, so
+        that the battles it skips (ResultStore.done) are the ones already played and the new ones are the next of the
+        same sequence
+        :param seed: seed of the first run, a random one if None; ignored if the log already has a seed
+        :return:
+        """
+        if self.seed is None:
+            self.seed = seed if seed is not None else random.getrandbits(64)
+            if not self.read_only:
+                self._write({"seed": self.seed})
+        return self.seed
+
+    def done(self, player_1: str, player_2: str) -> int:
+        """
+        :return: battles between the two players in the log
+        """
+        return self.battles[tuple(sorted((player_1, player_2)))]
+
+    def win_rate(self, player: str, opponent: str) -> Optional[float]:
+        """
+        :return: fraction of the battles against opponent won by player, None if they never fought
+        """
+        battles = self.done(player, opponent)
+        return self.wins[player, opponent] / battles if battles else None
+
+    def table(self, players: List[str] = None) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        :param players: names of the players, all the ones in the log if None
+        :return: same result of poke_env cross_evaluate
+        """
+        if players is None:
+            players = sorted({player for pair in self.battles for player in pair})
+        return {p_1: {p_2: self.win_rate(p_1, p_2) if p_1 != p_2 else None for p_2 in players} for p_1 in players}
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+async def cross_evaluate(players: list, n_challenges: int, store: ResultStore) \
+        -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    same as poke_env cross_evaluate, the battles are recorded in store and the ones already there are not played
+    :param players:
+    :param n_challenges: battles between each pair of players, including the recorded ones
+    :param store:
+    :return:
+    """
+    track_battles(players, store.append)
+    for i, p_1 in enumerate(players):
+        for p_2 in players[i + 1:]:
+            remaining = n_challenges - store.done(p_1.username, p_2.username)
+            if remaining <= 0:
+                continue
+            await asyncio.gather(
+                p_1.send_challenges(opponent=to_id_str(p_2.username), n_challenges=remaining,
+                                    to_wait=p_2.logged_in),
+                p_2.accept_challenges(opponent=to_id_str(p_1.username), n_challenges=remaining),
+            )
+            p_1.reset_battles()
+            p_2.reset_battles()
+    return store.table([player.username for player in players])
+
+
+def background_cross_evaluate(players: list, n_challenges: int, store: ResultStore):
+    return asyncio.run_coroutine_threadsafe(cross_evaluate(players, n_challenges, store), POKE_LOOP)
+
+
+def print_table(cross_evaluation: Dict[str, Dict[str, Optional[float]]]):
+    table = [["-"] + list(cross_evaluation)]
+    for p_1, results in cross_evaluation.items():
+        table.append([p_1] + [results[p_2] for p_2 in results])
+    print(tabulate(table))
+
+
+if __name__ == "__main__":
+    with ResultStore(sys.argv[1], read_only=True) as result_store:
+        print(f"{result_store.records} battles")
+        print_table(result_store.table())
@@ -0,0 +1,229 @@
+"""
+cross evaluation that stops each pair of players as soon as its result is decided: the battles are played in batches
+and after every batch a sequential test tells if one player is stronger, if the two are equal within delta or if
+more battles are needed, up to max_battles. Ties count as half a win for each player
+"""
+import asyncio
+import itertools
+import math
+import random
+from statistics import NormalDist
+from typing import Dict, List, Optional
+
+from poke_env.data import to_id_str
+from poke_env.player import POKE_LOOP
+
+import LocalSimulator
+from ResultStore import track_battles
+
+# verdicts of a test
+FIRST_STRONGER = 1
+SECOND_STRONGER = -1
+EQUAL = 0
+
+
+class SPRT:
+    """
+    two one-sided sequential probability ratio tests on the score p of the first player:
+    p = 0.5 against p = 0.5 + delta and p = 0.5 against p = 0.5 - delta, each with error rates alpha / 2 and beta
+    """
+
+    def __init__(self, delta: float = 0.1, alpha: float = 0.05, beta: float = 0.05):
+        """
+        :param delta: smallest difference of score from 0.5 worth detecting
+        :param alpha: probability of declaring a player stronger when they are equal
+        :param beta: probability of declaring them equal when the difference is delta
+        """
+        self.delta = delta
+        self.upper = math.log((1 - beta) / (alpha / 2))
+        self.lower = math.log(beta / (1 - alpha / 2))
+
+    @staticmethod
+    def _llr(score: float, n: float, p: float) -> float:
+        # log likelihood ratio of p against 0.5
+        return score * math.log(p / 0.5) + (n - score) * math.log((1 - p) / 0.5)
+
+    def decide(self, wins: int, losses: int, ties: int = 0) -> Optional[int]:
+        """
+        :return: FIRST_STRONGER, SECOND_STRONGER, EQUAL or None if more battles are needed
+        """
+        score = wins + ties / 2
+        n = wins + losses + ties
+        up = self._llr(score, n, 0.5 + self.delta)
+        down = self._llr(score, n, 0.5 - self.delta)
+        if up >= self.upper:
+            return FIRST_STRONGER
+        if down >= self.upper:
+            return SECOND_STRONGER
+        if up <= self.lower and down <= self.lower:
+            return EQUAL
+        return None
+
+
+class ConfidenceStop:
+    """
+    stops when the Wilson interval of the score excludes 0.5 or lies within 0.5 +- delta. The interval is not
+    corrected for the repeated looks, so the confidence should be higher than the one wanted
+    """
+
+    def __init__(self, delta: float = 0.1, confidence: float = 0.99, min_battles: int = 10):
+        self.delta = delta
+        self.z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+        self.min_battles = min_battles
+
+    def interval(self, score: float, n: int) -> (float, float):
+        p = score / n
+        center = (p + self.z ** 2 / (2 * n)) / (1 + self.z ** 2 / n)
+        half = self.z * math.sqrt(p * (1 - p) / n + self.z ** 2 / (4 * n ** 2)) / (1 + self.z ** 2 / n)
+        return center - half, center + half
+
+    def decide(self, wins: int, losses: int, ties: int = 0) -> Optional[int]:
+        n = wins + losses + ties
+        if n < self.min_battles:
+            return None
+        low, high = self.interval(wins + ties / 2, n)
+        if low > 0.5:
+            return FIRST_STRONGER
+        if high < 0.5:
+            return SECOND_STRONGER
+        if low > 0.5 - self.delta and high < 0.5 + self.delta:
+            return EQUAL
+        return None
+
+
+class PairResult:
+    __slots__ = ("player_1", "player_2", "wins", "losses", "ties", "verdict")
+
+    def __init__(self, player_1: str, player_2: str):
+        self.player_1 = player_1
+        self.player_2 = player_2
+        # battles won by player_1, won by player_2 and tied
+        self.wins = 0
+        self.losses = 0
+        self.ties = 0
+        self.verdict = None
+
+    @property
+    def battles(self) -> int:
+        return self.wins + self.losses + self.ties
+
+    def add(self, record: dict):
+        """
+        :param record: ResultStore.battle_record of a battle of the pair
+        """
+        if record["winner"] is None:
+            self.ties += 1
+        elif record["winner"] == self.player_1:
+            self.wins += 1
+        else:
+            self.losses += 1
+
+
+def _results(players: List[str], pairs: Dict[tuple, PairResult]) -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    :return: same result of poke_env cross_evaluate
+    """
+    results = {p_1: {p_2: None for p_2 in players} for p_1 in players}
+    for (p_1, p_2), pair in pairs.items():
+        if pair.battles:
+            results[p_1][p_2] = pair.wins / pair.battles
+            results[p_2][p_1] = pair.losses / pair.battles
+    return results
+
+
+def _start(players: list, store) -> Dict[tuple, PairResult]:
+    """
+    :return: results of all the pairs of players, with the battles already in store
+    """
+    pairs = {}
+    for p_1, p_2 in itertools.combinations(players, 2):
+        pair = pairs[p_1.username, p_2.username] = PairResult(p_1.username, p_2.username)
+        if store is not None:
+            pair.wins = store.wins[p_1.username, p_2.username]
+            pair.losses = store.wins[p_2.username, p_1.username]
+            pair.ties = store.done(p_1.username, p_2.username) - pair.wins - pair.losses
+    return pairs
+
+
+def sequential_cross_evaluate(players: list, max_battles: int = 200, test=None, batch_size: int = 10, seed=None,
+                              store=None) -> (Dict[str, Dict[str, Optional[float]]], Dict[tuple, PairResult]):
+    """
+    cross evaluation with local battles (LocalSimulator) stopped by test
+    :param players:
+    :param max_battles: battles after which a pair is stopped even if undecided
+    :param test: SPRT or ConfidenceStop, SPRT() if None
+    :param batch_size: battles between two tests
+    :param seed: with a store, the seed recorded in it is used (ResultStore.run_seed)
+    :param store: ResultStore where the battles are recorded, the ones already there count for the tests
+    :return: win rates as poke_env cross_evaluate and (player 1, player 2) -> PairResult with the verdict
+    """
+    test = test or SPRT()
+    if store is not None:
+        seed = store.run_seed(seed)
+    rng = random.Random(seed)
+    pairs = _start(players, store)
+    for p_1, p_2 in itertools.combinations(players, 2):
+        pair = pairs[p_1.username, p_2.username]
+        pair_seed = rng.getrandbits(64)
+
+        def on_record(record):
+            pair.add(record)
+            if store is not None:
+                store.append(record)
+
+        pair.verdict = test.decide(pair.wins, pair.losses, pair.ties)
+        while pair.verdict is None and pair.battles < max_battles:
+            played = pair.battles
+            # same seeds of LocalSimulator.battle_against, so that a resumed evaluation continues with new battles
+            LocalSimulator.record_battles(p_1, p_2, min(played + batch_size, max_battles), pair_seed, on_record,
+                                          skip=played)
+            pair.verdict = test.decide(pair.wins, pair.losses, pair.ties)
+    return _results([player.username for player in players], pairs), pairs
+
+
+async def server_sequential_cross_evaluate(players: list, max_battles: int = 200, test=None, batch_size: int = 10,
+                                           store=None) \
+        -> (Dict[str, Dict[str, Optional[float]]], Dict[tuple, PairResult]):
+    """
+    same as sequential_cross_evaluate with battles on the server
+    """
+    test = test or SPRT()
+    pairs = _start(players, store)
+
+    def on_record(record):
+        pairs[record["player_1"], record["player_2"]].add(record)
+        if store is not None:
+            store.append(record)
+
+    track_battles(players, on_record)
+    for p_1, p_2 in itertools.combinations(players, 2):
+        pair = pairs[p_1.username, p_2.username]
+        pair.verdict = test.decide(pair.wins, pair.losses, pair.ties)
+        while pair.verdict is None and pair.battles < max_battles:
+            n_challenges = min(batch_size, max_battles - pair.battles)
+            await asyncio.gather(
+                p_1.send_challenges(opponent=to_id_str(p_2.username), n_challenges=n_challenges,
+                                    to_wait=p_2.logged_in),
+                p_2.accept_challenges(opponent=to_id_str(p_1.username), n_challenges=n_challenges),
+            )
+            p_1.reset_battles()
+            p_2.reset_battles()
+            pair.verdict = test.decide(pair.wins, pair.losses, pair.ties)
+    return _results([player.username for player in players], pairs), pairs
+
+
+def background_sequential_cross_evaluate(players: list, max_battles: int = 200, test=None, batch_size: int = 10,
+                                         store=None):
+    return asyncio.run_coroutine_threadsafe(
+        server_sequential_cross_evaluate(players, max_battles, test, batch_size, store), POKE_LOOP)
+
+
+def describe(pairs: Dict[tuple, PairResult]) -> List[list]:
+    """
+    :return: rows (player 1, player 2, battles, score of player 1, verdict) for tabulate
+    """
+    names = {FIRST_STRONGER: "first stronger", SECOND_STRONGER: "second stronger", EQUAL: "equal",
+             None: "undecided"}
+    return [[pair.player_1, pair.player_2, pair.battles,
+             round((pair.wins + pair.ties / 2) / pair.battles, 3) if pair.battles else None, names[pair.verdict]]
+            for pair in pairs.values()]
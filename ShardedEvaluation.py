@@ -0,0 +1,199 @@
+"""
+cross evaluation on many cores: the battles of every pair of players are split in shards of batch_size battles, the
+shards run in a pool of processes and the records of their battles (ResultStore.battle_record) are merged in the table
+of poke_env cross_evaluate. The records are written to the ResultStore in the order of the shards, so that a resumed
+evaluation skips the battles at the start of the sequence and plays the rest of it. Each worker creates its own
+players from their PlayerSpec, with account names ending with the number of the worker, and plays its shards against
+the Showdown server or with LocalSimulator
+"""
+import asyncio
+import itertools
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+# max length of a Showdown username
+_MAX_USERNAME = 18
+# battles of a shard: the shards and their seeds don't depend on the number of workers, so that the local battles
+# are the same with any number of workers
+BATCH_SIZE = 10
+
+
+class PlayerSpec(NamedTuple):
+    cls: type
+    username: str
+    # arguments of cls besides player_configuration and start_listening, team defaults to RandomTeamFromPool()
+    kwargs: dict = {}
+
+
+class Shard(NamedTuple):
+    player_1: int
+    player_2: int
+    # battles of the shard, the skipped ones included
+    n_battles: int
+    seed: int
+    # the first battles of the shard, already played by an interrupted evaluation
+    skip: int = 0
+
+
+def make_shards(n_players: int, n_challenges: int, batch_size: int, seed=None, done: Dict[tuple, int] = None) \
+        -> List[Shard]:
+    """
+    :param n_players:
+    :param n_challenges: battles between each pair of players
+    :param batch_size: maximum battles of a shard
+    :param seed:
+    :param done: (i, j) -> battles already played by the pair, the first ones of its sequence, skipped by the
+        shards
+    :return: shards of all the pairs of players
+    """
+    rng = random.Random(seed)
+    shards = []
+    for i, j in itertools.combinations(range(n_players), 2):
+        played = done.get((i, j), 0) if done else 0
+        for start in range(0, n_challenges, batch_size):
+            shard_seed = rng.getrandbits(32)
+            n_battles = min(batch_size, n_challenges - start)
+            skip = min(max(0, played - start), n_battles)
+            if skip < n_battles:
+                shards.append(Shard(i, j, n_battles, shard_seed, skip))
+    return shards
+
+
+# =============================================================================
+# worker
+# =============================================================================
+# state of the worker process, set by _init_worker
+_specs: List[PlayerSpec] = []
+_local = False
+_worker = 0
+_players = []
+# records of the battles on the server, filled by ResultStore.track_battles
+_records = []
+
+
+def _init_worker(counter, specs: List[PlayerSpec], local: bool):
+    global _specs, _local, _worker
+    with counter.get_lock():
+        counter.value += 1
+        _worker = counter.value
+    _specs = specs
+    _local = local
+
+
+def worker_username(username: str, worker: int) -> str:
+    """
+    :return: account name of the player username in the worker, unique among the workers
+    """
+    suffix = str(worker)
+    return username[:_MAX_USERNAME - len(suffix)] + suffix
+
+
+def _worker_players() -> list:
+    """
+    :return: the players of the worker, created the first time
+    """
+    if not _players:
+        from poke_env import PlayerConfiguration, LocalhostServerConfiguration
+        from ResultStore import track_battles
+        from Teams import RandomTeamFromPool
+
+        for spec in _specs:
+            kwargs = dict(spec.kwargs)
+            kwargs.setdefault("team", RandomTeamFromPool())
+            kwargs.setdefault("server_configuration", LocalhostServerConfiguration)
+            _players.append(spec.cls(
+                player_configuration=PlayerConfiguration(worker_username(spec.username, _worker), None),
+                start_listening=not _local,
+                **kwargs
+            ))
+        if not _local:
+            track_battles(_players, _records.append,
+                          {player.username: spec.username for player, spec in zip(_players, _specs)})
+    return _players
+
+
+def _run_shard(shard: Shard) -> (Shard, List[dict]):
+    """
+    :return: shard, records of its battles
+    """
+    random.seed(shard.seed)
+    np.random.seed(shard.seed)
+    players = _worker_players()
+    player_1 = players[shard.player_1]
+    player_2 = players[shard.player_2]
+    if _local:
+        import LocalSimulator
+
+        records = []
+        LocalSimulator.record_battles(player_1, player_2, shard.n_battles, shard.seed, records.append, skip=shard.skip,
+                                      names=(_specs[shard.player_1].username, _specs[shard.player_2].username))
+    else:
+        from poke_env.player import POKE_LOOP
+
+        asyncio.run_coroutine_threadsafe(player_1.battle_against(player_2, shard.n_battles - shard.skip),
+                                         POKE_LOOP).result()
+        records = _records[:]
+        _records.clear()
+    player_1.reset_battles()
+    player_2.reset_battles()
+    return shard, records
+
+
+# =============================================================================
+# runner
+# =============================================================================
+def sharded_cross_evaluate(specs: List[PlayerSpec], n_challenges: int, workers: int = None,
+                           batch_size: int = BATCH_SIZE,
+                           local: bool = False, seed=None, store=None) -> Dict[str, Dict[str, Optional[float]]]:
+    """
+    same result of poke_env cross_evaluate, with the battles run by a pool of processes
+    :param specs: players, the keys of the result are their usernames
+    :param n_challenges: battles between each pair of players
+    :param workers: number of processes, os.cpu_count() if None
+    :param batch_size: battles of a shard
+    :param local: if True the battles are simulated with LocalSimulator, otherwise they are played on the server
+    :param seed: seed of the shards, None for a random one; with local battles the result depends only on it and
+        on batch_size, not on workers. With a store, the seed recorded in it is used (ResultStore.run_seed)
+    :param store: ResultStore where the battles are recorded as the shards end, the battles already there are
+        not played again
+    :return: results[p_1][p_2] = fraction of the battles won by p_1 against p_2
+    """
+    workers = workers or os.cpu_count()
+    done = None
+    if store is not None:
+        seed = store.run_seed(seed)
+        done = {(i, j): store.done(specs[i].username, specs[j].username)
+                for i, j in itertools.combinations(range(len(specs)), 2)}
+    shards = make_shards(len(specs), n_challenges, batch_size, seed, done)
+
+    index = {spec.username: i for i, spec in enumerate(specs)}
+    wins = np.zeros((len(specs), len(specs)), dtype=int)
+    battles = np.zeros((len(specs), len(specs)), dtype=int)
+    # spawn: poke_env runs its event loop in a thread, which a forked process would not have
+    context = multiprocessing.get_context("spawn")
+    counter = context.Value("i", 0)
+    with ProcessPoolExecutor(workers, context, initializer=_init_worker, initargs=(counter, specs, local)) as pool:
+        futures = [pool.submit(_run_shard, shard) for shard in shards]
+        # in the order of the shards: the battles in the store are always the first ones of each pair
+        for future in futures:
+            shard, records = future.result()
+            for record in records:
+                if store is not None:
+                    store.append(record)
+                if record["winner"] is not None:
+                    winner = index[record["winner"]]
+                    wins[winner, shard.player_1 + shard.player_2 - winner] += 1
+            battles[shard.player_1, shard.player_2] += len(records)
+            battles[shard.player_2, shard.player_1] += len(records)
+
+    if store is not None:
+        return store.table([spec.username for spec in specs])
+    results = {p_1.username: {p_2.username: None for p_2 in specs} for p_1 in specs}
+    for i, j in itertools.permutations(range(len(specs)), 2):
+        results[specs[i].username][specs[j].username] = float(wins[i, j] / battles[i, j]) if battles[i, j] else None
+    return results
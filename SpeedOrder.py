@@ -0,0 +1,44 @@
+"""
+turn order of all the battlers of a turn: the effective speeds (boosts, paralysis, Quick Feet, Choice Scarf) of the
+active and benched Pokémon of both teams are computed once, with the order between every pair of them under the
+current Trick Room state, so that "who moves first" is a lookup instead of two speed_calc calls
+"""
+import numpy as np
+
+
+class SpeedOrder:
+    __slots__ = ("speed", "trick_room", "rank", "faster")
+
+    speed: np.ndarray
+    trick_room: bool
+    # position in the turn order, 0 moves first; battlers with the same speed have the same rank
+    rank: np.ndarray
+    # faster[i, j] is True if i moves before j, as MoveUtilities.can_outspeed
+    faster: np.ndarray
+
+    def __init__(self, speed: np.ndarray, trick_room: bool):
+        """
+        :param speed: effective speed of each battler, as MoveUtilities.speed_calc
+        :param trick_room: True if Trick Room is active
+        """
+        self.speed = speed
+        self.trick_room = trick_room
+        order = speed if trick_room else -speed
+        self.rank = np.unique(order, return_inverse=True)[1].reshape(len(speed))
+        faster = speed[:, None] > speed[None, :]
+        self.faster = ~faster if trick_room else faster
+
+    def outspeeds(self, i: int, j: int) -> bool:
+        """
+        :param i: row of the first battler
+        :param j: row of the second battler
+        :return: True if i moves before j
+        """
+        return bool(self.faster[i, j])
+
+    def order(self, rows) -> list:
+        """
+        :param rows: rows of battlers
+        :return: rows sorted by turn order, ties in the given order
+        """
+        return sorted(rows, key=lambda row: self.rank[row])
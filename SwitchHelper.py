@@ -3,20 +3,30 @@
 # =============================================================================
 import random
 
+import numpy as np
 from poke_env.player import BattleOrder
 
 import AttackChooser
+import MoveIndex
 import MoveUtilities
+import TypeChart
+from MatchupMatrix import MatchupMatrix, matchup_score
+from TurnContext import TurnContext
 
 from poke_env.environment import Move, Pokemon, DoubleBattle, Effect
 
-def should_withdraw(battle: DoubleBattle, idx_battler, last_switch=None) -> BattleOrder | None:
+def should_withdraw(battle: DoubleBattle, idx_battler, last_switch=None,
+                    context: TurnContext = None) -> BattleOrder | None:
     """
     return the best switch if pokémon identified by idxBattler should switch, else return None
     :param battle:
     :param idx_battler:
+    :param last_switch:
+    :param context: TurnContext of the turn, a new one is created if not given
     :return:
     """
+    if context is None:
+        context = TurnContext(battle)
 
     ai_random = random
     ai_random.randint(0, 100)
@@ -30,12 +40,11 @@ def should_withdraw(battle: DoubleBattle, idx_battler, last_switch=None) -> Batt
         # predicted_move = Move
         if target is None:
             continue
-        (predicted_move, predicted_damage) = MoveUtilities.get_opponent_max_damage_move(battle, battler, target)
+        (predicted_move, predicted_damage) = context.opponent_max_damage_move(battler, target)
         if predicted_damage > 0:
             predictions.append((target, predicted_move, predicted_damage))
-        if MoveUtilities.can_outspeed(battle, target,
-                                      battler) and predicted_move is not None and battler.damage_multiplier(
-                predicted_move.type) > 1:
+        if context.can_outspeed(target, battler) and predicted_move is not None and TypeChart.damage_multiplier(
+                battler, predicted_move.type) > 1:
             switch_chance = 0
             if predicted_damage >= 98:  # most certain ohko
                 switch_chance = 80
@@ -44,7 +53,7 @@ def should_withdraw(battle: DoubleBattle, idx_battler, last_switch=None) -> Batt
             should_switch = ai_random.randint(0, 100) < switch_chance
 
     # Pokémon can't do anything
-    if battle.available_moves[idx_battler][0] == Move.retrieve_id("struggle"):
+    if battle.available_moves[idx_battler][0] == MoveIndex.STRUGGLE:
         should_switch = True
 
     # Pokémon is Encored into an unfavourable move
@@ -53,7 +62,7 @@ def should_withdraw(battle: DoubleBattle, idx_battler, last_switch=None) -> Batt
         score_sum = 0
         score_count = 0
         for target in battle.opponent_active_pokemon:
-            score_sum += AttackChooser.get_move_score(battle, move, battler, target)
+            score_sum += AttackChooser.get_move_score(battle, move, battler, target, context)
             score_count += 1
         if score_count > 0 and score_sum / score_count <= 20 and ai_random.randint(0, 100) < 80:
             should_switch = True
@@ -71,25 +80,18 @@ def should_withdraw(battle: DoubleBattle, idx_battler, last_switch=None) -> Batt
 
     if should_switch:
         switch_order = []
-        for pkmn in battle.available_switches[idx_battler]:
-            weight = 0
-            for (target, move, damage) in predictions:
-                move_type = move.type
-                # moveType is the type of the predicted move that will hit battler
-                type_mod = pkmn.damage_multiplier(move_type)
-                temp_weight = 0
-                if type_mod == 0:  # if switch immune
-                    temp_weight = 65
-                    if MoveUtilities.can_damage(pkmn, target):
-                        # Greater weight if new Pokémon's can hit effectively the target
-                        temp_weight = 85
-                elif type_mod < 1:  # if switch resist
-                    temp_weight = 40
-                    if MoveUtilities.can_damage(pkmn, target):
-                        # Greater weight if new Pokémon's can hit effectively the target
-                        temp_weight = 60
-                if temp_weight > weight:
-                    weight = temp_weight
+        switches = battle.available_switches[idx_battler]
+        weights = np.zeros(len(switches))
+        if switches and predictions:
+            # type_mods[i, k]: multiplier of the k-th predicted move on the i-th switch
+            type_mods = np.array([[TypeChart.damage_multiplier(pkmn, move.type) for (_, move, _) in predictions]
+                                  for pkmn in switches])
+            can_damage = MatchupMatrix.of(battle).damages(switches, [target for (target, _, _) in predictions],
+                                                          context)
+            # switch immune / switch resist, greater weight if new Pokémon's can hit effectively the target
+            weights = np.where(type_mods == 0, np.where(can_damage, 85, 65),
+                               np.where(type_mods < 1, np.where(can_damage, 60, 40), 0)).max(axis=1)
+        for pkmn, weight in zip(switches, weights):
             if weight < 40:
                 continue
             if ai_random.randint(0, 100) < weight:
@@ -101,9 +103,9 @@ def should_withdraw(battle: DoubleBattle, idx_battler, last_switch=None) -> Batt
         if len(switch_order) > 0:
             switch = switch_order[0]
             if last_switch is not None and switch == last_switch:
+                # the other slot is already switching to it
                 if len(switch_order) > 1:
-                    # last_switch = switch_order[1]
-                    return BattleOrder(last_switch)
+                    return BattleOrder(switch_order[1])
                 else:
                     return None
             return BattleOrder(switch_order[0])
@@ -114,39 +116,33 @@ def should_withdraw(battle: DoubleBattle, idx_battler, last_switch=None) -> Batt
 # Choose a replacement Pokémon
 # =============================================================================
 
-def choose_possible_best_switch(battle, index: int) -> Pokemon | None:
+def choose_possible_best_switch(battle, index: int, context: TurnContext = None,
+                                exclude: Pokemon = None) -> Pokemon | None:
+    """
+    :param exclude: Pokémon already chosen by the other slot
+    """
     if not battle.available_switches:
         return None
+    if context is None:
+        context = TurnContext(battle)
     # Go through each Pokémon that can be switched to, and choose one with the best type matchup against both opponents
     # (smaller multipliers are better)
-    best_score = float('inf')
-    best_switch = battle.available_switches[index][0]
-    for switch in battle.available_switches[index]:
-        score1 = get_matchup_score_default(battle, switch, battle.opponent_active_pokemon[0])
-        score2 = get_matchup_score_default(battle, switch, battle.opponent_active_pokemon[1])
-        score = score1 + score2
-        if score < best_score:
-            best_score = score
-            best_switch = switch
-    return best_switch
-
-
-def get_matchup_score_default(battle: DoubleBattle, my_pokemon: Pokemon, opponent_pokemon: Pokemon):
-    score = 0
+    switches = battle.available_switches[index]
+    if exclude is not None:
+        switches = [switch for switch in switches if switch is not exclude]
+    if not switches:
+        return None
+    opponents = [battle.opponent_active_pokemon[0], battle.opponent_active_pokemon[1]]
+    scores = MatchupMatrix.of(battle).scores(switches, opponents, context).sum(axis=1)
+    return switches[int(np.argmin(scores))]
+
+
+def get_matchup_score_default(battle: DoubleBattle, my_pokemon: Pokemon, opponent_pokemon: Pokemon,
+                              context: TurnContext = None):
     if opponent_pokemon is None:
-        return score
+        return 0
+    if context is None:
+        context = TurnContext(battle)
     defensive_multiplier = MoveUtilities.pokemon_type_advantage(my_pokemon, opponent_pokemon)
-    # A multiplier greater than 1 means we are at a type disadvantage. If there is a better type match, switch
-    if defensive_multiplier == 4:
-        score += 1
-    elif defensive_multiplier == 2:
-        score += 0.5
-    elif defensive_multiplier == 0.5:
-        score -= 0.5
-    elif defensive_multiplier == 0.25:
-        score -= 1
-    if MoveUtilities.can_outspeed(battle, my_pokemon, opponent_pokemon):
-        score += 0.5
-    if MoveUtilities.can_damage(my_pokemon, opponent_pokemon):
-        score += 0.5
-    return score
+    return matchup_score(defensive_multiplier, context.can_outspeed(my_pokemon, opponent_pokemon),
+                         context.can_damage(my_pokemon, opponent_pokemon))
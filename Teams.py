@@ -1,5 +1,163 @@
+import glob
+import hashlib
+import json
+import math
+import os
+import random
+from typing import Dict, List
+
+from poke_env.data import GenData, to_id_str
 from poke_env.teambuilder import Teambuilder
 
+_DATA = GenData.from_gen(8)
+STATS = ["hp", "atk", "def", "spa", "spd", "spe"]
+# cache of the packed teams, in the directory of the team files
+CACHE_FILE = ".team_cache.json"
+
+
+def unpack_team(packed: str) -> List[dict]:
+    """
+    parses a team in Showdown packed format (Teambuilder.yield_team)
+    :param packed:
+    :return: one dict per Pokémon: name, species, item, ability, moves, nature, evs, ivs, level
+    """
+    team = []
+    for packed_mon in packed.split("]"):
+        fields = packed_mon.split("|")
+        name, species, item, ability, moves, nature, evs = fields[:7]
+        ivs = fields[8] if len(fields) > 8 else ""
+        level = fields[10] if len(fields) > 10 else ""
+        evs = [int(ev) if ev else 0 for ev in evs.split(",")] if evs else [0] * 6
+        ivs = [int(iv) if iv else 31 for iv in ivs.split(",")] if ivs else [31] * 6
+        team.append({
+            "name": name,
+            "species": to_id_str(species or name),
+            "item": to_id_str(item),
+            "ability": to_id_str(ability),
+            "moves": [to_id_str(move) for move in moves.split(",") if move],
+            "nature": to_id_str(nature) or "serious",
+            "evs": evs,
+            "ivs": ivs,
+            "level": int(level) if level else 100,
+        })
+    return team
+
+
+def compute_stats(mon: dict) -> Dict[str, int]:
+    """
+    :param mon: a Pokémon of unpack_team
+    :return: its stats, hp included
+    """
+    base_stats = _DATA.pokedex[mon["species"]]["baseStats"]
+    nature = _DATA.natures.get(mon["nature"], {})
+    stats = {}
+    for i, stat in enumerate(STATS):
+        value = math.floor((2 * base_stats[stat] + mon["ivs"][i] + mon["evs"][i] // 4) * mon["level"] / 100)
+        if stat == "hp":
+            stats[stat] = value + mon["level"] + 10
+        else:
+            stats[stat] = math.floor((value + 5) * nature.get(stat, 1))
+    return stats
+
+
+def validate_team(team: List[dict], name: str = "team"):
+    """
+    :param team: unpack_team of the team
+    :param name: shown in the errors
+    :raise ValueError: if the team could not be used in a battle
+    """
+    if not 1 <= len(team) <= 6:
+        raise ValueError(f"{name}: {len(team)} Pokémon")
+    for mon in team:
+        if mon["species"] not in _DATA.pokedex:
+            raise ValueError(f"{name}: unknown species {mon['species']}")
+        if not 1 <= len(mon["moves"]) <= 4:
+            raise ValueError(f"{name}: {mon['species']} has {len(mon['moves'])} moves")
+        for move in mon["moves"]:
+            if move not in _DATA.moves:
+                raise ValueError(f"{name}: {mon['species']} has unknown move {move}")
+        if max(mon["evs"]) > 252 or sum(mon["evs"]) > 510:
+            raise ValueError(f"{name}: {mon['species']} has too many EVs")
+        if max(mon["ivs"]) > 31 or not 1 <= mon["level"] <= 100:
+            raise ValueError(f"{name}: {mon['species']} has invalid IVs or level")
+
+
+def _read_cache(path: str) -> dict:
+    """
+    :return: content of the cache in path, empty if it is missing or unreadable
+    """
+    try:
+        with open(path, encoding="utf-8") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict):
+        return {}
+    # entries of other versions of the cache are parsed again
+    return {key: entry for key, entry in cache.items() if isinstance(entry, dict) and "packed" in entry}
+
+
+def _write_cache(path: str, entries: dict):
+    """
+    writes the cache in a temporary file then renames it, so that an interrupted write never leaves a truncated cache
+    """
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(entries, file, separators=(",", ":"))
+        os.replace(temporary, path)
+    except OSError:
+        # the cache only saves time, a directory that can't be written is parsed at every run
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+class TeamPool:
+    """
+    the teams of a directory of Showdown exports (like teams/base_team.txt), parsed and validated once: the packed
+    teams are cached in CACHE_FILE by hash of the content of the files, so that only new or changed files are parsed.
+    TeamPool.load shares the pool of a directory between all the players of the process
+    """
+    _pools = {}
+
+    def __init__(self, directory: str, pattern: str = "*.txt"):
+        self.directory = directory
+        # packed teams, sorted by file name
+        self.teams: List[str] = []
+        self.files: List[str] = []
+
+        cache_path = os.path.join(directory, CACHE_FILE)
+        cache = _read_cache(cache_path)
+        entries = {}
+        for path in sorted(glob.glob(os.path.join(directory, pattern))):
+            with open(path, encoding="utf-8") as file:
+                content = file.read()
+            key = hashlib.sha1(content.encode()).hexdigest()
+            entry = cache.get(key)
+            if entry is None:
+                packed = Teambuilder.join_team(Teambuilder.parse_showdown_team(content))
+                team = unpack_team(packed)
+                validate_team(team, path)
+                entry = {"packed": packed}
+            entries[key] = entry
+            self.files.append(path)
+            self.teams.append(entry["packed"])
+        if not self.teams:
+            raise ValueError(f"no team in {directory}")
+        if entries != cache:
+            _write_cache(cache_path, entries)
+
+    @classmethod
+    def load(cls, directory: str) -> "TeamPool":
+        """
+        :return: the pool of directory, read only by the first call of the process
+        """
+        key = os.path.abspath(directory)
+        pool = cls._pools.get(key)
+        if pool is None:
+            pool = cls._pools[key] = cls(directory)
+        return pool
+
 
 class RandomTeamFromPool(Teambuilder):
 
@@ -131,12 +289,30 @@ Adamant Nature
 - Protect  
 """
 
-    def __init__(self):
-        self.teams = [self.join_team(self.parse_showdown_team(self.team_2))]
+    # packed team_2, parsed once for all the players
+    _default_team = None
 
+    def __init__(self, directory: str = None, seed=None, round_robin: bool = False):
+        """
+        :param directory: directory of Showdown exports (see TeamPool), None to always use team_2
+        :param seed: seed of the random choice of the teams
+        :param round_robin: if True the teams are used in turn instead of randomly
+        """
+        if directory is None:
+            if RandomTeamFromPool._default_team is None:
+                RandomTeamFromPool._default_team = self.join_team(self.parse_showdown_team(self.team_2))
+            self.teams = [RandomTeamFromPool._default_team]
+        else:
+            self.teams = TeamPool.load(directory).teams
+        self.round_robin = round_robin
+        self._rng = random.Random(seed)
+        self._next = 0
 
     def yield_team(self):
-        #return np.random.choice(self.teams)
-        return self.teams[0]
+        if self.round_robin:
+            team = self.teams[self._next % len(self.teams)]
+            self._next += 1
+            return team
+        return self._rng.choice(self.teams)
 
 #custom_builder = RandomTeamFromPool([team_1])
\ No newline at end of file
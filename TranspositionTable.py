@@ -0,0 +1,133 @@
+"""
+Zobrist hashing of the search states of GameNode and a bounded transposition table:
+every (battler, HP bucket), (slot, battler), (battler, stat, boost) and field condition has a random 64 bit key,
+the key of a state is the xor of the keys of its parts so that a child updates it only for what changed
+"""
+import random
+from typing import NamedTuple, Optional
+
+# HP (in percentage) covered by a bucket: states with HPs in the same buckets share a slot, the values of an entry
+# are only used by the state with the same exact HPs (Entry.hp)
+HP_BUCKET = 2
+_HP_BUCKETS = 100 // HP_BUCKET + 1
+_MAX_BATTLERS = 12
+_BOOST_STATS = 5
+_BOOST_LEVELS = 13
+
+_rng = random.Random(0x5EED)
+
+
+def _random_key() -> int:
+    return _rng.getrandbits(64)
+
+
+HP_KEYS = [[_random_key() for _ in range(_HP_BUCKETS)] for _ in range(_MAX_BATTLERS)]
+# ACTIVE_KEYS[slot][row + 1], row -1 is an empty slot
+ACTIVE_KEYS = [[_random_key() for _ in range(_MAX_BATTLERS + 1)] for _ in range(4)]
+BOOST_KEYS = [[[_random_key() for _ in range(_BOOST_LEVELS)] for _ in range(_BOOST_STATS)]
+              for _ in range(_MAX_BATTLERS)]
+# weather, field and side condition -> key, filled the first time a condition is seen
+_condition_keys = {}
+
+
+def hp_bucket(hp: float) -> int:
+    """
+    :param hp: HP in percentage
+    :return: bucket of hp, 0 only if fainted
+    """
+    if hp <= 0:
+        return 0
+    return min(int(-(-hp // HP_BUCKET)), _HP_BUCKETS - 1)
+
+
+def condition_key(condition) -> int:
+    """
+    :param condition: weather, field or (side, side condition)
+    :return: key of condition
+    """
+    key = _condition_keys.get(condition)
+    if key is None:
+        key = _random_key()
+        _condition_keys[condition] = key
+    return key
+
+
+# =============================================================================
+# transposition table
+# =============================================================================
+EXACT, LOWER, UPPER = range(3)
+
+
+class Entry(NamedTuple):
+    key: int
+    depth: int
+    value: float
+    flag: int
+    best: Optional[tuple]
+    generation: int
+    # exact HPs of the state, the other states of the same buckets only read best
+    hp: Optional[tuple] = None
+
+
+class TranspositionTable:
+    """
+    fixed number of slots indexed by the low bits of the key. A slot is replaced when it is empty, holds the same
+    state, comes from an older search or was searched less deep than the new entry.
+    The rows of the battlers change from a turn to the next, so entries of older searches are never read
+    """
+
+    def __init__(self, size: int = 1 << 16):
+        """
+        :param size: number of entries, rounded up to a power of 2
+        """
+        self.size = 1 << max(size - 1, 0).bit_length()
+        self._mask = self.size - 1
+        self._slots = [None] * self.size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.rejected = 0
+
+    def new_search(self):
+        """
+        marks all the entries as old, so that they are replaced without being cleared
+        """
+        self.generation += 1
+
+    def get(self, key: int) -> Entry | None:
+        entry = self._slots[key & self._mask]
+        if entry is not None and entry.key == key and entry.generation == self.generation:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key: int, depth: int, value: float, flag: int, best=None, hp: tuple = None):
+        index = key & self._mask
+        old = self._slots[index]
+        if old is not None and old.key != key:
+            if old.generation == self.generation and old.depth > depth:
+                self.rejected += 1
+                return
+            self.evictions += 1
+        self._slots[index] = Entry(key, depth, value, flag, best, self.generation, hp)
+        self.stores += 1
+
+    def clear(self):
+        self._slots = [None] * self.size
+
+    def stats(self) -> dict:
+        """
+        :return: hits, misses, stores, evictions, rejected stores and hit rate
+        """
+        probes = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "rejected": self.rejected,
+            "hit_rate": self.hits / probes if probes else 0.0,
+        }
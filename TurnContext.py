@@ -0,0 +1,253 @@
+"""
+facts derived from the battle state that the stages of MoveHelper.default_choose_command need
+(speeds, damage, can_damage, opponent's best move, move targets), computed lazily and memoized
+for the whole turn, so that they are shared between the stages and the two active slots.
+The damage values are also kept across the turns of the battle (see DamageCache).
+Nothing is read from the battle before a fact needs it, so that a helper called without a context (the max damage
+players, external code) only pays for the facts it reads
+"""
+from collections import Counter
+from typing import List
+
+from poke_env.environment import Move, Pokemon, DoubleBattle
+
+import MoveUtilities
+from BattleSnapshot import BattleSnapshot
+from DamageCache import DamageCache
+from DamageMatrix import DamageMatrix
+from Instrumentation import Metrics
+
+_MISSING = object()
+
+
+class TurnContext:
+    battle: DoubleBattle
+    stage: str
+    metrics: Metrics | None
+    hits: Counter
+    misses: Counter
+
+    def __init__(self, battle: DoubleBattle):
+        self.battle = battle
+        self._snapshot = None
+        self.stage = "default"
+        # latency of the stages and stage of the final orders, None if not instrumented
+        self.metrics = None
+        # number of memoized facts reused / computed by each stage
+        self.hits = Counter()
+        self.misses = Counter()
+        self._damage_matrix = None
+        self._cache = {}
+        self._damage_cache = None
+
+    @staticmethod
+    def batch(battles: List[DoubleBattle]) -> List["TurnContext"]:
+        """
+        contexts of many battles whose DamageMatrix are built together (see DamageMatrix.batch)
+        :param battles:
+        :return:
+        """
+        contexts = [TurnContext(battle) for battle in battles]
+        matrices = DamageMatrix.batch(battles, [context.snapshot for context in contexts])
+        for context, matrix in zip(contexts, matrices):
+            context._damage_matrix = matrix
+        return contexts
+
+    def _memo(self, key, compute):
+        value = self._cache.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses[self.stage] += 1
+            value = compute()
+            self._cache[key] = value
+        else:
+            self.hits[self.stage] += 1
+        return value
+
+    @property
+    def snapshot(self) -> BattleSnapshot:
+        """
+        state of all the battlers, read the first time it is needed; the battle doesn't change during a decision
+        :return:
+        """
+        if self._snapshot is None:
+            self._snapshot = BattleSnapshot(self.battle)
+        return self._snapshot
+
+    @property
+    def damage_cache(self) -> DamageCache:
+        """
+        damage values of the battle, kept across the turns
+        :return:
+        """
+        if self._damage_cache is None:
+            self._damage_cache = DamageCache.of(self.battle)
+        return self._damage_cache
+
+    @property
+    def damage_matrix(self) -> DamageMatrix:
+        """
+        DamageMatrix of the turn, built the first time it is needed
+        :return:
+        """
+        if self._damage_matrix is None:
+            self._damage_matrix = DamageMatrix(self.battle, self.snapshot)
+        return self._damage_matrix
+
+    # =============================================================================
+    # memoized facts
+    # =============================================================================
+    def possible_targets(self, move: Move, battler: Pokemon) -> list:
+        """
+        same as battle.get_possible_showdown_targets(move, battler)
+        :param move:
+        :param battler:
+        :return:
+        """
+        return self._memo(("targets", move.id, id(battler)),
+                          lambda: self.battle.get_possible_showdown_targets(move, battler))
+
+    def speed(self, battler: Pokemon) -> float:
+        """
+        same as MoveUtilities.speed_calc(battler)
+        :param battler:
+        :return:
+        """
+        idx = self.snapshot.index_of(battler)
+        if idx is not None:
+            return float(self.snapshot.speed[idx])
+        return self._memo(("speed", id(battler)), lambda: MoveUtilities.speed_calc(battler))
+
+    def can_outspeed(self, battler: Pokemon, target: Pokemon) -> bool:
+        """
+        same as MoveUtilities.can_outspeed(battle, battler, target)
+        :param battler:
+        :param target:
+        :return:
+        """
+        i = self.snapshot.index_of(battler)
+        j = self.snapshot.index_of(target)
+        if i is not None and j is not None:
+            return self.snapshot.speed_order.outspeeds(i, j)
+        res = self.speed(battler) > self.speed(target)
+        if self.snapshot.trick_room:
+            return not res
+        return res
+
+    def base_damage(self, move: Move, user: Pokemon, target: Pokemon) -> float:
+        """
+        same as MoveUtilities.move_base_damage(move, user, target)
+        :param move:
+        :param user:
+        :param target:
+        :return:
+        """
+        return self._memo(("base_damage", move.id, id(user), id(target)),
+                          lambda: MoveUtilities.move_base_damage(move, user, target))
+
+    def is_move_immune(self, move: Move, user: Pokemon, target: Pokemon) -> bool:
+        """
+        same as MoveUtilities.is_move_immune(move, user, target)
+        :param move:
+        :param user:
+        :param target:
+        :return:
+        """
+        return self._memo(("immune", move.id, id(user), id(target)),
+                          lambda: MoveUtilities.is_move_immune(move, user, target))
+
+    def accuracy(self, move: Move, user: Pokemon, target: Pokemon) -> float:
+        """
+        same as MoveUtilities.rough_accuracy(move, user, target)
+        :param move:
+        :param user:
+        :param target:
+        :return:
+        """
+        return self._memo(("accuracy", move.id, id(user), id(target)),
+                          lambda: MoveUtilities.rough_accuracy(move, user, target))
+
+    def damage(self, move: Move, user: Pokemon, target: Pokemon, opponent_prospective=False) -> float:
+        """
+        same as MoveUtilities.calculate_damage(move, user, target, battle, opponent_prospective)
+        :param move:
+        :param user:
+        :param target:
+        :param opponent_prospective:
+        :return:
+        """
+        # a DamageMatrix already built (TurnContext.batch, search) is read directly, a lookup costs less than the
+        # key of the cache. Otherwise the values missing from the cache of the battle are computed by the scalar
+        # formula: it returns the same value, and the few values missing in a turn cost less than the matrix
+        if self._damage_matrix is not None:
+            damage = self._damage_matrix.raw_damage(move, user, target, opponent_prospective)
+            if damage is not None:
+                return damage
+        return self._memo(("damage", move.id, id(user), id(target), opponent_prospective),
+                          lambda: self.damage_cache.lookup(
+                              DamageCache.key("damage", move, user, target, self.battle, opponent_prospective),
+                              lambda: MoveUtilities.calculate_damage(move, user, target, self.battle,
+                                                                     opponent_prospective, self._damage_matrix)))
+
+    def percentage_damage(self, move: Move, user: Pokemon, target: Pokemon, opponent_prospective=False) -> float:
+        """
+        same as MoveUtilities.calculate_percentage_damage(move, user, target, battle, opponent_prospective)
+        :param move:
+        :param user:
+        :param target:
+        :param opponent_prospective:
+        :return:
+        """
+        # see damage
+        if self._damage_matrix is not None:
+            damage = self._damage_matrix.percentage_damage(move, user, target, opponent_prospective)
+            if damage is not None:
+                return damage
+        return self._memo(("percentage", move.id, id(user), id(target), opponent_prospective),
+                          lambda: self.damage_cache.lookup(
+                              DamageCache.key("percentage", move, user, target, self.battle, opponent_prospective),
+                              lambda: MoveUtilities.calculate_percentage_damage(move, user, target, self.battle,
+                                                                                opponent_prospective,
+                                                                                self._damage_matrix)))
+
+    def move_can_ko(self, move: Move, user: Pokemon, target: Pokemon, opponent_prospective=False) -> bool:
+        """
+        same as MoveUtilities.move_can_ko(move, user, target, battle, opponent_prospective)
+        :param move:
+        :param user:
+        :param target:
+        :param opponent_prospective:
+        :return:
+        """
+        damage = self.percentage_damage(move, user, target, opponent_prospective)
+        return damage >= target.current_hp_fraction * 100
+
+    def can_damage(self, battler: Pokemon, target: Pokemon) -> bool:
+        """
+        same as MoveUtilities.can_damage(battler, target)
+        :param battler:
+        :param target:
+        :return:
+        """
+        # the matrix is read only if already built, the scalar can_damage returns the same value
+        return self._memo(("can_damage", id(battler), id(target)),
+                          lambda: MoveUtilities.can_damage(battler, target, self._damage_matrix))
+
+    def opponent_max_damage_move(self, my_mon: Pokemon, opponent: Pokemon) -> (Move, int):
+        """
+        same as MoveUtilities.get_opponent_max_damage_move(battle, my_mon, opponent)
+        :param my_mon:
+        :param opponent:
+        :return:
+        """
+        return self._memo(("opponent_max_damage", id(my_mon), id(opponent)),
+                          lambda: self._opponent_max_damage_move(my_mon, opponent))
+
+    def _opponent_max_damage_move(self, my_mon: Pokemon, opponent: Pokemon) -> (Move, int):
+        max_move = None
+        max_damage = 0
+        for move in opponent.moves.values():
+            damage = self.percentage_damage(move, opponent, my_mon, opponent_prospective=True)
+            if damage > max_damage:
+                max_damage = damage
+                max_move = move
+        return max_move, max_damage
@@ -0,0 +1,93 @@
+"""
+precomputed gen 8 type chart: every type (and every pair of types) is mapped to a small integer,
+so that type effectiveness is read with array indexing instead of Pokemon.damage_multiplier
+"""
+from typing import List, Optional
+
+import numpy as np
+from poke_env.data import GenData
+from poke_env.environment import Move, Pokemon
+from poke_env.environment.pokemon_type import PokemonType
+
+TYPES = list(PokemonType)
+TYPE_ID = {pokemon_type: i for i, pokemon_type in enumerate(TYPES)}
+N_TYPES = len(TYPES)
+# id used for a missing type (the second type of a single typed Pokémon)
+NO_TYPE = N_TYPES
+
+# CHART[defending type, attacking type], the NO_TYPE row is neutral to everything
+CHART = np.ones((N_TYPES + 1, N_TYPES))
+CHART[:N_TYPES] = [[GenData.from_gen(8).type_chart[defending.name][attacking.name] for attacking in TYPES]
+                   for defending in TYPES]
+
+# DUAL_CHART[first type, second type, attacking type]: defensive row of every type combination
+DUAL_CHART = CHART[:, None, :] * CHART[None, :, :]
+
+# same table as nested lists, faster than NumPy when reading a single value
+_DUAL_ROWS = DUAL_CHART.tolist()
+
+
+def type_id(pokemon_type: Optional[PokemonType]) -> int:
+    """
+    :param pokemon_type:
+    :return: id of pokemon_type, NO_TYPE if None
+    """
+    if pokemon_type is None:
+        return NO_TYPE
+    return TYPE_ID[pokemon_type]
+
+
+def type_ids(pokemon: Pokemon) -> (int, int):
+    """
+    :param pokemon:
+    :return: ids of the two types of pokemon
+    """
+    return type_id(pokemon.type_1), type_id(pokemon.type_2)
+
+
+def defensive_row(pokemon: Pokemon) -> np.ndarray:
+    """
+    :param pokemon:
+    :return: damage multiplier of every attacking type on pokemon
+    """
+    type_1, type_2 = type_ids(pokemon)
+    return DUAL_CHART[type_1, type_2]
+
+
+def damage_multiplier(pokemon: Pokemon, type_or_move) -> float:
+    """
+    same as pokemon.damage_multiplier(type_or_move)
+    :param pokemon: defending Pokémon
+    :param type_or_move: PokemonType or Move
+    :return:
+    """
+    if isinstance(type_or_move, Move):
+        type_or_move = type_or_move.type
+    if not isinstance(type_or_move, PokemonType):
+        return 1
+    type_1, type_2 = type_ids(pokemon)
+    return _DUAL_ROWS[type_1][type_2][TYPE_ID[type_or_move]]
+
+
+def offensive_matrix(attackers: List[Pokemon], defenders: List[Pokemon]) -> np.ndarray:
+    """
+    :param attackers:
+    :param defenders:
+    :return: matrix[i, j] = best multiplier of the types of attackers[i] on defenders[j]
+    """
+    attacking = np.array([type_ids(mon) for mon in attackers], dtype=int).reshape(-1, 2)
+    defending = np.array([type_ids(mon) for mon in defenders], dtype=int).reshape(-1, 2)
+    # rows[j, t]: multiplier of attacking type t on defenders[j], -inf for the missing types
+    rows = np.full((len(defenders), N_TYPES + 1), -np.inf)
+    rows[:, :N_TYPES] = DUAL_CHART[defending[:, 0], defending[:, 1]]
+    return rows[:, attacking].max(axis=2).T
+
+
+def teampreview_performance(team: List[Pokemon], opponents: List[Pokemon]) -> np.ndarray:
+    """
+    type advantage of each Pokémon of team against each of the opponents
+    :param team:
+    :param opponents:
+    :return: matrix[i, j] = team[i]'s best multiplier on opponents[j] - opponents[j]'s best multiplier on team[i]
+    """
+    return offensive_matrix(team, opponents) - offensive_matrix(opponents, team).T
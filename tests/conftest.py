@@ -0,0 +1,28 @@
+"""
+shared fixtures of the tests: the modules are at the root of the repository and the battles are the ones of the
+micro benchmarks (Benchmarks.build_fixtures), seeded local battles that are the same at every run
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Benchmarks  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def battles():
+    """
+    :return: the battles seen by both sides at each request of the fixture battles, don't modify them
+    """
+    return Benchmarks.build_fixtures()
+
+
+@pytest.fixture(scope="session")
+def move_battles(battles):
+    """
+    :return: the fixture battles where no slot has to switch
+    """
+    return [battle for battle in battles if not any(battle.force_switch)]
@@ -0,0 +1,96 @@
+import asyncio
+import random
+import time
+
+import numpy as np
+import pytest
+
+import Benchmarks
+from BatchScheduler import BatchScheduler, decide_all
+from DamageCache import DamageCache
+from DoublesSmartPlayer import DoublesSmartPlayer
+from MatchupMatrix import MatchupMatrix
+
+
+class _Player:
+    """
+    records the battles it decides, their order is their tag
+    """
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.decided = []
+
+    def decide(self, battle, context=None, started=None):
+        if self.fail:
+            raise ValueError("no order")
+        self.decided.append(battle.battle_tag)
+        return battle.battle_tag
+
+
+def _reset(battles):
+    random.seed(0)
+    np.random.seed(0)
+    for battle in battles:
+        DamageCache.drop(battle)
+        MatchupMatrix.drop(battle)
+
+
+def _choose_all(scheduler, requests, timeout=5, return_exceptions=False):
+    async def run():
+        return await asyncio.wait_for(asyncio.gather(*[scheduler.choose_move(player, battle)
+                                                       for player, battle in requests],
+                                                     return_exceptions=return_exceptions), timeout)
+
+    return asyncio.run(run())
+
+
+def test_same_orders_of_decide(move_battles):
+    battles = move_battles[:8]
+    player = Benchmarks._make_player(DoublesSmartPlayer, "batch-parity")
+    _reset(battles)
+    expected = [player.decide(battle).message for battle in battles]
+    _reset(battles)
+    assert [order.message for order in decide_all(player, battles)] == expected
+    scheduler = BatchScheduler(window=0.01)
+    _reset(battles)
+    orders = _choose_all(scheduler, [(player, battle) for battle in battles])
+    scheduler.shutdown()
+    assert [order.message for order in orders] == expected
+    assert scheduler.stats() == {"batches": 1, "decisions": len(battles), "mean_batch": len(battles)}
+    assert player.metrics.snapshot()["latency"]["batched_choose_move"]["count"] == len(battles)
+
+
+def test_requests_grouped_by_player(move_battles):
+    players = [_Player(), _Player()]
+    requests = [(players[k % 2], battle) for k, battle in enumerate(move_battles[:6])]
+    scheduler = BatchScheduler(window=0.01)
+    orders = _choose_all(scheduler, requests)
+    scheduler.shutdown()
+    # each request gets the order of its own battle
+    assert orders == [battle.battle_tag for _, battle in requests]
+    assert scheduler.stats()["batches"] == 2
+    assert players[0].decided == [battle.battle_tag for battle in move_battles[0:6:2]]
+
+
+def test_full_batch_sent_without_waiting_the_window(move_battles):
+    player = _Player()
+    scheduler = BatchScheduler(window=60, max_batch=3)
+    start = time.perf_counter()
+    orders = _choose_all(scheduler, [(player, battle) for battle in move_battles[:3]])
+    scheduler.shutdown()
+    assert orders == player.decided == [battle.battle_tag for battle in move_battles[:3]]
+    assert time.perf_counter() - start < 5
+    assert scheduler._timer is None
+    assert scheduler.stats()["batches"] == 1
+
+
+def test_exception_given_to_every_request(move_battles):
+    player = _Player(fail=True)
+    scheduler = BatchScheduler(window=0.01)
+    results = _choose_all(scheduler, [(player, battle) for battle in move_battles[:3]], return_exceptions=True)
+    scheduler.shutdown()
+    assert len(results) == 3
+    for result in results:
+        with pytest.raises(ValueError, match="no order"):
+            raise result
+    assert scheduler.stats()["batches"] == 0
@@ -0,0 +1,83 @@
+import copy
+
+import DamageCache as DamageCacheModule
+import MoveUtilities
+from DamageCache import DamageCache
+
+
+def _cells(battle):
+    """
+    :return: (move, user, target, opponent_prospective) of the moves of the active Pokémon on the active Pokémon
+    """
+    ours = [mon for mon in battle.active_pokemon if mon is not None]
+    theirs = [mon for mon in battle.opponent_active_pokemon if mon is not None]
+    for user in ours + theirs:
+        for move in user.moves.values():
+            for target in ours + theirs:
+                if target is not user:
+                    yield move, user, target, target in ours
+
+
+def test_same_key_same_value(battles):
+    values = {}
+    for battle in battles:
+        for move, user, target, opponent_prospective in _cells(battle):
+            for kind, function in (("percentage", MoveUtilities.calculate_percentage_damage),
+                                   ("damage", MoveUtilities.calculate_damage)):
+                key = DamageCache.key(kind, move, user, target, battle, opponent_prospective)
+                value = function(move, user, target, battle, opponent_prospective)
+                assert values.setdefault(key, value) == value
+    # the same hits are traded turn after turn
+    assert len(values) < 2 * sum(1 for battle in battles for _ in _cells(battle))
+
+
+def test_cached_values_same_of_the_formula(battles):
+    cache = DamageCache()
+    for battle in battles:
+        for move, user, target, opponent_prospective in _cells(battle):
+            assert MoveUtilities.calculate_percentage_damage(move, user, target, battle, opponent_prospective,
+                                                             cache=cache) == \
+                MoveUtilities.calculate_percentage_damage(move, user, target, battle, opponent_prospective)
+    assert cache.hits > 0
+
+
+def test_key_reads_only_the_boosts_of_the_move(battles):
+    battle, (move, user, target, opponent_prospective) = next(
+        (battle, cell) for battle in battles for cell in _cells(battle)
+        if DamageCacheModule.read_stats(cell[0]) == (("atk",), ("def",)))
+    key = DamageCache.key("damage", move, user, target, battle, opponent_prospective)
+    user = copy.deepcopy(user)
+    user._boosts["spa"] += 1
+    user._boosts["spe"] += 1
+    assert DamageCache.key("damage", move, user, target, battle, opponent_prospective) == key
+    user._boosts["atk"] += 1
+    assert DamageCache.key("damage", move, user, target, battle, opponent_prospective) != key
+    target = copy.deepcopy(target)
+    target._boosts["def"] -= 1
+    assert DamageCache.key("damage", move, user, target, battle, opponent_prospective) != key
+    assert DamageCache.key("percentage", move, user, target, battle, opponent_prospective) != \
+        DamageCache.key("damage", move, user, target, battle, opponent_prospective)
+
+
+def test_least_recently_used_evicted():
+    cache = DamageCache(max_size=2)
+    cache.lookup(1, lambda: 1.0)
+    cache.lookup(2, lambda: 2.0)
+    assert cache.lookup(1, lambda: -1.0) == 1.0
+    cache.lookup(3, lambda: 3.0)
+    assert len(cache) == 2
+    assert cache.lookup(2, lambda: -2.0) == -2.0
+    assert cache.stats() == {"hits": 1, "misses": 4, "evictions": 2, "size": 2}
+
+
+def test_drop(battles):
+    battle = battles[0]
+    cache = DamageCache.of(battle)
+    assert DamageCache.of(battle) is cache
+    cache.lookup(1, lambda: 1.0)
+    before = DamageCacheModule.totals()["misses"]
+    assert DamageCache.drop(battle) is cache
+    assert DamageCacheModule.totals()["misses"] == before
+    assert DamageCache.drop(battle) is None
+    assert DamageCache.of(battle) is not cache
+    DamageCache.drop(battle)
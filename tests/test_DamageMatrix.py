@@ -0,0 +1,54 @@
+import MoveUtilities
+from DamageMatrix import DamageMatrix
+
+
+def _cells(battle, matrix):
+    """
+    :return: (move, user, target, opponent_prospective) of every cell of the matrix
+    """
+    team = [mon for mon in battle.team.values()]
+    for user, moves in zip(matrix.battlers, matrix.moves):
+        if user is None:
+            continue
+        for move in moves:
+            for target in matrix.battlers:
+                if target is not None:
+                    yield move, user, target, any(target is mon for mon in team)
+
+
+def test_same_values_of_the_scalar_path(battles):
+    cells = 0
+    for battle in battles:
+        matrix = DamageMatrix(battle)
+        for move, user, target, opponent_prospective in _cells(battle, matrix):
+            assert matrix.percentage_damage(move, user, target, opponent_prospective) == \
+                MoveUtilities.calculate_percentage_damage(move, user, target, battle, opponent_prospective)
+            assert matrix.raw_damage(move, user, target, opponent_prospective) == \
+                MoveUtilities.calculate_damage(move, user, target, battle, opponent_prospective)
+            cells += 1
+    assert cells > 0
+
+
+def test_can_damage(battles):
+    for battle in battles:
+        matrix = DamageMatrix(battle)
+        for user in matrix.battlers:
+            for target in matrix.battlers:
+                if user is not None and target is not None:
+                    assert matrix.can_damage(user, target) in (None, MoveUtilities.can_damage(user, target))
+
+
+def test_batch_same_of_one_battle_at_a_time(battles):
+    for batched, battle in zip(DamageMatrix.batch(battles), battles):
+        single = DamageMatrix(battle)
+        assert (batched.damage == single.damage).all()
+        assert (batched.percentage == single.percentage).all()
+
+
+def test_other_side_of_the_screens_not_in_the_matrix(battles):
+    # the scalar functions take the screens of the side given by opponent_prospective, the matrix only has the
+    # ones of the side of the target
+    battle = battles[0]
+    matrix = DamageMatrix(battle)
+    for move, user, target, opponent_prospective in _cells(battle, matrix):
+        assert matrix.percentage_damage(move, user, target, not opponent_prospective) is None
@@ -0,0 +1,74 @@
+import pickle
+import random
+import time
+
+import pytest
+from poke_env.player.battle_order import DefaultBattleOrder
+
+import Benchmarks
+import DecisionPool
+from DoublesSearchPlayer import DoublesSearchPlayer
+from DoublesSmartPlayer import DoublesSmartPlayer
+
+
+class _Player:
+    # records the arguments of decide
+    def __init__(self):
+        self.started = []
+
+    def decide(self, battle, context=None, started=None):
+        self.started.append(started)
+        return DefaultBattleOrder()
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    """
+    :return: function setting the player of the worker state of this process
+    """
+    monkeypatch.setattr(DecisionPool, "_caches", DecisionPool.OrderedDict())
+
+    def set_player(player):
+        monkeypatch.setattr(DecisionPool, "_player", player)
+        return player
+
+    return set_player
+
+
+def test_round_trip_same_decision(move_battles):
+    player = Benchmarks._make_player(DoublesSmartPlayer, "pool-smart")
+    for battle in move_battles[::4]:
+        data = DecisionPool.dumps_battle(battle)
+        copy = DecisionPool.loads_battle(data)
+        # the tables of poke_env are not in the data, the copy shares the ones of the process
+        assert copy._data is battle._data
+        assert len(data) < len(pickle.dumps(battle)) / 4
+        random.seed(0)
+        expected = player.decide(battle).message
+        random.seed(0)
+        assert player.decide(copy).message == expected
+
+
+def test_time_limit_counts_from_the_arrival(move_battles, worker):
+    player = worker(_Player())
+    data = DecisionPool.dumps_battle(move_battles[0])
+    before = time.perf_counter()
+    DecisionPool._decide(data, time.time() - 0.5)
+    assert before - 0.5 - 0.05 < player.started[0] < time.perf_counter() - 0.5 + 0.05
+
+
+def test_late_request_falls_back_to_max_damage(move_battles, worker):
+    player = worker(Benchmarks._make_player(DoublesSearchPlayer, "pool-search", time_limit=0.2))
+    DecisionPool._decide(DecisionPool.dumps_battle(move_battles[0]), time.time() - 1)
+    assert player.metrics.outcomes["max_damage_fallback"] == 1
+
+
+def test_cache_of_the_battle_kept_between_turns(move_battles, worker):
+    worker(_Player())
+    data = DecisionPool.dumps_battle(move_battles[0])
+    DecisionPool._decide(data, time.time())
+    cache = DecisionPool._caches[move_battles[0].battle_tag]
+    # an empty cache is still the cache of the battle
+    assert len(cache) == 0
+    DecisionPool._decide(data, time.time())
+    assert DecisionPool._caches[move_battles[0].battle_tag] is cache
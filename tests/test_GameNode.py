@@ -0,0 +1,62 @@
+import GameNode
+from GameNode import MOVE, SWITCH, ROLLS
+from TurnContext import TurnContext
+
+
+def _roots(battles, count=None):
+    return [GameNode.GameNode.root(TurnContext(battle)) for battle in battles[:count]]
+
+
+def _expectiminimax(node, depth):
+    # the search without pruning
+    if depth == 0 or node.is_terminal():
+        return node.evaluate()
+    return max(min(sum(probability * _expectiminimax(node.child(ours + theirs, roll), depth - 1)
+                       for roll, probability in ROLLS)
+                   for theirs in node.joint_actions(opponent=True))
+               for ours in node.joint_actions())
+
+
+def test_incremental_key_same_of_the_full_key(move_battles):
+    for root in _roots(move_battles, 20):
+        for ours in root.joint_actions()[:4]:
+            for theirs in root.joint_actions(opponent=True)[:4]:
+                for roll, _ in ROLLS:
+                    child = root.child(ours + theirs, roll)
+                    assert child.key == GameNode.GameNode(root.space, child.hp, child.active).key
+
+
+def test_alpha_beta_same_value_of_expectiminimax(move_battles):
+    for root in _roots(move_battles, 20):
+        _, value = GameNode.search(root, 1)
+        assert abs(value - _expectiminimax(root, 1)) < 1e-9
+    # positions where the opponent has a choice, its moves are revealed during the battle
+    roots = [root for root in _roots(move_battles) if len(root.joint_actions(opponent=True)) > 1]
+    for root in roots[:3]:
+        _, value = GameNode.search(root, 2)
+        assert abs(value - _expectiminimax(root, 2)) < 1e-9
+
+
+def test_joint_actions(move_battles):
+    for root in _roots(move_battles):
+        joint_actions = root.joint_actions()
+        assert joint_actions
+        for first, second in joint_actions:
+            # the two slots never switch to the same Pokémon
+            assert not (first[0] == SWITCH and second[0] == SWITCH and first[2] == second[2])
+            for kind, slot, value, target_slot in (first, second):
+                if kind == MOVE and target_slot >= 0:
+                    assert target_slot in (2, 3)
+
+
+def test_child_hp_in_range(move_battles):
+    for root in _roots(move_battles, 20):
+        for ours in root.joint_actions():
+            for theirs in root.joint_actions(opponent=True):
+                child = root.child(ours + theirs, 1.0)
+                assert all(0 <= hp <= before for hp, before in zip(child.hp, root.hp))
+
+
+def test_no_depth_completed_after_the_deadline(move_battles):
+    root = GameNode.GameNode.root(TurnContext(move_battles[0]), deadline=0)
+    assert GameNode.iterative_search(root, 2) == (None, 0, 0)
@@ -0,0 +1,55 @@
+import math
+import random
+
+import Instrumentation
+from Instrumentation import LatencyHistogram, Metrics
+
+
+def test_bucket_bounds():
+    previous = 0
+    for microseconds in range(200000):
+        bucket = Instrumentation._bucket(microseconds)
+        # the buckets follow the values and each one holds the values below its upper bound
+        assert bucket in (previous, previous + 1)
+        assert microseconds < Instrumentation._upper_bound(bucket)
+        if bucket:
+            lower = Instrumentation._upper_bound(bucket - 1)
+            assert lower <= microseconds
+            assert Instrumentation._upper_bound(bucket) <= max(1.25 * lower, lower + 1)
+        previous = bucket
+
+
+def test_percentile_at_most_25_percent_above():
+    rng = random.Random(0)
+    histogram = LatencyHistogram()
+    latencies = [rng.lognormvariate(-6, 1.5) for _ in range(5000)]
+    for seconds in latencies:
+        histogram.record(seconds)
+    latencies.sort()
+    for q in (1, 10, 50, 90, 99, 99.9):
+        exact = latencies[math.ceil(q / 100 * len(latencies)) - 1]
+        assert exact - 1e-6 <= histogram.percentile(q) <= 1.25 * exact + 1e-6
+    assert histogram.percentile(100) == max(latencies)
+    assert histogram.summary()["count"] == len(latencies)
+
+
+def test_percentile_capped_at_the_maximum():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0.0
+    histogram.record(0.0101)
+    # the upper bound of the bucket of 10100 microseconds is 10240
+    assert histogram.percentile(50) == 0.0101
+    assert histogram.percentile(0) == 0.0101
+
+
+def test_metrics_snapshot_and_reset():
+    metrics = Metrics("player")
+    metrics.record("choose_move", 0.002)
+    metrics.record("choose_move", 0.004)
+    metrics.outcome("max_damage")
+    snapshot = metrics.snapshot()
+    assert snapshot["latency"]["choose_move"]["count"] == 2
+    assert snapshot["latency"]["choose_move"]["max_ms"] == 4
+    assert snapshot["outcomes"] == {"max_damage": 1}
+    metrics.reset()
+    assert metrics.snapshot() == {"name": "player", "latency": {}, "outcomes": {}}
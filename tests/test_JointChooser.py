@@ -0,0 +1,74 @@
+import random
+
+import JointChooser
+from JointChooser import SlotOption
+from TurnContext import TurnContext
+
+
+def _random_options(rng: random.Random, count: int):
+    options = []
+    for _ in range(count):
+        damage = tuple(rng.choice([0.0, rng.uniform(0, 160)]) for _ in range(2))
+        options.append(SlotOption(None, rng.uniform(0, 300), damage, rng.choice([1.0, 0.5])))
+    return options
+
+
+def _preferred(first, second, threshold):
+    """
+    :return: the pairs choose_joint_moves picks from, without pruning
+    """
+    pairs = [(JointChooser.pair_score(option_1, option_2), option_1, option_2) for option_1 in first
+             for option_2 in second]
+    max_score = max(score for score, _, _ in pairs)
+    return [(option_1, option_2) for score, option_1, option_2 in pairs
+            if score >= threshold or score >= max_score * 0.8]
+
+
+def _assert_prune_keeps_the_preferred_pairs(first, second, threshold):
+    kept_1, kept_2 = JointChooser.prune(first, second, threshold)
+    for option_1, option_2 in _preferred(first, second, threshold):
+        assert option_1 in kept_1 and option_2 in kept_2
+
+
+def test_pair_score_bounds():
+    rng = random.Random(0)
+    for _ in range(2000):
+        first, second = _random_options(rng, 2)
+        total = first.score + second.score
+        score = JointChooser.pair_score(first, second)
+        assert total - min(first.max_loss, second.max_loss) - 1e-9 <= score
+        assert score <= total + min(first.max_gain, second.max_gain) + 1e-9
+
+
+def test_prune_keeps_the_preferred_pairs():
+    rng = random.Random(1)
+    for _ in range(500):
+        _assert_prune_keeps_the_preferred_pairs(_random_options(rng, rng.randint(1, 12)),
+                                                _random_options(rng, rng.randint(1, 12)), rng.choice([200, 400]))
+
+
+def test_prune_on_the_fixtures(move_battles):
+    pruned = 0
+    for battle in move_battles:
+        context = TurnContext(battle)
+        options = [JointChooser.slot_options(battle, idx, context) if battle.active_pokemon[idx] is not None else []
+                   for idx in range(2)]
+        if not all(options):
+            continue
+        _assert_prune_keeps_the_preferred_pairs(*options, 400)
+        kept = JointChooser.prune(*options, 400)
+        pruned += len(options[0]) + len(options[1]) - len(kept[0]) - len(kept[1])
+    assert pruned > 0
+
+
+def test_choose_joint_moves(move_battles):
+    for battle in move_battles:
+        free = [idx for idx in range(2) if battle.active_pokemon[idx] is not None and battle.available_moves[idx]]
+        orders = JointChooser.choose_joint_moves(battle, [None, None], free)
+        if orders is None:
+            continue
+        for idx in range(2):
+            if idx in free:
+                assert orders[idx].order in battle.available_moves[idx]
+            else:
+                assert orders[idx] is None
@@ -0,0 +1,64 @@
+import pytest
+
+import Benchmarks
+import Ladder
+from DoublesMaxDamagePlayer import DoublesMaxDamagePlayer
+from DoublesRandomPlayer import DoubleRandomPlayer
+from Ladder import Rating
+
+
+def _ladder(ratings: dict, path=None) -> Ladder.Ladder:
+    ladder = Ladder.Ladder(path)
+    for name, (rating, rd) in ratings.items():
+        ladder.players[name] = None
+        ladder.ratings[name] = Rating(rating, rd)
+    return ladder
+
+
+def test_example_of_the_glicko_paper():
+    # g and expected scores of the example in Glickman, "The Glicko system"
+    player = Rating(1500, 200)
+    for opponent, g, expected in ((Rating(1400, 30), 0.9955, 0.639), (Rating(1550, 100), 0.9531, 0.432),
+                                  (Rating(1700, 300), 0.7242, 0.303)):
+        assert Ladder._g(opponent.rd) == pytest.approx(g, abs=1e-4)
+        assert player.expected_score(opponent) == pytest.approx(expected, abs=1e-3)
+
+
+def test_update():
+    ladder = _ladder({"a": (1500, 200), "b": (1500, 200)})
+    ladder.update("a", "b", 3, 1, 1)
+    a, b = ladder.ratings["a"], ladder.ratings["b"]
+    assert a.rating > 1500 > b.rating
+    assert a.rating - 1500 == pytest.approx(1500 - b.rating)
+    assert a.rd == pytest.approx(b.rd) and a.rd < 200
+    assert (a.wins, a.losses, a.ties) == (3, 1, 1)
+    assert (b.wins, b.losses, b.ties) == (1, 3, 1)
+
+
+def test_uncertain_close_players_are_paired_first():
+    ladder = _ladder({"new": (1500, 350), "close": (1550, 350), "far": (2200, 350)})
+    assert set(ladder.next_pairing()) == {"new", "close"}
+    ladder = _ladder({"settled": (1500, 50), "settled_too": (1500, 50), "new": (1500, 350)})
+    assert "new" in ladder.next_pairing()
+
+
+def test_deviations_grow_between_runs(tmp_path):
+    path = str(tmp_path / "ladder.json")
+    ladder = _ladder({"a": (1600, 40), "b": (1400, 349)}, path)
+    ladder.save()
+    loaded = Ladder.Ladder(path, rd_growth=30)
+    assert loaded.ratings["a"].rating == 1600
+    assert loaded.ratings["a"].rd == pytest.approx((40 ** 2 + 30 ** 2) ** 0.5)
+    assert loaded.ratings["b"].rd == Ladder.INITIAL_RD
+
+
+def test_local_run(tmp_path):
+    ladder = Ladder.Ladder(str(tmp_path / "ladder.json"))
+    for player in (Benchmarks._make_player(DoublesMaxDamagePlayer, "ladder-max-1"),
+                   Benchmarks._make_player(DoublesMaxDamagePlayer, "ladder-max-2"),
+                   Benchmarks._make_player(DoubleRandomPlayer, "ladder-random")):
+        ladder.register(player)
+    assert ladder.run(12, batch_size=4, target_rd=0, seed=1) == 12
+    assert sum(rating.battles for rating in ladder.ratings.values()) == 24
+    assert all(rating.rd < Ladder.INITIAL_RD for rating in ladder.ratings.values() if rating.battles)
+    assert set(Ladder.Ladder(ladder.path).ratings) == set(ladder.ratings)
@@ -0,0 +1,62 @@
+import copy
+
+from poke_env.environment import Field
+
+import Benchmarks
+import MatchupMatrix as MatchupMatrixModule
+import SwitchHelper
+from DoublesSmartPlayer import DoublesSmartPlayer
+from MatchupMatrix import MatchupMatrix
+from TurnContext import TurnContext
+
+
+def _read_all(matrix, battle, context):
+    my_mons = list(battle.team.values())
+    opponents = list(battle.opponent_team.values())
+    return my_mons, opponents, matrix.scores(my_mons, opponents, context)
+
+
+def test_scores_same_of_get_matchup_score_default(battles):
+    for battle in battles:
+        context = TurnContext(battle)
+        my_mons, opponents, scores = _read_all(MatchupMatrix(), battle, context)
+        for i, mon in enumerate(my_mons):
+            for j, opponent in enumerate(opponents):
+                assert scores[i, j] == SwitchHelper.get_matchup_score_default(battle, mon, opponent, context)
+
+
+def test_only_the_changed_entries_are_recomputed(battles):
+    battle = copy.deepcopy(next(battle for battle in battles if len(battle.opponent_team) >= 2))
+    matrix = MatchupMatrix()
+    my_mons, opponents, _ = _read_all(matrix, battle, TurnContext(battle))
+    assert matrix.computed == len(my_mons) * len(opponents)
+
+    # nothing changed: the next turn reads the matrix without recomputing
+    _read_all(matrix, battle, TurnContext(battle))
+    assert matrix.computed == len(my_mons) * len(opponents)
+
+    # a speed boost of one of our Pokémon changes its row only
+    computed = matrix.computed
+    my_mons[0]._boosts["spe"] += 2
+    _, _, scores = _read_all(matrix, battle, TurnContext(battle))
+    assert matrix.computed == computed + len(opponents)
+    context = TurnContext(battle)
+    assert [scores[0, j] for j in range(len(opponents))] == \
+        [SwitchHelper.get_matchup_score_default(battle, my_mons[0], opponent, context) for opponent in opponents]
+
+    # Trick Room changes every speed order
+    computed = matrix.computed
+    battle._fields[Field.TRICK_ROOM] = battle.turn
+    _read_all(matrix, battle, TurnContext(battle))
+    assert matrix.computed == computed + len(my_mons) * len(opponents)
+
+
+def test_matrix_dropped_when_the_battle_ends(battles):
+    player = Benchmarks._make_player(DoublesSmartPlayer, "matchup-drop")
+    battle = copy.deepcopy(battles[0])
+    matrix = MatchupMatrix.of(battle)
+    assert MatchupMatrix.of(battle) is matrix
+    player._battle_finished_callback(battle)
+    assert battle not in MatchupMatrixModule._MATRICES
+    assert MatchupMatrix.of(battle) is not matrix
+    MatchupMatrix.drop(battle)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import GameNode
+import MatrixGame
+from TurnContext import TurnContext
+
+
+def test_payoff_matrix_same_of_the_search(move_battles):
+    cells = 0
+    for battle in move_battles:
+        root = GameNode.GameNode.root(TurnContext(battle))
+        ours = root.joint_actions()
+        theirs = root.joint_actions(opponent=True)
+        payoff = MatrixGame.payoff_matrix(root, ours, theirs)
+        assert payoff.shape == (len(ours), len(theirs))
+        for i, our_actions in enumerate(ours):
+            for j, their_actions in enumerate(theirs):
+                expected = sum(probability * root.child(our_actions + their_actions, roll).evaluate()
+                               for roll, probability in GameNode.ROLLS)
+                assert payoff[i, j] == pytest.approx(expected, abs=1e-12)
+                cells += 1
+    assert cells > 0
+
+
+def test_rock_paper_scissors():
+    payoff = np.array([[0, -1, 1], [1, 0, -1], [-1, 1, 0]], dtype=float)
+    ours, theirs, value = MatrixGame.regret_matching(payoff, iterations=10000, tolerance=1e-4)
+    assert ours == pytest.approx(np.full(3, 1 / 3), abs=1e-2)
+    assert theirs == pytest.approx(np.full(3, 1 / 3), abs=1e-2)
+    assert value == pytest.approx(0, abs=1e-2)
+    assert MatrixGame.exploitability(payoff, ours, theirs) < 1e-4
+
+
+def test_mixed_equilibrium():
+    # we play the first row with probability 1/4, the opponent the first column with probability 1/2, value 1/2
+    payoff = np.array([[2, -1], [0, 1]], dtype=float)
+    ours, theirs, value = MatrixGame.regret_matching(payoff, iterations=10000, tolerance=1e-4)
+    assert ours == pytest.approx([0.25, 0.75], abs=1e-2)
+    assert theirs == pytest.approx([0.5, 0.5], abs=1e-2)
+    assert value == pytest.approx(0.5, abs=1e-2)
+
+
+def test_saddle_point():
+    payoff = np.array([[3, 1, 4], [2, 0, 1], [5, 2, 6]], dtype=float)
+    ours, theirs, value = MatrixGame.regret_matching(payoff)
+    assert ours.tolist() == [0, 0, 1]
+    assert theirs.tolist() == [0, 1, 0]
+    assert value == 2
+    assert MatrixGame.exploitability(payoff, ours, theirs) == 0
+
+
+def test_deadline():
+    payoff = np.random.default_rng(0).normal(size=(30, 30))
+    ours, theirs, _ = MatrixGame.regret_matching(payoff, iterations=10 ** 6, deadline=0, tolerance=0)
+    # stopped at the first check, the strategies are still distributions
+    assert ours.sum() == pytest.approx(1) and theirs.sum() == pytest.approx(1)
+    assert (ours >= 0).all() and (theirs >= 0).all()
+
+
+def test_solve(move_battles):
+    for battle in move_battles[:10]:
+        actions, strategy, _ = MatrixGame.solve(TurnContext(battle))
+        assert len(actions) == len(strategy)
+        assert strategy.sum() == pytest.approx(1)
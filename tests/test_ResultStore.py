@@ -0,0 +1,78 @@
+import json
+
+import Benchmarks
+import LocalSimulator
+from DoublesMaxDamagePlayer import DoublesMaxDamagePlayer
+from ResultStore import ResultStore
+
+
+def _record(player_1, player_2, winner):
+    return {"battle_tag": None, "player_1": player_1, "player_2": player_2, "team_1": None, "team_2": None,
+            "winner": winner, "turns": 1, "duration": None, "time": 0}
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as file:
+        return file.read().splitlines()
+
+
+def test_tallies_survive_a_reopen(tmp_path):
+    path = tmp_path / "results.jsonl"
+    with ResultStore(str(path)) as store:
+        store.append(_record("a", "b", "a"))
+        store.append(_record("b", "a", "a"))
+        store.append(_record("a", "c", None))
+    with ResultStore(str(path), read_only=True) as store:
+        assert store.records == 3
+        assert store.done("b", "a") == 2
+        assert store.table(["a", "b", "c"]) == {"a": {"a": None, "b": 1.0, "c": 0.0},
+                                                "b": {"a": 0.0, "b": None, "c": None},
+                                                "c": {"a": 0.0, "b": None, "c": None}}
+
+
+def test_bad_lines(tmp_path):
+    path = tmp_path / "results.jsonl"
+    lines = [json.dumps(_record("a", "b", "a")), "{not json", json.dumps(_record("a", "b", "b")),
+             json.dumps(_record("a", "b", "a"))[:20]]
+    path.write_text("\n".join(lines), encoding="utf-8")
+    with ResultStore(str(path)) as store:
+        # the unreadable line in the middle is skipped, the records after it are kept
+        assert store.records == 2
+        assert store.skipped == 1
+    # only the line cut at the end is removed
+    assert _lines(path) == lines[:3]
+
+
+def test_run_seed_of_the_first_run(tmp_path):
+    path = tmp_path / "results.jsonl"
+    with ResultStore(str(path)) as store:
+        assert store.run_seed(7) == 7
+        store.append(_record("a", "b", "a"))
+    with ResultStore(str(path)) as store:
+        assert store.run_seed(8) == 7
+        assert store.run_seed() == 7
+    with ResultStore(str(tmp_path / "other.jsonl")) as store:
+        assert store.run_seed() == store.run_seed(8)
+
+
+def test_resume_plays_the_missing_battles(tmp_path, monkeypatch):
+    seeds = []
+    local_battle = LocalSimulator.LocalBattle
+
+    def spying_local_battle(player, opponent, seed=None):
+        seeds.append(seed)
+        return local_battle(player, opponent, seed=seed)
+
+    monkeypatch.setattr(LocalSimulator, "LocalBattle", spying_local_battle)
+    players = [Benchmarks._make_player(DoublesMaxDamagePlayer, f"store-{i}") for i in range(2)]
+    path = tmp_path / "results.jsonl"
+    with ResultStore(str(path)) as store:
+        LocalSimulator.cross_evaluate(players, 4, store=store)
+    all_seeds, seeds[:] = list(seeds), []
+    assert len(all_seeds) == 4
+    # the run stopped after 1 battle
+    path.write_text("\n".join(_lines(path)[:2]) + "\n", encoding="utf-8")
+    with ResultStore(str(path)) as store:
+        LocalSimulator.cross_evaluate(players, 4, seed=123, store=store)
+        assert store.records == 4
+    assert seeds == all_seeds[1:]
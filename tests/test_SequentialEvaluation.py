@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+import Benchmarks
+import SequentialEvaluation
+from DoublesMaxDamagePlayer import DoublesMaxDamagePlayer
+from DoublesRandomPlayer import DoubleRandomPlayer
+from ResultStore import ResultStore
+from SequentialEvaluation import SPRT, ConfidenceStop, FIRST_STRONGER, SECOND_STRONGER, EQUAL
+
+
+def _verdicts(test, p, runs=300, batch_size=10, max_battles=200, seed=0):
+    """
+    :return: verdict of test on each of runs simulated pairs where the first player wins with probability p
+    """
+    rng = random.Random(seed)
+    verdicts = []
+    for _ in range(runs):
+        wins = losses = 0
+        verdict = None
+        while verdict is None and wins + losses < max_battles:
+            for _ in range(batch_size):
+                if rng.random() < p:
+                    wins += 1
+                else:
+                    losses += 1
+            verdict = test.decide(wins, losses)
+        verdicts.append(verdict)
+    return verdicts
+
+
+def test_sprt_verdicts():
+    test = SPRT()
+    assert test.decide(40, 0) == FIRST_STRONGER
+    assert test.decide(0, 40) == SECOND_STRONGER
+    assert test.decide(300, 300) == EQUAL
+    assert test.decide(3, 2) is None
+    # a tie is half a win for each player
+    assert test.decide(0, 0, 600) == EQUAL
+    for wins in range(0, 60, 7):
+        for losses in range(0, 60, 5):
+            verdict = test.decide(wins, losses)
+            assert test.decide(losses, wins) == (-verdict if verdict is not None else None)
+
+
+def test_sprt_error_rates():
+    # without a cap on the battles the errors are the alpha and beta of the test, 0.05 each
+    equal = _verdicts(SPRT(), 0.5, max_battles=10 ** 6)
+    assert (equal.count(FIRST_STRONGER) + equal.count(SECOND_STRONGER)) / len(equal) < 0.08
+    stronger = _verdicts(SPRT(), 0.6, max_battles=10 ** 6)
+    assert stronger.count(FIRST_STRONGER) / len(stronger) > 0.92
+    weaker = _verdicts(SPRT(), 0.4, max_battles=10 ** 6)
+    assert weaker.count(SECOND_STRONGER) / len(weaker) > 0.92
+
+
+def test_wilson_interval():
+    low, high = ConfidenceStop(confidence=0.95).interval(8, 10)
+    assert low == pytest.approx(0.4902, abs=1e-4)
+    assert high == pytest.approx(0.9433, abs=1e-4)
+
+
+def test_confidence_stop():
+    test = ConfidenceStop(min_battles=10)
+    assert test.decide(9, 0) is None
+    assert test.decide(30, 0) == FIRST_STRONGER
+    assert test.decide(0, 30) == SECOND_STRONGER
+    assert test.decide(1000, 1000) == EQUAL
+    assert test.decide(12, 8) is None
+
+
+def test_local_evaluation_stops_at_the_verdict(tmp_path):
+    players = [Benchmarks._make_player(DoublesMaxDamagePlayer, "sprt-max"),
+               Benchmarks._make_player(DoubleRandomPlayer, "sprt-random")]
+    with ResultStore(str(tmp_path / "results.jsonl")) as store:
+        _, pairs = SequentialEvaluation.sequential_cross_evaluate(players, max_battles=60, batch_size=10, seed=1,
+                                                                  store=store)
+        pair = pairs["sprt-max", "sprt-random"]
+        assert pair.battles == store.records <= 60
+        assert pair.battles % 10 == 0
+        assert pair.verdict == FIRST_STRONGER
+        # the battles in the store count, the pair is already decided
+        _, pairs = SequentialEvaluation.sequential_cross_evaluate(players, max_battles=60, batch_size=10,
+                                                                  store=store)
+        assert pairs["sprt-max", "sprt-random"].battles == pair.battles
+        assert store.records == pair.battles
@@ -0,0 +1,42 @@
+import json
+
+import ShardedEvaluation
+from DoublesMaxDamagePlayer import DoublesMaxDamagePlayer
+from DoublesRandomPlayer import DoubleRandomPlayer
+from ResultStore import ResultStore
+from ShardedEvaluation import PlayerSpec, Shard
+
+SPECS = [PlayerSpec(DoublesMaxDamagePlayer, "shard-max", {"battle_format": "gen8vgc2021"}),
+         PlayerSpec(DoubleRandomPlayer, "shard-random", {"battle_format": "gen8vgc2021"}),
+         PlayerSpec(DoubleRandomPlayer, "shard-random-2", {"battle_format": "gen8vgc2021"})]
+
+
+def test_shards_skip_the_battles_played():
+    shards = ShardedEvaluation.make_shards(2, 20, 10, seed=1)
+    resumed = ShardedEvaluation.make_shards(2, 20, 10, seed=1, done={(0, 1): 5})
+    assert resumed == [shards[0]._replace(skip=5), shards[1]]
+    assert ShardedEvaluation.make_shards(2, 20, 10, seed=1, done={(0, 1): 10}) == shards[1:]
+    # the shards don't depend on the number of workers
+    assert all(isinstance(shard, Shard) and shard.n_battles == 10 for shard in shards)
+
+
+def test_resumed_run_same_of_an_uninterrupted_one(tmp_path):
+    with ResultStore(str(tmp_path / "full.jsonl")) as store:
+        full = ShardedEvaluation.sharded_cross_evaluate(SPECS, 8, workers=2, batch_size=3, local=True, seed=4,
+                                                        store=store)
+    lines = (tmp_path / "full.jsonl").read_text(encoding="utf-8").splitlines()
+    # seed header and 10 battles: the first pair is done, the second one stopped in its second shard
+    (tmp_path / "resumed.jsonl").write_text("\n".join(lines[:11]) + "\n", encoding="utf-8")
+    with ResultStore(str(tmp_path / "resumed.jsonl")) as store:
+        resumed = ShardedEvaluation.sharded_cross_evaluate(SPECS, 8, workers=1, batch_size=3, local=True,
+                                                           store=store)
+        assert store.records == 24
+    assert resumed == full
+
+    def battles(path):
+        # the battle tags count the battles of each process
+        records = [json.loads(line) for line in (tmp_path / path).read_text(encoding="utf-8").splitlines()]
+        return sorted((record["player_1"], record["player_2"], record["team_1"], record["team_2"], record["winner"],
+                       record["turns"]) for record in records if "player_1" in record)
+
+    assert battles("resumed.jsonl") == battles("full.jsonl")
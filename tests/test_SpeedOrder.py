@@ -0,0 +1,72 @@
+import copy
+
+import numpy as np
+from poke_env.environment import Field, SideCondition, Status
+
+import MoveUtilities
+from BattleSnapshot import BattleSnapshot
+from SpeedOrder import SpeedOrder
+
+
+def _assert_same_of_can_outspeed(battle):
+    snapshot = BattleSnapshot(battle)
+    alive = [i for i in range(snapshot.n_alive) if snapshot.battlers[i] is not None]
+    for i in alive:
+        for j in alive:
+            assert snapshot.speed_order.outspeeds(i, j) == \
+                MoveUtilities.can_outspeed(battle, snapshot.battlers[i], snapshot.battlers[j])
+    return snapshot
+
+
+def test_same_order_of_can_outspeed(battles):
+    for battle in battles:
+        _assert_same_of_can_outspeed(battle)
+
+
+def test_trick_room_inverts_the_order():
+    speed = np.array([100.0, 50.0, 80.0, 50.0])
+    order = SpeedOrder(speed, trick_room=False)
+    assert order.order(range(4)) == [0, 2, 1, 3]
+    assert order.outspeeds(0, 1) and not order.outspeeds(1, 0)
+    # ties share a rank and neither side outspeeds the other
+    assert order.rank[1] == order.rank[3]
+    assert not order.outspeeds(1, 3) and not order.outspeeds(3, 1)
+    trick_room = SpeedOrder(speed, trick_room=True)
+    assert trick_room.order(range(4)) == [1, 3, 2, 0]
+    assert trick_room.outspeeds(1, 0) and not trick_room.outspeeds(0, 1)
+    assert trick_room.rank[1] == trick_room.rank[3]
+
+
+def test_trick_room_of_the_battle(battles):
+    battle = copy.deepcopy(battles[0])
+    battle._fields[Field.TRICK_ROOM] = battle.turn
+    snapshot = _assert_same_of_can_outspeed(battle)
+    assert snapshot.trick_room
+    fastest = max(range(4), key=lambda row: (snapshot.speed[row], row))
+    assert snapshot.speed_order.order(range(4))[-1] == fastest
+
+
+def test_paralysis_halves_the_speed(battles):
+    flipped = 0
+    for battle in battles:
+        before = BattleSnapshot(battle)
+        battle = copy.deepcopy(battle)
+        mon = battle.active_pokemon[0]
+        if mon is None or mon.status is not None:
+            continue
+        mon._status = Status.PAR
+        after = _assert_same_of_can_outspeed(battle)
+        assert after.speed[0] == before.speed[0] / 2
+        flipped += sum(before.speed_order.outspeeds(0, j) and not after.speed_order.outspeeds(0, j)
+                       for j in range(2, 4))
+    assert flipped > 0
+
+
+def test_tailwind_same_order_of_can_outspeed(battles):
+    # like MoveUtilities.speed_calc, the order doesn't double the speed of the side with Tailwind
+    for battle in battles[:10]:
+        before = BattleSnapshot(battle)
+        battle = copy.deepcopy(battle)
+        battle._side_conditions[SideCondition.TAILWIND] = battle.turn
+        after = _assert_same_of_can_outspeed(battle)
+        assert np.array_equal(after.speed, before.speed)
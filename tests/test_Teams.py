@@ -0,0 +1,87 @@
+import glob
+import os
+import shutil
+
+import pytest
+from poke_env.stats import compute_raw_stats
+from poke_env.teambuilder import Teambuilder
+
+import Teams
+from Teams import TeamPool, RandomTeamFromPool
+
+TEAMS_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "teams")
+
+
+@pytest.fixture
+def directory(tmp_path):
+    for path in glob.glob(os.path.join(TEAMS_DIRECTORY, "*.txt")):
+        shutil.copy(path, tmp_path)
+    return tmp_path
+
+
+def _packed(path) -> str:
+    with open(path, encoding="utf-8") as file:
+        return Teambuilder.join_team(Teambuilder.parse_showdown_team(file.read()))
+
+
+def test_pool(directory):
+    pool = TeamPool(str(directory))
+    assert [os.path.basename(path) for path in pool.files] == ["base_team.txt", "team_1.txt"]
+    assert pool.teams == [_packed(path) for path in pool.files]
+    assert os.path.exists(directory / Teams.CACHE_FILE)
+
+
+def test_cached_teams_are_not_parsed_again(directory, monkeypatch):
+    teams = TeamPool(str(directory)).teams
+
+    def parse_showdown_team(team):
+        raise AssertionError("parsed again")
+
+    monkeypatch.setattr(Teambuilder, "parse_showdown_team", parse_showdown_team)
+    assert TeamPool(str(directory)).teams == teams
+
+
+def test_changed_file_parsed_again(directory):
+    TeamPool(str(directory))
+    content = (directory / "team_1.txt").read_text(encoding="utf-8")
+    (directory / "team_1.txt").write_text(content.replace("Choice Band", "Life Orb", 1), encoding="utf-8")
+    assert "lifeorb" in TeamPool(str(directory)).teams[1]
+
+
+def test_unreadable_cache(directory):
+    teams = TeamPool(str(directory)).teams
+    cache = directory / Teams.CACHE_FILE
+    cache.write_text(cache.read_text(encoding="utf-8")[:30], encoding="utf-8")
+    assert TeamPool(str(directory)).teams == teams
+    cache.write_text("[]", encoding="utf-8")
+    assert TeamPool(str(directory)).teams == teams
+    # the cache is written again, without temporary files left behind
+    assert Teams._read_cache(str(cache))
+    assert not glob.glob(str(directory / "*.tmp"))
+
+
+def test_invalid_teams(directory, tmp_path_factory):
+    content = (directory / "team_1.txt").read_text(encoding="utf-8")
+    (directory / "team_1.txt").write_text(content.replace("Iron Head", "Not A Move"), encoding="utf-8")
+    with pytest.raises(ValueError, match="notamove"):
+        TeamPool(str(directory))
+    with pytest.raises(ValueError, match="no team"):
+        TeamPool(str(tmp_path_factory.mktemp("empty")))
+
+
+def test_stats():
+    for mon in Teams.unpack_team(_packed(os.path.join(TEAMS_DIRECTORY, "team_1.txt"))):
+        stats = Teams.compute_stats(mon)
+        assert [stats[stat] for stat in Teams.STATS] == compute_raw_stats(
+            mon["species"], mon["evs"], mon["ivs"], mon["level"], mon["nature"], Teams._DATA)
+
+
+def test_team_choice(directory):
+    pool = TeamPool.load(str(directory))
+    assert TeamPool.load(str(directory)) is pool
+    first = [RandomTeamFromPool(str(directory), seed=5).yield_team() for _ in range(3)]
+    assert len(set(first)) == 1
+    builder = RandomTeamFromPool(str(directory), round_robin=True)
+    assert [builder.yield_team() for _ in range(4)] == pool.teams * 2
+    assert RandomTeamFromPool().yield_team() == Teambuilder.join_team(
+        Teambuilder.parse_showdown_team(RandomTeamFromPool.team_2))
@@ -0,0 +1,62 @@
+import GameNode
+import TranspositionTable
+from TranspositionTable import EXACT, LOWER, TranspositionTable as Table
+from TurnContext import TurnContext
+
+
+def test_hp_bucket():
+    assert TranspositionTable.hp_bucket(0) == 0
+    assert TranspositionTable.hp_bucket(-3) == 0
+    # only fainted battlers are in the bucket 0
+    assert TranspositionTable.hp_bucket(0.01) == 1
+    assert TranspositionTable.hp_bucket(TranspositionTable.HP_BUCKET) == 1
+    assert TranspositionTable.hp_bucket(100) == 100 // TranspositionTable.HP_BUCKET
+
+
+def test_size_rounded_up_to_a_power_of_2():
+    assert Table(1000).size == 1024
+    assert Table(1).size == 1
+
+
+def test_replacement():
+    table = Table(4)
+    table.store(1, 2, 0.5, EXACT)
+    assert table.get(1).value == 0.5
+    # a shallower entry of another state doesn't replace a deeper one of the same search
+    table.store(5, 1, 0.7, EXACT)
+    assert table.rejected == 1 and table.get(1) is not None and table.get(5) is None
+    table.store(5, 3, 0.7, LOWER)
+    assert table.evictions == 1 and table.get(1) is None and table.get(5).flag == LOWER
+
+
+def test_entries_of_older_searches_are_not_read():
+    table = Table(4)
+    table.store(1, 5, 0.5, EXACT)
+    table.new_search()
+    assert table.get(1) is None
+    table.store(5, 1, 0.7, EXACT)
+    assert table.get(5).value == 0.7
+
+
+def test_search_same_value_with_and_without_the_table(move_battles):
+    # at depth 2 no entry is searched deeper than the node reading it, so the table only saves work
+    table = Table(1 << 12)
+    for battle in move_battles[:30]:
+        context = TurnContext(battle)
+        table.new_search()
+        _, with_table = GameNode.search(GameNode.GameNode.root(context, table=table), 2)
+        _, without_table = GameNode.search(GameNode.GameNode.root(context), 2)
+        assert with_table == without_table
+    assert table.stores > 0
+
+
+def test_value_only_read_by_the_same_hps(move_battles):
+    table = Table(1 << 12)
+    node = GameNode.GameNode.root(TurnContext(move_battles[0]), table=table)
+    value = GameNode.max_value(node, 1, -float("inf"), float("inf"))
+    # another state of the same HP buckets
+    other_hp = tuple(hp - 0.5 if hp > 1 else hp for hp in node.hp)
+    table.store(node.key, 5, 1000, EXACT, hp=other_hp)
+    assert GameNode.max_value(node, 1, -float("inf"), float("inf")) == value
+    table.store(node.key, 5, 1000, EXACT, hp=node.hp)
+    assert GameNode.max_value(node, 1, -float("inf"), float("inf")) == 1000
@@ -0,0 +1,45 @@
+import numpy as np
+from poke_env.environment.pokemon_type import PokemonType
+
+import TypeChart
+
+
+def _pokemon(battles):
+    """
+    :return: every Pokémon of the fixture battles, both sides
+    """
+    return [mon for battle in battles for mon in list(battle.team.values()) + list(battle.opponent_team.values())]
+
+
+def _performance(mon_a, mon_b):
+    # type advantage of mon_a on mon_b as the players scored it before the table
+    a_on_b = max(mon_b.damage_multiplier(type_) for type_ in mon_a.types if type_)
+    b_on_a = max(mon_a.damage_multiplier(type_) for type_ in mon_b.types if type_)
+    return a_on_b - b_on_a
+
+
+def test_damage_multiplier_same_of_poke_env(battles):
+    for mon in _pokemon(battles[:4]):
+        for pokemon_type in PokemonType:
+            assert TypeChart.damage_multiplier(mon, pokemon_type) == mon.damage_multiplier(pokemon_type)
+        for move in mon.moves.values():
+            assert TypeChart.damage_multiplier(mon, move) == mon.damage_multiplier(move)
+
+
+def test_defensive_row(battles):
+    for mon in _pokemon(battles[:4]):
+        assert TypeChart.defensive_row(mon).tolist() == [mon.damage_multiplier(t) for t in TypeChart.TYPES]
+
+
+def test_missing_type_is_neutral():
+    assert (TypeChart.CHART[TypeChart.NO_TYPE] == 1).all()
+    for first in range(TypeChart.N_TYPES):
+        assert (TypeChart.DUAL_CHART[first, TypeChart.NO_TYPE] == TypeChart.CHART[first]).all()
+
+
+def test_teampreview_performance(battles):
+    battle = battles[0]
+    team = list(battle.team.values())
+    opponents = list(battle.opponent_team.values())
+    expected = np.array([[_performance(mon, opponent) for opponent in opponents] for mon in team])
+    assert (TypeChart.teampreview_performance(team, opponents) == expected).all()